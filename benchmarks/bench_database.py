@@ -0,0 +1,77 @@
+#!/usr/bin/env python2
+"""Insert latency and shutdown time of the legacy and tuned SQLite profiles.
+
+Usage: PYTHONPATH=. python benchmarks/bench_database.py [rows] [payload_bytes]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PySide.QtCore import QByteArray, QCoreApplication
+
+from clipmanager.database import Database
+from clipmanager.models import DataSqlTableModel, MainSqlTableModel
+
+# rollback journal, synchronous=FULL and VACUUM on close
+LEGACY_PRAGMAS = dict((name, None) for name in Database.PRAGMAS)
+LEGACY_PRAGMAS.update({'journal_mode': 'DELETE', 'synchronous': 'FULL'})
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run(name, pragmas, legacy_close, rows, payload):
+    tmp_dir = tempfile.mkdtemp(prefix='clipmanager-bench-')
+    try:
+        db = Database(db_path=os.path.join(tmp_dir, 'contents.db'),
+                      pragmas=pragmas)
+        db.create_tables()
+
+        byte_data = QByteArray(payload)
+        latencies = []
+        for row in range(rows):
+            start = time.time()
+            parent_id = MainSqlTableModel.create(
+                title='title %d' % row,
+                title_short='title %d' % row,
+                checksum=row,
+                created_at=row
+            )
+            DataSqlTableModel.create(parent_id, 'text/plain', byte_data)
+            latencies.append(time.time() - start)
+
+        # retention purge leaves free pages behind
+        db._exec('DELETE FROM data WHERE parent_id < %d' % (rows // 2))
+        db._exec('DELETE FROM main WHERE id < %d' % (rows // 2))
+
+        start = time.time()
+        if legacy_close:
+            db.vacuum()
+        db.close()
+        shutdown = time.time() - start
+
+        print('{:<8} insert median {:7.3f} ms  p95 {:7.3f} ms  '
+              'shutdown {:8.1f} ms'.format(name,
+                                           percentile(latencies, 0.5) * 1000,
+                                           percentile(latencies, 0.95) * 1000,
+                                           shutdown * 1000))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payload = 'x' * (int(sys.argv[2]) if len(sys.argv) > 2 else 16384)
+
+    app = QCoreApplication(sys.argv)  # noqa: F841 loads sql drivers
+
+    run('legacy', LEGACY_PRAGMAS, True, rows, payload)
+    run('tuned', None, False, rows, payload)
+
+
+if __name__ == '__main__':
+    main()
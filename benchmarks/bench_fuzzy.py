@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+"""Fuzzy search latency per keystroke against a budget.
+
+Searches 100k random titles by default, used at random over the last year,
+with the limit and step budget of the search box. Every query is searched
+cold and while typed one character at a time. The longest step is the
+longest the search box blocks typing, exits with status 1 if any step is
+over the budget. Total is the time until results are shown.
+
+Usage: PYTHONPATH=. python benchmarks/bench_fuzzy.py [rows] [budget ms]
+"""
+import random
+import string
+import sys
+import time
+
+from clipmanager.fuzzy import FuzzyIndex
+
+BUDGET_MS = 50
+LIMIT = 50  # SearchFilterProxyModel.fuzzy_limit
+STEP_MS = 20  # SearchFilterProxyModel.fuzzy_budget
+QUERIES = ['m', 'e', 'zq', 'ma', 'abc', 'clipman', 'qwertyu']
+NOW = 1500000000000
+DAY = 86400000
+
+
+def random_title(rng):
+    return '\n'.join(
+        ''.join(rng.choice(string.ascii_letters + ' ')
+                for __ in range(rng.randint(10, 60)))
+        for __ in range(rng.randint(1, 4)))
+
+
+def measure(fuzzy_index, text):
+    """Search as SearchFilterProxyModel does, return longest and total ms."""
+    steps = []
+    search = fuzzy_index.iter_search(text, limit=LIMIT, now=NOW)
+    row_ids = None
+    while row_ids is None:
+        start = time.time()
+        deadline = start + STEP_MS / 1000.0
+        for row_ids in search:
+            if row_ids is not None or time.time() > deadline:
+                break
+        steps.append((time.time() - start) * 1000)
+    return max(steps), sum(steps)
+
+
+def reset(fuzzy_index):
+    """Search a query no other query extends, the next search is cold."""
+    fuzzy_index.search('#', now=NOW)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else BUDGET_MS
+
+    rng = random.Random(0)
+    fuzzy_index = FuzzyIndex()
+    fuzzy_index.load((row, random_title(rng), NOW - rng.randint(0, 365 * DAY))
+                     for row in range(rows))
+    reset(fuzzy_index)  # sorts recency order too
+
+    over = []
+    print('{:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'query', 'cold step', 'cold total', 'typed step', 'typed total'))
+    for text in QUERIES:
+        reset(fuzzy_index)
+        cold_step, cold_total = measure(fuzzy_index, text)
+
+        reset(fuzzy_index)
+        typed = [measure(fuzzy_index, text[:end])
+                 for end in range(1, len(text) + 1)]
+        typed_step = max(step for step, __ in typed)
+        typed_total = max(total for __, total in typed)
+
+        print('{:>10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            text, cold_step, cold_total, typed_step, typed_total))
+        if max(cold_step, typed_step) > budget:
+            over.append(text)
+
+    if over:
+        print('Over {:.0f} ms budget: {}'.format(budget, ', '.join(over)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python2
+"""Layout time of the history list with measured and uniform items.
+
+Shows MainSqlTableModel through SearchFilterProxyModel as the main window
+does, against a history of 10k and 100k rows by default. Measures the first
+layout of the list, the layout after inserting a row at the top and after
+moving a row below the first page to the top, e.g. a repeated capture.
+
+Usage: PYTHONPATH=. python benchmarks/bench_layout.py [rows...]
+"""
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+from PySide.QtGui import QApplication
+
+from clipmanager.database import Database
+from clipmanager.models import MainSqlTableModel
+from clipmanager.ui.historylist import HistoryListView
+from clipmanager.ui.searchedit import SearchFilterProxyModel
+
+ROWS = [10000, 100000]
+LINES = 4
+
+
+def random_title(rng):
+    return '\n'.join(
+        ''.join(rng.choice(string.ascii_letters + ' ')
+                for __ in range(rng.randint(10, 60)))
+        for __ in range(rng.randint(1, LINES)))
+
+
+def populate(rows):
+    rng = random.Random(0)
+    db = Database(db_path=os.path.join(tempfile.mkdtemp(
+        prefix='clipmanager-bench-'), 'contents.db'))
+    db.create_tables()
+
+    db.connection.transaction()
+    for row in range(rows):
+        title = random_title(rng)
+        MainSqlTableModel.create(title, title, row, row)
+    db.connection.commit()
+    return db
+
+
+def settle(app, view):
+    """Lay out the view until the scroll range stops changing."""
+    start = time.time()
+    view.doItemsLayout()
+    maximum = None
+    while maximum != view.verticalScrollBar().maximum():
+        maximum = view.verticalScrollBar().maximum()
+        app.processEvents()
+    return (time.time() - start) * 1000
+
+
+def run(app, rows, uniform):
+    view = HistoryListView()
+    view.set_uniform_items(uniform, LINES)
+    view.resize(400, 600)
+
+    model = MainSqlTableModel()
+    proxy = SearchFilterProxyModel()
+    proxy.setSourceModel(model)
+    view.setModel(proxy)
+    view.setModelColumn(model.TITLE_SHORT)
+    view.show()
+
+    first = settle(app, view)
+
+    created_at = rows
+    inserted_id = MainSqlTableModel.create('inserted', 'inserted', rows,
+                                           created_at)
+    start = time.time()
+    model.insert_row(inserted_id, 'inserted', created_at)
+    settle(app, view)
+    insert = (time.time() - start) * 1000
+
+    created_at += 1
+    row = model.page_size + 1
+    row_id = model.row_id(row)
+    moved_at = model.data(model.index(row, model.CREATED_AT))
+    MainSqlTableModel.touch_id(row_id, created_at)
+    start = time.time()
+    model.move_to_top(row_id, created_at, row)
+    settle(app, view)
+    move = (time.time() - start) * 1000
+
+    MainSqlTableModel.delete([inserted_id])
+    MainSqlTableModel.touch_id(row_id, moved_at)
+    view.close()
+    return first, insert, move
+
+
+def main():
+    rows = [int(count) for count in sys.argv[1:]] or ROWS
+
+    app = QApplication(sys.argv)
+
+    print('{:>8} {:>10} {:>14} {:>14} {:>14}'.format(
+        'rows', 'mode', 'layout ms', 'insert ms', 'move ms'))
+    for count in rows:
+        db = populate(count)
+        db_path = db.connection.databaseName()
+        try:
+            for uniform, mode in ((False, 'measured'), (True, 'uniform')):
+                first, insert, move = run(app, count, uniform)
+                print('{:>8d} {:>10} {:>14.1f} {:>14.1f} {:>14.1f}'.format(
+                    count, mode, first, insert, move))
+        finally:
+            db.close()
+            shutil.rmtree(os.path.dirname(db_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+"""Substring search through the trigram index and a fixed string filter.
+
+The baseline is the original search box: QSortFilterProxyModel filtering
+every title of a fully fetched QSqlTableModel with a fixed string. The
+LIKE scan is what the search box falls back to without the trigram index.
+
+Usage: PYTHONPATH=. python benchmarks/bench_search.py [rows]
+"""
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+from PySide.QtCore import Qt
+from PySide.QtGui import QApplication, QSortFilterProxyModel
+from PySide.QtSql import QSqlTableModel
+
+from clipmanager.database import Database
+from clipmanager.models import MainSqlTableModel
+from clipmanager.ui.searchedit import SearchFilterProxyModel
+
+QUERIES = ['abc', 'share/cl', 'http', '7f3a9', 'Manager.py']
+
+
+def random_title(rng):
+    words = [''.join(rng.choice(string.ascii_letters + string.digits)
+                     for __ in range(rng.randint(3, 12)))
+             for __ in range(rng.randint(2, 20))]
+    return rng.choice(['/usr/share/', 'http://', '', '']) + ' '.join(words)
+
+
+def measure(search, queries):
+    timings = []
+    for query in queries:
+        start = time.time()
+        search(query)
+        timings.append(time.time() - start)
+    return sum(timings) / len(timings) * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    app = QApplication(sys.argv)  # noqa: F841
+
+    tmp_dir = tempfile.mkdtemp(prefix='clipmanager-bench-')
+    try:
+        db = Database(db_path=os.path.join(tmp_dir, 'contents.db'))
+        db.create_tables()
+        if not db.trigram:
+            sys.exit('SQLite without FTS5 trigram tokenizer.')
+
+        rng = random.Random(0)
+        db.connection.transaction()
+        for row in range(rows):
+            title = random_title(rng)
+            MainSqlTableModel.create(title, title[:80], row, row)
+        db.connection.commit()
+
+        table = QSqlTableModel()
+        table.setTable('main')
+        table.select()
+        while table.canFetchMore():
+            table.fetchMore()
+        baseline = QSortFilterProxyModel()
+        baseline.setFilterKeyColumn(MainSqlTableModel.TITLE)
+        baseline.setDynamicSortFilter(True)
+        baseline.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        baseline.setSourceModel(table)
+
+        fixed_string = measure(baseline.setFilterFixedString, QUERIES)
+
+        model = MainSqlTableModel()
+        proxy = SearchFilterProxyModel()
+        proxy.setSourceModel(model)
+
+        fixed = measure(proxy.search, QUERIES)
+
+        index = measure(MainSqlTableModel.search_substring, QUERIES)
+
+        proxy.substring = True
+        proxy_index = measure(proxy.search, QUERIES)
+
+        print('{:d} rows, mean per query'.format(rows))
+        print('setFilterFixedString    {:8.1f} ms'.format(fixed_string))
+        print('proxy search (LIKE)     {:8.1f} ms'.format(fixed))
+        print('search_substring (SQL)  {:8.1f} ms'.format(index))
+        print('proxy search (trigram)  {:8.1f} ms'.format(proxy_index))
+
+        db.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python2
+"""Time to tray icon and to first row when starting with a large history.
+
+Starts the main window minimized, as on login, against a history of 100k
+rows by default with fuzzy search enabled. Eager load is the time the GUI
+thread spent counting rows and indexing titles before the event loop ran
+when history was loaded at startup.
+
+Usage: PYTHONPATH=. python benchmarks/bench_startup.py [rows]
+"""
+import os
+import sys
+import time
+
+from PySide.QtCore import QDir, QSettings, QTimer
+from PySide.QtGui import QApplication, QDesktopServices
+from PySide.QtSql import QSqlDatabase
+
+from clipmanager import __org__, __title__
+from clipmanager.connection import set_connection
+from clipmanager.database import Database
+from clipmanager.fuzzy import FuzzyIndex
+from clipmanager.models import MainSqlTableModel
+from clipmanager.settings import Settings
+from clipmanager.ui.mainwindow import MainWindow
+
+
+def populate(db_path, rows):
+    db = Database(db_path=db_path, connection_name='bench')
+    set_connection('bench')
+    db.create_tables()
+
+    db.connection.transaction()
+    for row in range(rows):
+        title = 'clipboard entry %d\nsecond line' % row
+        MainSqlTableModel.create(title, title.split('\n')[0], row, row)
+    db.connection.commit()
+
+    start = time.time()
+    FuzzyIndex().load(MainSqlTableModel.titles())
+    MainSqlTableModel.count()
+    eager = time.time() - start
+
+    db.close()
+    del db
+    QSqlDatabase.removeDatabase('bench')
+    set_connection(None)
+    return eager
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    app = QApplication(sys.argv)
+    app.setOrganizationName('%s-bench' % __org__.lower())
+    app.setApplicationName('%s-bench' % __title__.lower())
+    app.setQuitOnLastWindowClosed(False)
+
+    Settings().set_fuzzy_search(True)
+
+    storage_path = QDesktopServices.storageLocation(
+        QDesktopServices.DataLocation)
+    QDir(storage_path).mkpath('.')
+
+    db_path = os.path.join(storage_path, 'contents.db')
+    if os.path.exists(db_path):
+        os.unlink(db_path)
+    eager = populate(db_path, rows)
+
+    marks = {}
+
+    start = time.time()
+    window = MainWindow(minimize=True)
+    main_widget = window.main_widget
+    if main_widget.main_model.rowCount():
+        marks['first row'] = time.time() - start
+
+    def tray_shown():
+        if window.system_tray.isVisible():
+            marks['tray icon'] = time.time() - start
+
+    def poll():
+        if main_widget.main_model.rowCount() == rows and \
+                'all rows' not in marks:
+            marks['all rows'] = time.time() - start
+        if len(main_widget.fuzzy_index) == rows:
+            marks['all titles'] = time.time() - start
+            app.quit()
+        else:
+            QTimer.singleShot(1, poll)
+
+    QTimer.singleShot(0, tray_shown)
+    QTimer.singleShot(0, poll)
+    app.exec_()
+
+    window.destroy()
+
+    print('{:>8} {:>14} {:>14} {:>14} {:>14} {:>14}'.format(
+        'rows', 'eager ms', 'tray icon ms', 'first row ms', 'all rows ms',
+        'all titles ms'))
+    print('{:>8d} {:>14.1f} {:>14.1f} {:>14.1f} {:>14.1f} {:>14.1f}'.format(
+        rows, eager * 1000,
+        *[marks.get(name, float('nan')) * 1000
+          for name in ('tray icon', 'first row', 'all rows', 'all titles')]))
+
+    QSettings().clear()
+    os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python2
+"""Short title of 1 KB, 1 MB and 100 MB clipboard text.
+
+Compares truncate_lines(format_title(text)) with build_title_short(text).
+
+Usage: PYTHONPATH=. python benchmarks/bench_titles.py [lines] [sizes...]
+"""
+import random
+import string
+import sys
+import time
+
+from clipmanager.utils import build_title_short, format_title, truncate_lines
+
+SIZES = [1024, 1048576, 104857600]
+
+
+def random_text(rng, size):
+    """Indented source-like text of about size characters."""
+    line = []
+    for __ in range(64):
+        words = [''.join(rng.choice(string.ascii_letters)
+                         for __ in range(rng.randint(2, 10)))
+                 for __ in range(rng.randint(1, 10))]
+        line.append(u'    ' * rng.randint(1, 4) + u' '.join(words))
+    block = u'\n'.join(line) + u'\n\n'
+    return (block * (size // len(block) + 1))[:size]
+
+
+def measure(func, repeat):
+    best = None
+    for __ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    sizes = [int(size) for size in sys.argv[2:]] or SIZES
+
+    rng = random.Random(0)
+    print('{:>12} {:>20} {:>20}'.format('size', 'format+truncate ms',
+                                        'build_title_short ms'))
+    for size in sizes:
+        text = random_text(rng, size)
+        repeat = 3 if size > 1048576 else 20
+
+        old = measure(lambda: truncate_lines(format_title(text), lines),
+                      repeat)
+        new = measure(lambda: build_title_short(text, lines), repeat)
+        print('{:>12d} {:>20.3f} {:>20.3f}'.format(size, old, new))
+
+
+if __name__ == '__main__':
+    main()
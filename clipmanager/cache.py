@@ -0,0 +1,173 @@
+import logging
+import mmap
+from collections import OrderedDict
+
+from clipmanager.models import DataSqlTableModel, LazyMimeData
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadCache(object):
+    """Byte budgeted LRU cache of stored clipboard formats.
+
+    Entries are the formats read by DataSqlTableModel.read() keyed by main
+    table row id. Spilled payloads are memory maps of their files and are
+    not cached. Rows are read on the GUI thread, prefetch() only reads rows
+    whose stored payloads fit max_prefetch_bytes.
+
+    :param max_bytes: Total size of cached payloads.
+    :type max_bytes: int
+
+    :param max_entry_bytes: Size of the largest entry that is cached,
+        defaults to a quarter of max_bytes.
+    :type max_entry_bytes: int
+
+    :param max_prefetch_bytes: Stored size of the largest row that is
+        prefetched.
+    :type max_prefetch_bytes: int
+    """
+
+    def __init__(self, max_bytes=33554432, max_entry_bytes=None,
+                 max_prefetch_bytes=262144):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self.max_prefetch_bytes = max_prefetch_bytes
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+        self._entries = OrderedDict()  # row_id: (formats, size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, row_id):
+        return row_id in self._entries
+
+    def get(self, row_id):
+        """Get cached formats and mark them as recently used.
+
+        :param row_id: Main table row id.
+        :type row_id: int
+
+        :return: [[mime_format, byte_data]] or None if not cached.
+        :rtype: list[list[str,QByteArray]] or None
+        """
+        entry = self._entries.pop(row_id, None)
+        if entry is None:
+            return None
+
+        self._entries[row_id] = entry
+        return entry[0]
+
+    def put(self, row_id, formats):
+        """Cache formats, evicting least recently used entries.
+
+        :param row_id: Main table row id.
+        :type row_id: int
+
+        :param formats: [[mime_format, byte_data]]
+        :type formats: list[list[str,QByteArray or mmap.mmap]]
+
+        :return: True if formats were cached.
+        :rtype: bool
+        """
+        if any(isinstance(byte_data, mmap.mmap) for __, byte_data in formats):
+            return False
+
+        size = sum(len(byte_data) for __, byte_data in formats)
+        if size > self.max_entry_bytes:
+            return False
+
+        self.discard([row_id])
+
+        while self._entries and self.size + size > self.max_bytes:
+            __, (__, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+        self._entries[row_id] = (formats, size)
+        self.size += size
+        return True
+
+    def load(self, row_id):
+        """Get formats from cache or read them from the database.
+
+        Spilled payloads are returned as memory maps that are not cached,
+        the caller closes them.
+
+        :param row_id: Main table row id.
+        :type row_id: int
+
+        :return: [[mime_format, byte_data]]
+        :rtype: list[list[str,QByteArray or mmap.mmap]]
+        """
+        formats = self.get(row_id)
+        if formats is not None:
+            self.hits += 1
+            return formats
+
+        self.misses += 1
+        formats = DataSqlTableModel.read(row_id)
+        self.put(row_id, formats)
+        return formats
+
+    def mime_data(self, row_id):
+        """Rebuild clipboard contents of a main table row.
+
+        Rows that are not cached are read and cached unless they are larger
+        than an entry or spilled, those read each format when it is
+        requested.
+
+        :param row_id: Main table row id.
+        :type row_id: int
+
+        :return: Stored mime formats.
+        :rtype: QMimeData
+        """
+        if row_id not in self._entries:
+            size = DataSqlTableModel.stored_size(row_id)
+            if size is None or size > self.max_entry_bytes:
+                self.misses += 1
+                return LazyMimeData(row_id)
+
+        return DataSqlTableModel.to_mime_data(self.load(row_id))
+
+    def prefetch(self, row_ids):
+        """Read formats of rows likely to be pasted or previewed next.
+
+        :param row_ids: Main table row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        for row_id in row_ids:
+            if row_id is None or row_id in self._entries:
+                continue
+
+            size = DataSqlTableModel.stored_size(row_id)
+            if size is None or size > self.max_prefetch_bytes:
+                continue
+
+            if self.put(row_id, DataSqlTableModel.read(row_id)):
+                self.prefetched += 1
+
+    def discard(self, row_ids):
+        """Remove entries of deleted rows.
+
+        :param row_ids: Main table row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        for row_id in row_ids:
+            entry = self._entries.pop(row_id, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,402 @@
+import codecs
+import logging
+import struct
+import time
+from collections import OrderedDict
+
+from PySide.QtCore import (
+    QByteArray,
+    QCoreApplication,
+    QObject,
+    QRunnable,
+    QTextCodec,
+    QThreadPool,
+    QUrl,
+    Signal,
+    Slot,
+)
+
+from clipmanager.defs import MIME_SUPPORTED
+from clipmanager.payload import chunks
+from clipmanager.utils import build_title_short
+
+try:
+    from hashlib import blake2b
+except ImportError:  # Python < 3.6
+    from pyblake2 import blake2b
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SIZE = 16  # bytes
+
+# Titles are built from at most this many bytes of text or html.
+TITLE_PREFIX = 262144
+
+STAGES = ('decode', 'title', 'hash', 'order', 'store')
+
+_TEXT_FORMATS = ('text/plain', 'text/plain;charset=utf-8')
+_HTML_FORMATS = ('text/html', 'text/html;charset=utf-8')
+
+
+def snapshot(mime_data, max_size=0):
+    """Take supported formats out of clipboard mime data.
+
+    QByteArray is implicitly shared, the bytes are not copied unless the
+    clipboard changes them while the capture is processed. QMimeData has no
+    way to ask for the size of a format without reading it, so formats are
+    read one at a time and the remaining formats are not requested from the
+    clipboard owner once the total size exceeds max_size.
+
+    :param mime_data: Clipboard contents.
+    :type mime_data: QMimeData
+
+    :param max_size: Total size in bytes of formats at most, 0 disables the
+        limit.
+    :type max_size: int
+
+    :return: [[mime_format, byte_data]] or None if the formats are too
+        large.
+    :rtype: list[list[str,QByteArray]] or None
+    """
+    formats = []
+    size = 0
+    for mime_format in MIME_SUPPORTED:
+        if not mime_data.hasFormat(mime_format):
+            continue
+
+        byte_data = mime_data.data(mime_format)
+        size += len(byte_data)
+        if max_size and size > max_size:
+            logger.debug('Stopped reading clipboard at %s.', mime_format)
+            return None
+
+        formats.append([mime_format, QByteArray(byte_data)])
+    return formats
+
+
+def _prefix(byte_data, size):
+    """Copy the first bytes of a payload.
+
+    :param byte_data: Payload.
+    :type byte_data: QByteArray or str
+
+    :param size: Bytes to copy.
+    :type size: int
+
+    :return: Prefix of the payload.
+    :rtype: QByteArray
+    """
+    if isinstance(byte_data, QByteArray):
+        return byte_data.left(size)
+    return QByteArray(str(byte_data[:size]))
+
+
+def decode(formats, max_size=TITLE_PREFIX):
+    """Decode urls, text and html of captured formats.
+
+    Text and html are decoded from their first max_size bytes only, a
+    character split at the end is dropped.
+
+    :param formats: [[mime_format, byte_data]]
+    :type formats: list[list[str,QByteArray]]
+
+    :param max_size: Bytes of text and html to decode.
+    :type max_size: int
+
+    :return: {'urls': [QUrl], 'text': str, 'html': str}, missing ones None.
+    :rtype: dict
+    """
+    byte_data = dict(formats)
+    decoded = {'urls': None, 'text': None, 'html': None}
+
+    if 'text/uri-list' in byte_data:
+        lines = str(byte_data['text/uri-list']).splitlines()
+        decoded['urls'] = [QUrl(line.strip()) for line in lines
+                           if line.strip() and not line.startswith('#')]
+
+    for mime_format in _TEXT_FORMATS:
+        if mime_format in byte_data:
+            text = _prefix(byte_data[mime_format], max_size).data()
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            decoded['text'] = decoder.decode(text)
+            break
+
+    for mime_format in _HTML_FORMATS:
+        if mime_format in byte_data:
+            html = _prefix(byte_data[mime_format], max_size)
+            codec = QTextCodec.codecForHtml(html,
+                                            QTextCodec.codecForName('UTF-8'))
+            decoded['html'] = codec.makeDecoder().toUnicode(html)
+            break
+
+    return decoded
+
+
+def create_title(decoded):
+    """Create full title using urls, text, or html.
+
+    :param decoded: Result of decode().
+    :type decoded: dict
+
+    :return: Full title or None if it did not have any text/html/url.
+    :rtype: str or None
+    """
+    if decoded['urls']:
+        urls = [url.toString() for url in decoded['urls']]
+        return 'Copied File(s):\n' + '\n'.join(urls)
+    elif decoded['text']:
+        return decoded['text']
+    elif decoded['html']:  # last resort
+        return decoded['html']
+    return None
+
+
+def checksum(formats):
+    """Calculate 128-bit BLAKE2b digest of all captured formats.
+
+    Formats are hashed sorted by name, each as its name and length followed
+    by its bytes, so the digest does not depend on the order formats were
+    offered in. Payloads are fed in chunks straight from their buffers.
+
+    :param formats: [[mime_format, byte_data]]
+    :type formats: list[list[str,QByteArray or mmap.mmap]]
+
+    :return: Digest or None if there are no formats.
+    :rtype: QByteArray or None
+    """
+    if not formats:
+        return None
+
+    digest = blake2b(digest_size=DIGEST_SIZE)
+    for mime_format, byte_data in sorted(formats, key=lambda f: f[0]):
+        digest.update(str(mime_format))
+        digest.update(struct.pack('<BQ', 0, len(byte_data)))
+        for chunk in chunks(byte_data):
+            digest.update(chunk)
+
+    return QByteArray(digest.digest())
+
+
+class CaptureJob(QRunnable):
+    """Turn captured formats into arguments of MainSqlTableModel.capture().
+
+    :param sequence: Order of the capture.
+    :type sequence: int
+
+    :param formats: Result of snapshot().
+    :type formats: list[list[str,QByteArray]]
+
+    :param created_at: UTC in milliseconds.
+    :type created_at: int
+
+    :param options: 'lines' to display and capture() keyword arguments.
+    :type options: dict
+
+    :param done: Signal emitted with sequence, capture arguments or None and
+        stage timings.
+    :type done: Signal
+    """
+
+    def __init__(self, sequence, formats, created_at, options, done):
+        super(CaptureJob, self).__init__()
+
+        self.sequence = sequence
+        self.formats = formats
+        self.created_at = created_at
+        self.options = dict(options)
+        self.done = done
+
+    def run(self):
+        timings = OrderedDict()
+        capture = None
+
+        try:
+            start = time.time()
+            decoded = decode(self.formats)
+            timings['decode'] = time.time() - start
+
+            start = time.time()
+            title = create_title(decoded)
+            if title:
+                title_short = build_title_short(title,
+                                                self.options.pop('lines'))
+            timings['title'] = time.time() - start
+
+            start = time.time()
+            item_checksum = checksum(self.formats)
+            timings['hash'] = time.time() - start
+
+            if title:
+                capture = dict(self.options,
+                               title=title,
+                               title_short=title_short,
+                               checksum=item_checksum,
+                               created_at=self.created_at,
+                               formats=self.formats)
+        except Exception:
+            logger.exception('Failed to process clipboard contents.')
+
+        self.done.emit(self.sequence, capture, timings)
+
+
+class CapturePipeline(QObject):
+    """Process clipboard captures off the GUI thread.
+
+    The GUI thread only takes the formats out of the clipboard. Decoding,
+    building titles and hashing run on a thread pool, results are handed to
+    the DatabaseWriter in the order they were captured.
+
+    :param writer: Stores the captures.
+    :type writer: DatabaseWriter
+
+    :param max_threads: Size of the thread pool.
+    :type max_threads: int
+
+    :param max_size: Total size in bytes of formats captured at most, 0
+        disables the limit.
+    :type max_size: int
+    """
+    failed = Signal(str)
+
+    _processed = Signal(object, object, object)
+
+    def __init__(self, writer, max_threads=2, max_size=0, parent=None):
+        super(CapturePipeline, self).__init__(parent)
+
+        self.writer = writer
+        self.max_size = max_size
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+
+        self._sequence = 0  # sequence of next capture
+        self._expected = 0  # sequence of next capture to store
+        self._jobs = {}  # sequence: running CaptureJob
+        self._processed_jobs = {}  # sequence: (capture, timings, finished)
+
+        # stage: [count, total seconds, max seconds]
+        self.timings = OrderedDict((stage, [0, 0.0, 0.0]) for stage in STAGES)
+
+        self._processed.connect(self._on_processed)
+        self.writer.captured.connect(self._on_captured)
+
+    def submit(self, mime_data, created_at, options):
+        """Take formats from clipboard and queue processing.
+
+        :param mime_data: Clipboard contents.
+        :type mime_data: QMimeData
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :param options: 'lines' to display and capture() keyword arguments.
+        :type options: dict
+
+        :return: Sequence of the capture or None if it is too large.
+        :rtype: int or None
+        """
+        formats = snapshot(mime_data, self.max_size)
+        if formats is None:
+            logger.warning('Skipping clipboard contents of more than %d '
+                           'bytes.', self.max_size)
+            self.failed.emit(
+                'Clipboard contents exceed the limit of {:.1f} MB.'.format(
+                    self.max_size / 1048576.0))
+            return None
+
+        sequence = self._sequence
+        self._sequence += 1
+
+        # keep a reference, the pool does not own python runnables
+        job = CaptureJob(sequence, formats, created_at, options,
+                         self._processed)
+        job.setAutoDelete(False)
+        self._jobs[sequence] = job
+        self.pool.start(job)
+
+        return sequence
+
+    @Slot(object, object, object)
+    def _on_processed(self, sequence, capture, timings):
+        """Store processed captures in order.
+
+        :param sequence: Order of the capture.
+        :type sequence: int
+
+        :param capture: capture() keyword arguments or None on failure.
+        :type capture: dict
+
+        :param timings: {stage: seconds}
+        :type timings: dict
+
+        :return: None
+        :rtype: None
+        """
+        self._jobs.pop(sequence, None)
+        self._processed_jobs[sequence] = (capture, timings, time.time())
+
+        while self._expected in self._processed_jobs:
+            capture, timings, finished = \
+                self._processed_jobs.pop(self._expected)
+            self._expected += 1
+
+            timings['order'] = time.time() - finished
+
+            if capture is None:
+                self._record(timings)
+                self.failed.emit('Failed to get clipboard contents.')
+                continue
+
+            self.writer.capture(context=(timings, time.time()), **capture)
+
+    @Slot(object)
+    def _on_captured(self, result):
+        context = result.get('context')
+        if context is None:
+            return
+
+        if result['row_id'] is None:
+            self.failed.emit('Failed to store clipboard contents.')
+
+        timings, submitted = context
+        timings['store'] = time.time() - submitted
+        self._record(timings)
+
+    def _record(self, timings):
+        """Add stage timings of a capture to totals.
+
+        :param timings: {stage: seconds}
+        :type timings: dict
+
+        :return: None
+        :rtype: None
+        """
+        for stage, seconds in timings.items():
+            totals = self.timings[stage]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+        logger.debug('Capture %s.', ', '.join(
+            '{} {:.1f} ms'.format(stage, seconds * 1000)
+            for stage, seconds in timings.items()))
+
+    def stats(self):
+        """Summarize stage timings.
+
+        :return: {stage: (count, mean ms, max ms)}
+        :rtype: dict
+        """
+        return OrderedDict(
+            (stage, (count, total * 1000 / count if count else 0.0,
+                     maximum * 1000))
+            for stage, (count, total, maximum) in self.timings.items())
+
+    def flush(self):
+        """Wait for running jobs and hand their results to the writer.
+
+        :return: None
+        :rtype: None
+        """
+        self.pool.waitForDone()
+        QCoreApplication.processEvents()
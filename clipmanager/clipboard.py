@@ -1,6 +1,8 @@
 import logging
+import time
+from collections import OrderedDict
 
-from PySide.QtCore import QMimeData, QObject, Signal, Slot
+from PySide.QtCore import QMimeData, QObject, QTimer, Signal, Slot
 from PySide.QtGui import QApplication, QClipboard
 
 logger = logging.getLogger(__name__)
@@ -10,14 +12,28 @@ class ClipboardManager(QObject):
     """Handles communication between all clipboards and main window.
 
     Source: http://bazaar.launchpad.net/~glipper-drivers/glipper/Clipboards.py
+
+    :param capture_window: Milliseconds to wait for a burst of changes to
+        settle, 0 captures every change.
+    :type capture_window: int
+
+    :param capture_rate: Captures per second, 0 disables the limit.
+    :type capture_rate: float
     """
     new_item = Signal(QMimeData)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, capture_window=0, capture_rate=0):
         super(ClipboardManager, self).__init__(parent)
 
+        self.scheduler = None
+        if capture_window or capture_rate:
+            self.scheduler = CaptureScheduler(window=capture_window,
+                                              rate=capture_rate,
+                                              parent=self)
+
         self.primary_clipboard = Clipboard(QApplication.clipboard(),
-                                           self.new_item)
+                                           self.new_item,
+                                           scheduler=self.scheduler)
 
     def get_primary_clipboard_text(self):
         """Get primary clipboard contents.
@@ -42,6 +58,14 @@ class ClipboardManager(QObject):
     def clear_text(self):
         self.primary_clipboard.clear_text()
 
+    def owns_clipboard(self):
+        """Check if the clipboard holds contents set by set_text().
+
+        :return: True if this application owns the clipboard.
+        :rtype: bool
+        """
+        return self.primary_clipboard.owns_clipboard()
+
 
 class Clipboard(QObject):
     """Monitor's clipboard for changes.
@@ -54,16 +78,24 @@ class Clipboard(QObject):
 
     :param mode:
     :type mode: QClipboard.Mode.Clipboard
+
+    :param scheduler: Delays and limits captures, None captures every change.
+    :type scheduler: CaptureScheduler
     """
 
-    def __init__(self, clipboard, callback, mode=QClipboard.Clipboard):
+    def __init__(self, clipboard, callback, mode=QClipboard.Clipboard,
+                 scheduler=None):
         super(Clipboard, self).__init__()
 
         self.clipboard = clipboard
         self.callback = callback
         self.mode = mode
 
-        self.clipboard.dataChanged.connect(self.on_data_changed)
+        if scheduler is None:
+            self.clipboard.dataChanged.connect(self.on_data_changed)
+        else:
+            self.clipboard.dataChanged.connect(scheduler.schedule)
+            scheduler.ready.connect(self.on_data_changed)
 
     def get_text(self):
         """Get clipboard contents.
@@ -92,6 +124,11 @@ class Clipboard(QObject):
         """
         self.clipboard.clear(mode=self.mode)
 
+    def owns_clipboard(self):
+        if self.mode == QClipboard.Selection:
+            return self.clipboard.ownsSelection()
+        return self.clipboard.ownsClipboard()
+
     @Slot()
     def on_data_changed(self):
         """Add new clipboard item using callback.
@@ -100,3 +137,125 @@ class Clipboard(QObject):
         :rtype: None
         """
         self.callback.emit(self.get_text())
+
+
+class CaptureScheduler(QObject):
+    """Coalesce bursts of clipboard changes and limit the capture rate.
+
+    A change is captured once no other change followed it for window
+    milliseconds, or max_delay after the first change of a burst. The
+    clipboard is read when the capture is made so the last contents of a
+    burst are kept. Captures take a token from a bucket refilled at rate per
+    second. Without a token the capture waits for the next one and contents
+    replaced in the meantime are dropped.
+
+    :param window: Milliseconds without changes before capturing.
+    :type window: int
+
+    :param rate: Captures per second, 0 disables the limit.
+    :type rate: float
+
+    :param burst: Captures allowed in a row before the rate applies.
+    :type burst: int
+
+    :param max_delay: Milliseconds a capture is deferred at most by a burst.
+    :type max_delay: int
+    """
+    ready = Signal()
+
+    def __init__(self, window=150, rate=5, burst=5, max_delay=1000,
+                 parent=None):
+        super(CaptureScheduler, self).__init__(parent)
+
+        self.window = window
+        self.rate = float(rate)
+        self.burst = burst
+        self.max_delay = max_delay
+
+        self.tokens = float(burst)
+        self._refilled = time.time()
+        self._burst_start = None  # time of first change of pending burst
+        self._throttled = False  # waiting for a token
+
+        self.changes = 0
+        self.captured = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._fire)
+
+    def pending(self):
+        """Check if a capture is scheduled.
+
+        :return: True if a change has not been captured yet.
+        :rtype: bool
+        """
+        return self._burst_start is not None
+
+    @Slot()
+    def schedule(self):
+        """Schedule capture of a clipboard change.
+
+        :return: None
+        :rtype: None
+        """
+        self.changes += 1
+        now = time.time()
+
+        if self._throttled:
+            self.dropped += 1
+            return
+
+        if self._burst_start is None:
+            self._burst_start = now
+        else:
+            self.coalesced += 1
+
+        elapsed = (now - self._burst_start) * 1000
+        if elapsed < self.max_delay or not self.timer.isActive():
+            self.timer.start(int(max(0, min(self.window,
+                                            self.max_delay - elapsed))))
+
+    def _refill(self, now):
+        if not self.rate:
+            return
+
+        self.tokens = min(float(self.burst),
+                          self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    @Slot()
+    def _fire(self):
+        now = time.time()
+        self._refill(now)
+
+        if self.rate and self.tokens < 1:
+            # backpressure, capture once the next token is available
+            self._throttled = True
+            wait = (1 - self.tokens) / self.rate
+            self.timer.start(int(wait * 1000) + 1)
+            return
+
+        if self.rate:
+            self.tokens -= 1
+
+        self._throttled = False
+        self._burst_start = None
+        self.captured += 1
+        self.ready.emit()
+
+    def stats(self):
+        """Count clipboard changes and what happened to them.
+
+        :return: {'changes': int, 'captured': int, 'coalesced': int,
+            'dropped': int}
+        :rtype: dict
+        """
+        return OrderedDict([
+            ('changes', self.changes),
+            ('captured', self.captured),
+            ('coalesced', self.coalesced),
+            ('dropped', self.dropped),
+        ])
@@ -0,0 +1,75 @@
+import zlib
+
+from clipmanager.defs import MIME_COMPRESS
+
+# Codec stored with every blob, append new codecs instead of renumbering.
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+
+DEFAULT_LEVEL = 6
+
+_decoders = {
+    CODEC_NONE: lambda payload: payload,
+    CODEC_ZLIB: zlib.decompress,
+}
+
+
+def should_compress(mime_format, size):
+    """Check if payload of mime format is large enough to compress.
+
+    :param mime_format: Mime data format, i.e 'text/html'.
+    :type mime_format: str
+
+    :param size: Payload size in bytes.
+    :type size: int
+
+    :return: True if payload should be compressed.
+    :rtype: bool
+    """
+    threshold = MIME_COMPRESS.get(mime_format)
+    return threshold is not None and size >= threshold
+
+
+def encode(mime_format, payload, level=DEFAULT_LEVEL):
+    """Compress payload if its format and size qualify.
+
+    Payloads that do not shrink are stored as is.
+
+    :param mime_format: Mime data format, i.e 'text/html'.
+    :type mime_format: str
+
+    :param payload: Raw bytes.
+    :type payload: str
+
+    :param level: zlib compression level, 0 disables compression.
+    :type level: int
+
+    :return: Codec and stored bytes.
+    :rtype: tuple[int, str]
+    """
+    if level and should_compress(mime_format, len(payload)):
+        compressed = zlib.compress(payload, level)
+        if len(compressed) < len(payload):
+            return CODEC_ZLIB, compressed
+
+    return CODEC_NONE, payload
+
+
+def decode(codec, payload):
+    """Restore raw bytes of a stored payload.
+
+    :param codec: Codec the payload was stored with.
+    :type codec: int
+
+    :param payload: Stored bytes.
+    :type payload: str
+
+    :return: Raw bytes.
+    :rtype: str
+    """
+    try:
+        decoder = _decoders[codec]
+    except KeyError:
+        raise ValueError('Unknown codec {!r}.'.format(codec))
+
+    return decoder(payload)
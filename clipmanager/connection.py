@@ -0,0 +1,64 @@
+import logging
+import threading
+
+from PySide.QtSql import QSqlDatabase, QSqlQuery
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def set_connection(connection_name):
+    """Run queries of the calling thread through a named connection.
+
+    QSqlDatabase connections can only be used by the thread that opened
+    them, threads other than the GUI thread open their own.
+
+    :param connection_name: Connection name, None for default connection.
+    :type connection_name: str or None
+
+    :return: None
+    :rtype: None
+    """
+    _local.connection_name = connection_name
+
+
+def database():
+    """Connection of the calling thread.
+
+    :return: Database connection.
+    :rtype: QSqlDatabase
+    """
+    connection_name = getattr(_local, 'connection_name', None)
+    if connection_name:
+        return QSqlDatabase.database(connection_name)
+    return QSqlDatabase.database()
+
+
+def new_query():
+    """Query on the connection of the calling thread.
+
+    :return: Query.
+    :rtype: QSqlQuery
+    """
+    return QSqlQuery(database())
+
+
+def execute(statement):
+    """Execute a statement without bindings and log any error.
+
+    :param statement: SQL statement.
+    :type statement: str
+
+    :return: True if statement executed without an error.
+    :rtype: bool
+    """
+    query = new_query()
+    query.exec_(statement)
+    query.finish()
+
+    if query.lastError().isValid():
+        logger.error(query.lastError().text())
+        return False
+
+    return True
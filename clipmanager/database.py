@@ -1,52 +1,149 @@
 import logging
 import os
+from collections import OrderedDict
 
 from PySide.QtCore import QDir, QObject
 from PySide.QtGui import QDesktopServices
 from PySide.QtSql import QSqlDatabase, QSqlQuery
 
+from clipmanager.models import DataSqlTableModel
+
 logger = logging.getLogger(__name__)
 
 
 class Database(QObject):
     """Database connection helper.
 
+    :param db_path: Database file, defaults to contents.db in storage location.
+    :type db_path: str
+
+    :param pragmas: Overrides for PRAGMAS, None value skips the pragma.
+    :type pragmas: dict
+
+    :param connection_name: Name of the connection, e.g. for a connection
+        owned by another thread. Defaults to the default connection.
+    :type connection_name: str
+
     Database file can be found in:
     * Windows
     - XP: C:\Documents and Settings\<username>\Local Settings\Application Data\
     - 7/8: C:\Users\<username>\AppData\Local\Werner\ClipManager
     * Linux: /home/<username>/.local/share/data/Werner/ClipManager
     """
-    _main_table_sql = """CREATE TABLE IF NOT EXISTS main(
+    _main_table_sql = """CREATE TABLE IF NOT EXISTS {table}(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT,
         title_short TEXT,
-        checksum TEXT,
+        checksum BLOB,
         keep INTEGER DEFAULT 0,
         created_at TIMESTAMP
     );"""
-    _data_table_sql = """CREATE TABLE IF NOT EXISTS data(
+    _data_table_sql = """CREATE TABLE IF NOT EXISTS {table}(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         parent_id INTEGER,
         mime_format TEXT,
+        blob_id INTEGER,
+        FOREIGN KEY(parent_id) REFERENCES main(id) ON DELETE CASCADE,
+        FOREIGN KEY(blob_id) REFERENCES blobs(id)
+    );"""
+    # Payloads are stored once per content digest and shared by data rows.
+    _blobs_table_sql = """CREATE TABLE IF NOT EXISTS blobs(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        digest BLOB NOT NULL UNIQUE,
+        refcount INTEGER NOT NULL DEFAULT 0,
+        codec INTEGER NOT NULL DEFAULT 0,
         byte_data BLOB,
-        FOREIGN KEY(parent_id) REFERENCES main(id)
+        path TEXT
     );"""
+    _trigger_sql = [
+        """CREATE TRIGGER IF NOT EXISTS data_blob_ref AFTER INSERT ON data
+        BEGIN
+            UPDATE blobs SET refcount = refcount + 1 WHERE id = new.blob_id;
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS data_blob_unref AFTER DELETE ON data
+        BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE id = old.blob_id;
+            DELETE FROM blobs WHERE id = old.blob_id AND refcount <= 0
+                AND path IS NULL;
+        END;""",
+    ]
+    # External content FTS5 indexes over main.title, main_fts for words and
+    # main_trigram for substrings. Trigram tokenizer requires SQLite 3.34.
+    _fts_table_sql = """CREATE VIRTUAL TABLE {table} USING fts5(
+        title,
+        content='main',
+        content_rowid='id'{options}
+    );"""
+    _fts_trigger_sql = [
+        """CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON main
+        BEGIN
+            INSERT INTO {table} (rowid, title) VALUES (new.id, new.title);
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON main
+        BEGIN
+            INSERT INTO {table} ({table}, rowid, title)
+            VALUES ('delete', old.id, old.title);
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS {table}_update
+        AFTER UPDATE OF title ON main
+        BEGIN
+            INSERT INTO {table} ({table}, rowid, title)
+            VALUES ('delete', old.id, old.title);
+            INSERT INTO {table} (rowid, title) VALUES (new.id, new.title);
+        END;""",
+    ]
+    _index_sql = [
+        'CREATE UNIQUE INDEX IF NOT EXISTS main_checksum_idx '
+        'ON main(checksum);',
+        'CREATE INDEX IF NOT EXISTS main_created_at_idx '
+        'ON main(created_at);',
+        'CREATE INDEX IF NOT EXISTS data_parent_id_idx '
+        'ON data(parent_id);',
+    ]
+
+    # Applied in order when the connection opens. auto_vacuum has to come
+    # before journal_mode so a new database file is created with it.
+    PRAGMAS = OrderedDict([
+        ('auto_vacuum', 'INCREMENTAL'),
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -16384),  # KiB
+        ('mmap_size', 268435456),  # bytes
+        ('temp_store', 'MEMORY'),
+        ('foreign_keys', 'ON'),
+    ])
 
-    def __init__(self, parent=None):
+    # Free pages are only given back to the file system on close when they
+    # make up this fraction of the file and at least reclaim_min_pages.
+    reclaim_ratio = 0.25
+    reclaim_min_pages = 256
+
+    def __init__(self, parent=None, db_path=None, pragmas=None,
+                 connection_name=None):
         super(Database, self).__init__(parent)
 
-        storage_path = QDesktopServices.storageLocation(
-            QDesktopServices.DataLocation)
-        storage_dir = QDir(storage_path)
-        if not storage_dir.exists():
-            storage_dir.mkpath('.')
+        self.fts5 = False
+        self.trigram = False
+        self.query_only = False
+
+        if not db_path:
+            storage_path = QDesktopServices.storageLocation(
+                QDesktopServices.DataLocation)
+            storage_dir = QDir(storage_path)
+            if not storage_dir.exists():
+                storage_dir.mkpath('.')
 
-        db_path = os.path.join(storage_path, 'contents.db')
+            db_path = os.path.join(storage_path, 'contents.db')
         logger.info(db_path)
 
+        self.pragmas = OrderedDict(self.PRAGMAS)
+        self.pragmas.update(pragmas or {})
+
         # noinspection PyTypeChecker,PyCallByClass
-        db = QSqlDatabase.addDatabase('QSQLITE')
+        if connection_name:
+            db = QSqlDatabase.addDatabase('QSQLITE', connection_name)
+        else:
+            db = QSqlDatabase.addDatabase('QSQLITE')
         db.setDatabaseName(db_path)
 
         if not db.open():
@@ -54,26 +151,337 @@ class Database(QObject):
 
         self.connection = db
 
-    def create_tables(self):
-        """Create main and data table (one to many).
+        self.apply_pragmas()
+
+    def _exec(self, sql):
+        """Execute a single statement and log any error.
+
+        :param sql: SQL statement.
+        :type sql: str
+
+        :return: True if statement executed without an error.
+        :rtype: bool
+        """
+        query = QSqlQuery(self.connection)
+        query.exec_(sql)
+        query.finish()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+            return False
+
+        return True
+
+    def _scalar(self, sql, default=None):
+        """Execute a query and return first column of the first row.
+
+        :param sql: SQL statement.
+        :type sql: str
+
+        :param default: Value returned if the query has no rows.
+        :type default: object
+
+        :return: Column value.
+        :rtype: object
+        """
+        query = QSqlQuery(self.connection)
+        query.exec_(sql)
+
+        value = default
+        if query.next():
+            value = query.value(0)
+        query.finish()
+
+        return value
+
+    def apply_pragmas(self):
+        """Apply pragma profile to the open connection.
+
+        An existing database created without auto_vacuum needs a one time
+        VACUUM before incremental vacuum can be used.
 
         :return: None
         :rtype: None
         """
-        query_main = QSqlQuery()
-        query_main.exec_(self._main_table_sql)
-        query_main.finish()
-        if query_main.lastError().isValid():
-            logger.error(query_main.lastError().text())
+        for name, value in self.pragmas.items():
+            if value is not None:
+                self._exec('PRAGMA {} = {}'.format(name, value))
+
+        auto_vacuum = self.pragmas.get('auto_vacuum')
+        if auto_vacuum is not None and self.connection.tables():
+            modes = {'NONE': 0, 'FULL': 1, 'INCREMENTAL': 2}
+            wanted = modes.get(str(auto_vacuum).upper(), auto_vacuum)
+            if int(self._scalar('PRAGMA auto_vacuum', 0)) != int(wanted):
+                logger.info('Converting database to auto_vacuum=%s.',
+                            auto_vacuum)
+                self.vacuum()
 
-        query_data = QSqlQuery()
-        query_data.exec_(self._data_table_sql)
-        query_data.finish()
-        if query_data.lastError().isValid():
-            logger.error(query_data.lastError().text())
+    def user_version(self):
+        """Schema version stored in the database file.
+
+        :return: PRAGMA user_version value.
+        :rtype: int
+        """
+        return int(self._scalar('PRAGMA user_version', 0))
+
+    def set_user_version(self, version):
+        self._exec('PRAGMA user_version = {:d}'.format(version))
+
+    def table_exists(self, name):
+        """Check if table exists in the database.
+
+        :param name: Table name.
+        :type name: str
+
+        :return: True if table exists.
+        :rtype: bool
+        """
+        return name in self.connection.tables()
+
+    def create_tables(self):
+        """Create main, data and blobs table (one to many to one).
+
+        Existing databases are migrated to the current schema before missing
+        tables and indexes are created.
+
+        :return: True if schema is up to date.
+        :rtype: bool
+        """
+        if self.table_exists('main'):
+            if not self.migrate():
+                return False
+        else:
+            self.set_user_version(len(self._migrations))
+
+        self._exec(self._main_table_sql.format(table='main'))
+        self._exec(self._blobs_table_sql)
+        self._exec(self._data_table_sql.format(table='data'))
+
+        for sql in self._trigger_sql + self._index_sql:
+            self._exec(sql)
+
+        self.fts5 = self.create_search_index('main_fts')
+        self.trigram = self.create_search_index(
+            'main_trigram', ", tokenize='trigram'")
 
         return True
 
+    def create_search_index(self, table, options=''):
+        """Create FTS5 index of main.title if SQLite supports it.
+
+        :param table: Name of the virtual table.
+        :type table: str
+
+        :param options: Additional fts5 arguments, i.e. the tokenizer.
+        :type options: str
+
+        :return: True if index is available.
+        :rtype: bool
+        """
+        if not self.table_exists(table):
+            query = QSqlQuery(self.connection)
+            query.exec_(self._fts_table_sql.format(table=table,
+                                                   options=options))
+            query.finish()
+
+            if query.lastError().isValid():
+                logger.info('Search index %s disabled: %s', table,
+                            query.lastError().text())
+                return False
+
+            logger.info('Building search index %s.', table)
+            self._exec("INSERT INTO {0} ({0}) VALUES ('rebuild');".format(
+                table))
+
+        return all(self._exec(sql.format(table=table))
+                   for sql in self._fts_trigger_sql)
+
+    def migrate(self):
+        """Run schema migrations newer than the database's user_version.
+
+        :return: True if all migrations succeeded.
+        :rtype: bool
+        """
+        version = self.user_version()
+        if version >= len(self._migrations):
+            return True
+
+        # tables are rebuilt, can not be changed inside of a transaction
+        self._exec('PRAGMA foreign_keys = OFF')
+
+        success = True
+        for number, migration in enumerate(self._migrations, start=1):
+            if number <= version:
+                continue
+
+            logger.info('Migrating database to version %d.', number)
+            self.connection.transaction()
+            if migration(self):
+                self.connection.commit()
+                self.set_user_version(number)
+            else:
+                self.connection.rollback()
+                logger.error('Database migration %d failed.', number)
+                success = False
+                break
+
+        foreign_keys = self.pragmas.get('foreign_keys')
+        if foreign_keys is not None:
+            self._exec('PRAGMA foreign_keys = {}'.format(foreign_keys))
+
+        return success
+
+    def _migrate_checksum(self):
+        """Version 1: integer checksum column.
+
+        Every entry is kept. Entries sharing a CRC32 checksum may differ,
+        version 6 clears the checksums before the unique index is created
+        and RehashTask removes actual duplicates.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        statements = [
+            self._main_table_sql.format(table='main_new'),
+            """INSERT INTO main_new (id, title, title_short, checksum, keep,
+                created_at)
+            SELECT id, title, title_short, CAST(checksum AS INTEGER), keep,
+                created_at
+            FROM main;""",
+            'DROP TABLE main;',
+            'ALTER TABLE main_new RENAME TO main;',
+        ]
+        return all(self._exec(sql) for sql in statements)
+
+    def _migrate_blobs(self):
+        """Version 2: move data.byte_data into content addressed blobs.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        statements = [
+            self._blobs_table_sql,
+            self._data_table_sql.format(table='data_new'),
+        ]
+        if not all(self._exec(sql) for sql in statements):
+            return False
+
+        select_query = QSqlQuery(self.connection)
+        select_query.setForwardOnly(True)
+        select_query.exec_('SELECT id, parent_id, mime_format, byte_data '
+                           'FROM data')
+
+        while select_query.next():
+            blob_id = DataSqlTableModel.create_blob(select_query.value(3),
+                                                    select_query.value(2))
+
+            insert_query = QSqlQuery(self.connection)
+            insert_query.prepare('INSERT INTO data_new VALUES (:id, '
+                                 ':parent_id, :mime_format, :blob_id)')
+            insert_query.bindValue(':id', select_query.value(0))
+            insert_query.bindValue(':parent_id', select_query.value(1))
+            insert_query.bindValue(':mime_format', select_query.value(2))
+            insert_query.bindValue(':blob_id', blob_id)
+            insert_query.exec_()
+
+            if blob_id is None or insert_query.lastError().isValid():
+                logger.error(insert_query.lastError().text())
+                return False
+
+            insert_query.finish()
+
+        select_query.finish()
+
+        statements = [
+            """UPDATE blobs SET refcount = (
+                SELECT COUNT(*) FROM data_new WHERE blob_id = blobs.id
+            );""",
+            'DROP TABLE data;',
+            'ALTER TABLE data_new RENAME TO data;',
+        ]
+        return all(self._exec(sql) for sql in statements)
+
+    def _migrate_codec(self):
+        """Version 3: codec column for compressed blobs.
+
+        Existing rows are compressed in the background by RecompressTask.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        if self.connection.record('blobs').indexOf('codec') != -1:
+            return True  # created by version 2
+
+        return self._exec('ALTER TABLE blobs ADD COLUMN codec INTEGER '
+                          'NOT NULL DEFAULT 0;')
+
+    def _migrate_path(self):
+        """Version 4: path column for payloads spilled to files.
+
+        Trigger data_blob_unref is recreated by create_tables() and keeps
+        spilled blobs until their file is deleted.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        statements = ['DROP TRIGGER IF EXISTS data_blob_unref;']
+        if self.connection.record('blobs').indexOf('path') == -1:
+            statements.append('ALTER TABLE blobs ADD COLUMN path TEXT;')
+
+        return all(self._exec(sql) for sql in statements)
+
+    def _migrate_cascade(self):
+        """Version 5: delete data rows together with their main row.
+
+        Rebuilds the data table with ON DELETE CASCADE and drops data rows
+        and blobs leaked by earlier retention purges.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        statements = [
+            self._data_table_sql.format(table='data_new'),
+            """INSERT INTO data_new (id, parent_id, mime_format, blob_id)
+            SELECT id, parent_id, mime_format, blob_id FROM data
+            WHERE parent_id IN (SELECT id FROM main);""",
+            'DROP TABLE data;',
+            'ALTER TABLE data_new RENAME TO data;',
+            """UPDATE blobs SET refcount = (
+                SELECT COUNT(*) FROM data WHERE blob_id = blobs.id
+            );""",
+            'DELETE FROM blobs WHERE refcount = 0 AND path IS NULL;',
+        ]
+        return all(self._exec(sql) for sql in statements)
+
+    def _migrate_digest(self):
+        """Version 6: BLAKE2b digest of all formats replaces CRC32 checksum.
+
+        Checksums are cleared and computed again in the background by
+        RehashTask.
+
+        :return: True if migration succeeded.
+        :rtype: bool
+        """
+        statements = [
+            self._main_table_sql.format(table='main_new'),
+            """INSERT INTO main_new (id, title, title_short, checksum, keep,
+                created_at)
+            SELECT id, title, title_short, NULL, keep, created_at
+            FROM main;""",
+            'DROP TABLE main;',
+            'ALTER TABLE main_new RENAME TO main;',
+        ]
+        return all(self._exec(sql) for sql in statements)
+
+    _migrations = [
+        _migrate_checksum,
+        _migrate_blobs,
+        _migrate_codec,
+        _migrate_path,
+        _migrate_cascade,
+        _migrate_digest,
+    ]
+
     def open(self):
         """Alias for QSqlDatabase.open()
 
@@ -82,17 +490,72 @@ class Database(QObject):
         """
         return self.connection.open()
 
-    def close(self):
-        """Perform vacuum on database and then close.
+    def set_query_only(self, enabled):
+        """Reject writes made through this connection.
+
+        Readers of a WAL database do not wait for the writer, so the
+        connection of the view stays responsive while another connection
+        writes.
+
+        :param enabled: True to reject writes.
+        :type enabled: bool
+
+        :return: True if pragma was applied.
+        :rtype: bool
+        """
+        self.query_only = enabled
+        return self._exec('PRAGMA query_only = {:d}'.format(enabled))
+
+    def vacuum(self):
+        """Rebuild the whole database file.
 
         :return: None
         :rtype: None
         """
-        query_data = QSqlQuery()
-        query_data.exec_('VACUUM')
-        query_data.finish()
+        query = QSqlQuery(self.connection)
+        query.exec_('VACUUM')
+        query.finish()
+
+        if query.lastError().isValid():
+            logger.warning(query.lastError().text())
+
+    def reclaim(self):
+        """Release free pages if they take up a significant part of the file.
+
+        Requires auto_vacuum=INCREMENTAL, the cost is proportional to the
+        number of free pages instead of the size of the database.
+
+        :return: Number of free pages before reclaiming.
+        :rtype: int
+        """
+        page_count = int(self._scalar('PRAGMA page_count', 0))
+        free_pages = int(self._scalar('PRAGMA freelist_count', 0))
+
+        if free_pages < self.reclaim_min_pages or \
+                free_pages < page_count * self.reclaim_ratio:
+            return 0
+
+        logger.info('Reclaiming %d of %d pages.', free_pages, page_count)
 
-        if query_data.lastError().isValid():
-            logger.warning(query_data.lastError().text())
+        # each step of incremental_vacuum frees a single page
+        query = QSqlQuery(self.connection)
+        query.exec_('PRAGMA incremental_vacuum({:d})'.format(free_pages))
+        while query.next():
+            pass
+        query.finish()
 
+        if query.lastError().isValid():
+            logger.warning(query.lastError().text())
+
+        return free_pages
+
+    def close(self):
+        """Reclaim free pages, update query planner statistics and close.
+
+        :return: None
+        :rtype: None
+        """
+        if not self.query_only:
+            self.reclaim()
+            self._exec('PRAGMA optimize')
         self.connection.close()
@@ -14,3 +14,13 @@ MIME_SUPPORTED = [
 
 if os.name == 'posix':
     MIME_SUPPORTED.append('x-special/gnome-copied-files')
+
+# Formats compressed in storage and their minimum size in bytes
+MIME_COMPRESS = {
+    'text/html': 1024,
+    'text/html;charset=utf-8': 1024,
+    'text/plain': 4096,
+    'text/plain;charset=utf-8': 4096,
+    'text/richtext': 1024,
+    'application/x-qt-windows-mime;value="Rich Text Format"': 1024,
+}
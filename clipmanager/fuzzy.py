@@ -0,0 +1,447 @@
+import heapq
+import re
+import time
+from itertools import compress, ifilter, izip
+
+# fzf style scoring, see https://github.com/junegunn/fzf/blob/master/src/algo
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 8
+BONUS_CONSECUTIVE = 4
+PENALTY_GAP = 1
+BONUS_RECENCY = 32  # halves after a day, thirds after two...
+
+_SEPARATORS = frozenset(' \t/\\_-.:,;()[]{}<>"\'=@#')
+
+
+def _char_mask(text):
+    """Bit set of characters in text, used to skip titles quickly.
+
+    :param text: Case folded text.
+    :type text: str
+
+    :return: Bit mask.
+    :rtype: int
+    """
+    mask = 0
+    for char in set(text):
+        # 63 bits keep masks plain ints, longs are much slower to compare
+        mask |= 1 << (ord(char) % 63)
+    return mask
+
+
+def _pattern(chars, max_gap=None, groups=False):
+    """Regular expression matching chars in order.
+
+    Every run of negated characters stops at the first occurrence of the
+    next character, which is all a failing match tries again. The match
+    ends after the last character.
+
+    :param chars: Case folded query without whitespace.
+    :type chars: str
+
+    :param max_gap: Characters between matched characters at most, the
+        first character may be anywhere.
+    :type max_gap: int
+
+    :param groups: Capture every matched character, groups 1, 2, 3...
+        Slower, only worth it for titles that are scored.
+    :type groups: bool
+
+    :return: Compiled expression.
+    :rtype: re.RegexObject
+    """
+    gap = '*' if max_gap is None else '{{0,{:d}}}'.format(max_gap)
+    char_format = u'[^{0}]{1}({0})' if groups else u'[^{0}]{1}{0}'
+    return re.compile(u''.join(
+        char_format.format(re.escape(char), '*' if i == 0 else gap)
+        for i, char in enumerate(chars)))
+
+
+class FuzzyIndex(object):
+    """Case folded titles for fuzzy subsequence search.
+
+    Every title is stored case folded and truncated together with a bit set
+    of its characters. A search first drops titles missing any character of
+    the query by comparing bit sets, then matches the remaining titles with
+    a regular expression and scores only those.
+
+    Titles are searched most recently used first. With a limit the best
+    matches are kept in a heap and the search stops once the recency bonus
+    left for older titles cannot lift any of them above the worst kept
+    match. When the query extends the previous one only the previous matches
+    and the titles the previous search did not reach are searched.
+
+    :param max_title: Characters of each title kept in the index.
+    :type max_title: int
+    """
+
+    block_size = 256  # titles matched between checks of the worst result
+
+    def __init__(self, max_title=256):
+        self.max_title = max_title
+
+        self._ids = []
+        self._titles = []
+        self._masks = []
+        self._created_at = []
+        self._slots = {}  # row_id: slot
+        self._removed = 0
+
+        self._order = []  # slots by created_at, least recently used first
+        self._sorted = True
+
+        self._generation = 0
+        self._last_search = None  # (generation, chars, slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, row_id):
+        return row_id in self._slots
+
+    def _fold(self, title):
+        return title[:self.max_title].lower()
+
+    def _changed(self):
+        self._generation += 1
+        self._last_search = None
+
+    def clear(self):
+        self.__init__(self.max_title)
+
+    def load(self, rows):
+        """Replace index contents.
+
+        :param rows: Iterable of (row_id, title, created_at).
+        :type rows: iterable
+
+        :return: None
+        :rtype: None
+        """
+        self.clear()
+        for row_id, title, created_at in rows:
+            self.add(row_id, title, created_at)
+
+    def extend(self, rows, skip=()):
+        """Add titles read in the background, keeping newer changes.
+
+        :param rows: Iterable of (row_id, title, created_at).
+        :type rows: iterable
+
+        :param skip: Row ids removed since rows were read.
+        :type skip: set[int]
+
+        :return: None
+        :rtype: None
+        """
+        for row_id, title, created_at in rows:
+            if row_id not in self._slots and row_id not in skip:
+                self.add(row_id, title, created_at)
+
+    def add(self, row_id, title, created_at):
+        """Add or replace title.
+
+        :param row_id: Main table row ID.
+        :type row_id: int
+
+        :param title: Full title.
+        :type title: str
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: None
+        :rtype: None
+        """
+        if row_id in self._slots:
+            self.remove([row_id])
+
+        title = self._fold(title or '')
+
+        slot = len(self._ids)
+        self._slots[row_id] = slot
+        self._ids.append(row_id)
+        self._titles.append(title)
+        self._masks.append(_char_mask(title))
+        self._created_at.append(created_at)
+        self._append_order(slot)
+        self._changed()
+
+    def _append_order(self, slot):
+        """Append slot to recency order, sort lazily if it is not newest."""
+        order = self._order
+        if order and self._created_at[order[-1]] > self._created_at[slot]:
+            self._sorted = False
+        order.append(slot)
+
+    def touch(self, row_id, created_at):
+        """Update last used timestamp.
+
+        :param row_id: Main table row ID.
+        :type row_id: int
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: None
+        :rtype: None
+        """
+        slot = self._slots.get(row_id)
+        if slot is None:
+            return
+
+        self._created_at[slot] = created_at
+        if self._sorted:
+            self._order.remove(slot)
+            self._append_order(slot)
+        self._changed()
+
+    def remove(self, row_ids):
+        """Remove titles.
+
+        :param row_ids: Main table row IDs.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        for row_id in row_ids:
+            slot = self._slots.pop(row_id, None)
+            if slot is None:
+                continue
+
+            self._ids[slot] = None
+            self._titles[slot] = ''
+            self._masks[slot] = 0
+            self._removed += 1
+
+        self._changed()
+
+        if self._removed > len(self._slots):
+            self._compact()
+
+    def _compact(self):
+        slots = [slot for slot, row_id in enumerate(self._ids)
+                 if row_id is not None]
+
+        self._ids = [self._ids[slot] for slot in slots]
+        self._titles = [self._titles[slot] for slot in slots]
+        self._masks = [self._masks[slot] for slot in slots]
+        self._created_at = [self._created_at[slot] for slot in slots]
+        self._slots = dict((row_id, slot)
+                           for slot, row_id in enumerate(self._ids))
+
+        compacted = dict((slot, new_slot)
+                         for new_slot, slot in enumerate(slots))
+        self._order = [compacted[slot] for slot in self._order
+                       if slot in compacted]
+
+        self._removed = 0
+        self._changed()
+
+    def _recent_first(self):
+        """Slots most recently used first.
+
+        :return: Slots, removed ones included.
+        :rtype: list[int]
+        """
+        if not self._sorted:
+            self._order.sort(key=self._created_at.__getitem__)
+            self._sorted = True
+        return self._order[::-1]
+
+    @staticmethod
+    def max_score(chars):
+        """Highest score a title can get for chars without recency.
+
+        A matched character gets a word boundary or a consecutive bonus,
+        both only if the query character before it is a separator.
+
+        :param chars: Case folded query without whitespace.
+        :type chars: str
+
+        :return: Score.
+        :rtype: int
+        """
+        return len(chars) * (SCORE_MATCH + BONUS_BOUNDARY) + \
+            BONUS_CONSECUTIVE * sum(1 for char in chars[:-1]
+                                    if char in _SEPARATORS)
+
+    @staticmethod
+    def score(title, positions):
+        """Score matched character positions of a title.
+
+        :param title: Case folded title.
+        :type title: str
+
+        :param positions: Index of every matched character.
+        :type positions: list[int]
+
+        :return: Score, higher is better.
+        :rtype: int
+        """
+        score = 0
+        previous = None
+        for position in positions:
+            score += SCORE_MATCH
+            if position == 0 or title[position - 1] in _SEPARATORS:
+                score += BONUS_BOUNDARY
+            if previous is not None:
+                if position == previous + 1:
+                    score += BONUS_CONSECUTIVE
+                else:
+                    score -= PENALTY_GAP * (position - previous - 1)
+            previous = position
+        return score
+
+    def search(self, text, limit=None, now=None):
+        """Find titles containing the characters of text in order.
+
+        :param text: Search box text, whitespace is ignored.
+        :type text: str
+
+        :param limit: Maximum number of results.
+        :type limit: int
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: Matching row ids, best match first.
+        :rtype: list[int]
+        """
+        for row_ids in self.iter_search(text, limit, now):
+            pass
+        return row_ids
+
+    def iter_search(self, text, limit=None, now=None):
+        """Search in steps of block_size titles, see search().
+
+        Yields None after every step and the matching row ids last, so a
+        search can be spread over several event loop iterations. If the
+        index changes between steps the search starts over.
+
+        :param text: Search box text, whitespace is ignored.
+        :type text: str
+
+        :param limit: Maximum number of results.
+        :type limit: int
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: None until the search is done, then matching row ids.
+        :rtype: generator
+        """
+        chars = ''.join(char for char in self._fold(text)
+                        if not char.isspace())
+        if not chars:
+            yield []
+            return
+
+        if now is None:
+            now = int(time.time() * 1000)
+
+        last = self._last_search
+        if last and last[0] == self._generation and chars.startswith(last[1]):
+            slots = last[2]
+        else:
+            slots = self._recent_first()
+
+        query_mask = _char_mask(chars)
+        masks = self._masks
+
+        base = SCORE_MATCH * len(chars) + PENALTY_GAP * (len(chars) - 1)
+        max_score = self.max_score(chars)
+        max_bonus = max_score - SCORE_MATCH * len(chars)
+
+        titles = self._titles
+        created_at = self._created_at
+        ids = self._ids
+        kept = []  # slots extensions of chars may match
+        results = []
+        max_gap = None
+        match = _pattern(chars).match
+        match_groups = _pattern(chars, groups=True).match
+        filter_masks = True
+        stopped = len(slots)
+        generation = self._generation
+        for begin in xrange(0, len(slots), self.block_size):
+            if begin:
+                yield None
+                if self._generation != generation:
+                    for row_ids in self.iter_search(text, limit, now):
+                        yield row_ids
+                    return
+
+            block = slots[begin:begin + self.block_size]
+            if filter_masks:
+                size = len(block)
+                block = [slot for slot in block
+                         if masks[slot] & query_mask == query_mask]
+                # comparing bit sets costs about as much as a failing match,
+                # keep comparing only while most titles are dropped
+                filter_masks = len(block) * 2 < size
+                if not block:
+                    continue
+
+            if limit is not None and len(results) == limit:
+                # gaps older titles can afford and still beat the worst
+                # result, blocks start with their most recent title
+                age = now - created_at[block[0]]
+                allowed = max_score - results[0][0] + (
+                    BONUS_RECENCY / (1.0 + age / 86400000.0) if age > 0
+                    else BONUS_RECENCY)
+                if allowed < 0:
+                    stopped = begin
+                    break
+
+                # a wider gap only matches more titles, compile less often
+                gap = int(allowed) / PENALTY_GAP
+                if max_gap is None or gap < max_gap * 3 / 4:
+                    max_gap = gap
+                    match = _pattern(chars, max_gap).match
+
+            found = map(match, map(titles.__getitem__, block))
+            if max_gap is None:
+                kept.extend(compress(block, found))
+            else:
+                # a wider gap fails the match but not the title
+                kept.extend(block)
+
+            for slot, result in izip(compress(block, found),
+                                     ifilter(None, found)):
+                age = now - created_at[slot]
+                if age > 0:
+                    recency = BONUS_RECENCY / (1.0 + age / 86400000.0)
+                else:
+                    recency = BONUS_RECENCY
+
+                # gaps add up to the span less the matched characters, the
+                # match ends with the last one
+                title = titles[slot]
+                first = title.find(chars[0])
+                score = base - PENALTY_GAP * (result.end() - 1 - first) + \
+                    recency
+                if len(results) == limit and \
+                        score + max_bonus < results[0][0]:
+                    continue
+
+                previous = first - 2
+                for position, __ in match_groups(title).regs[1:]:
+                    if position == previous + 1:
+                        score += BONUS_CONSECUTIVE
+                    if position == 0 or title[position - 1] in _SEPARATORS:
+                        score += BONUS_BOUNDARY
+                    previous = position
+
+                item = (score, created_at[slot], ids[slot])
+                if limit is None or len(results) < limit:
+                    heapq.heappush(results, item)
+                elif item > results[0]:
+                    heapq.heapreplace(results, item)
+
+        self._last_search = (self._generation, chars,
+                             kept + slots[stopped:])
+
+        results.sort(reverse=True)
+        yield [row_id for __, __, row_id in results]
@@ -0,0 +1,98 @@
+import logging
+
+from PySide.QtCore import QThread, Signal
+from PySide.QtSql import QSqlDatabase
+
+from clipmanager.connection import set_connection
+from clipmanager.database import Database
+from clipmanager.models import MainSqlTableModel
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryLoader(QThread):
+    """Read history from a dedicated thread while the window is shown.
+
+    Rows are counted first so the model can extend its first page, then
+    titles are read for the fuzzy index and emitted in chunks so the GUI
+    thread adds them between events.
+
+    :param db_path: Database file.
+    :type db_path: str
+
+    :param pragmas: Overrides for Database.PRAGMAS.
+    :type pragmas: dict
+    """
+    counted = Signal(int)  # rows in main table
+    loaded = Signal(object)  # [(row_id, title, created_at)]
+
+    connection_name = 'loader'
+    chunk_size = 2000
+
+    def __init__(self, db_path, pragmas=None, parent=None):
+        super(HistoryLoader, self).__init__(parent)
+
+        self.db_path = db_path
+        self.pragmas = pragmas
+
+        self.count = True
+        self.titles = False
+
+        self._stopped = False
+
+    def load(self, count=True, titles=False):
+        """Start reading history unless a load is running.
+
+        :param count: Count rows and emit counted.
+        :type count: bool
+
+        :param titles: Read titles and emit loaded.
+        :type titles: bool
+
+        :return: True if the load was started.
+        :rtype: bool
+        """
+        if self.isRunning():
+            return False
+
+        self.count = count
+        self.titles = titles
+        self._stopped = False
+        self.start()
+        return True
+
+    def stop(self):
+        """Skip remaining chunks and wait for the thread.
+
+        :return: None
+        :rtype: None
+        """
+        self._stopped = True
+        self.wait()
+
+    def run(self):
+        """Count rows and read titles.
+
+        :return: None
+        :rtype: None
+        """
+        database = Database(db_path=self.db_path, pragmas=self.pragmas,
+                            connection_name=self.connection_name)
+        database.set_query_only(True)
+        set_connection(self.connection_name)
+
+        if self.count and not self._stopped:
+            self.counted.emit(MainSqlTableModel.count())
+
+        if self.titles and not self._stopped:
+            rows = MainSqlTableModel.titles()
+            for start in range(0, len(rows), self.chunk_size):
+                if self._stopped:
+                    break
+                self.loaded.emit(rows[start:start + self.chunk_size])
+            logger.debug('Loaded %d titles.', len(rows))
+
+        database.close()
+        del database
+        QSqlDatabase.removeDatabase(self.connection_name)
+        set_connection(None)
@@ -1,60 +1,547 @@
+import hashlib
 import logging
+import mmap
+import os
+import re
+import zlib
 
-from PySide.QtCore import QDateTime, Qt
-from PySide.QtSql import QSqlQuery, QSqlTableModel
+from PySide.QtCore import (
+    QAbstractTableModel,
+    QByteArray,
+    QDateTime,
+    QFile,
+    QIODevice,
+    QMimeData,
+    QModelIndex,
+    Qt,
+)
+from PySide.QtSql import QSqlTableModel
+
+from clipmanager import compression
+from clipmanager.connection import database, execute, new_query
+from clipmanager.payload import chunks, to_bytes
 
 logger = logging.getLogger(__name__)
 
+# Payloads of at least this size in bytes are stored in side files.
+SPILL_THRESHOLD = 1048576
+
 
-class MainSqlTableModel(QSqlTableModel):
+class MainSqlTableModel(QAbstractTableModel):
     """Main table model that has children in Data table.
-    
-    Todo:
-        Look into returning Qt.UserRole+1, Qt.UserRole+n, for each column 
-        instead of forcing me to create a new index requesting the specified 
-        column. User role can be used on model().data(index, Qt.UserRole)
-
-        Get PySide model test working.
-        
-        http://stackoverflow.com/questions/13055423/virtual-column-in-qtableview
+
+    Only a window of consecutive rows holding id, title_short and created_at
+    is kept in memory. Rows are read a page at a time when the view asks for
+    them, the window slides along and drops rows at its far end once it
+    holds max_pages pages. Other columns are read for a single row on
+    request.
+
+    Changes are applied to the window and announced to views row by row so
+    selections and scroll positions are kept.
+
+    A filter replaces the history with a list of row ids, e.g. search
+    results, shown in their order.
+
+    At startup select_first() shows the first page without counting rows,
+    set_count() extends it once rows are counted in the background.
+
+    :param page_size: Rows read per query.
+    :type page_size: int
+
+    :param max_pages: Pages kept in memory.
+    :type max_pages: int
+
+    :param select: Count rows now, False leaves the model empty.
+    :type select: bool
     """
     ID, TITLE, TITLE_SHORT, CHECKSUM, KEEP, CREATED_AT = range(6)
+    COLUMNS = ('id', 'title', 'title_short', 'checksum', 'keep', 'created_at')
 
-    def __init__(self, parent=None):
+    PAGE_SIZE = 256
+    MAX_PAGES = 8
+
+    def __init__(self, parent=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES,
+                 select=True):
         super(MainSqlTableModel, self).__init__(parent)
 
-        self.setTable('main')
-        self.setSort(self.CREATED_AT, Qt.DescendingOrder)
-        # submitAll() to make changes, needed for max entries / date check
-        self.setEditStrategy(QSqlTableModel.OnManualSubmit)
+        self.page_size = page_size
+        self.max_pages = max_pages
 
-        self.select()
+        self._count = 0
+        self._start = 0  # model row of first row in window
+        self._window = []  # [(id, title_short, created_at)]
+        self._row_ids = None  # filtered row ids, None shows all rows
 
-        self.setHeaderData(self.ID, Qt.Horizontal, 'id')
-        self.setHeaderData(self.TITLE, Qt.Horizontal, 'title')
-        self.setHeaderData(self.TITLE_SHORT, Qt.Horizontal, 'title_short')
-        self.setHeaderData(self.CHECKSUM, Qt.Horizontal, 'checksum')
-        self.setHeaderData(self.CREATED_AT, Qt.Horizontal, 'created_at')
+        self._counting = False  # count is the first page until set_count()
+        self._changed = False  # rows inserted or removed while counting
+
+        if select:
+            self.select()
 
     def select(self):
-        """Load all records before returning if there is a selection.
+        """Count rows and drop the window.
+
+        :return: True
+        :rtype: bool
+        """
+        self.beginResetModel()
 
-        QSortFilterProxyModel does not show all matching records due to
-        records not being loaded until scrolled.
+        self._start = 0
+        self._window = []
+        if self._row_ids is None:
+            self._count = self.count()
+        else:
+            self._count = len(self._row_ids)
+        self._counting = False
 
-        References:
-        http://qtsimplify.blogspot.com/2013/05/eager-loading.html
+        self.endResetModel()
 
-        :return:
-        :rtype: bool
+        return True
+
+    def select_first(self):
+        """Show the first page of history before rows are counted.
+
+        :return: None
+        :rtype: None
+        """
+        self.beginResetModel()
+
+        self._row_ids = None
+        self._start = 0
+        self._window = self._read_rows(0, self.page_size)
+        self._count = len(self._window)
+        self._counting = len(self._window) == self.page_size
+        self._changed = False
+
+        self.endResetModel()
+
+    def set_count(self, count):
+        """Extend the first page to all rows counted in the background.
+
+        Rows inserted or removed since select_first() may or may not be
+        part of count, the rows are counted again instead.
+
+        :param count: Rows in main table.
+        :type count: int
+
+        :return: None
+        :rtype: None
+        """
+        if not self._counting:
+            return
+        elif self._changed or self._row_ids is not None or \
+                count < self._count:
+            self.select()
+            return
+
+        self._counting = False
+        if count == self._count:
+            return
+
+        self.beginInsertRows(QModelIndex(), self._count, count - 1)
+        self._count = count
+        self.endInsertRows()
+
+    def is_counting(self):
+        return self._counting
+
+    def set_filter(self, row_ids):
+        """Show only row_ids in their order.
+
+        :param row_ids: Row ids, None shows all rows.
+        :type row_ids: list[int] or None
+
+        :return: None
+        :rtype: None
+        """
+        self._row_ids = list(row_ids) if row_ids is not None else None
+        self.select()
+
+    def is_filtered(self):
+        return self._row_ids is not None
+
+    @staticmethod
+    def count():
+        """Count rows in main table.
+
+        :return: Number of rows.
+        :rtype: int
+        """
+        query = new_query()
+        query.exec_('SELECT COUNT(*) FROM main')
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        count = query.value(0) if query.next() else 0
+        query.finish()
+
+        return count
+
+    def _read_rows(self, start, limit, anchor=None, newer=False):
+        """Read consecutive model rows.
+
+        Unfiltered pages next to the window are read after the boundary row
+        of the window, the created_at index seeks to it instead of walking
+        an offset from the top, so scrolling through the whole history reads
+        every row once.
+
+        :param start: First model row.
+        :type start: int
+
+        :param limit: Number of rows.
+        :type limit: int
+
+        :param anchor: Row next to the page, (id, title_short, created_at).
+        :type anchor: tuple or None
+
+        :param newer: Read rows above anchor instead of below it.
+        :type newer: bool
+
+        :return: [(id, title_short, created_at)]
+        :rtype: list[tuple]
+        """
+        query = new_query()
+        row_ids = None
+        if self._row_ids is not None:
+            row_ids = self._row_ids[start:start + limit]
+            # ids are integers, a literal list avoids the bound variable limit
+            query.prepare('SELECT id, title_short, created_at FROM main '
+                          'WHERE id IN ({})'.format(
+                              ','.join(str(int(row_id))
+                                       for row_id in row_ids)))
+        elif anchor is None:
+            # created_at index entries end with the rowid so id breaks ties
+            # in index order
+            query.prepare('SELECT id, title_short, created_at FROM main '
+                          'ORDER BY created_at DESC, id DESC LIMIT :limit '
+                          'OFFSET :offset')
+            query.bindValue(':limit', limit)
+            query.bindValue(':offset', start)
+        else:
+            # range on created_at alone lets the index seek, id only
+            # filters rows sharing the timestamp of anchor
+            if newer:
+                query.prepare('SELECT id, title_short, created_at FROM main '
+                              'WHERE created_at >= :after AND '
+                              '(created_at > :tied OR id > :id) '
+                              'ORDER BY created_at, id LIMIT :limit')
+                query.bindValue(':after', anchor[2])
+            else:
+                query.prepare('SELECT id, title_short, created_at FROM main '
+                              'WHERE created_at <= :before AND '
+                              '(created_at < :tied OR id < :id) '
+                              'ORDER BY created_at DESC, id DESC '
+                              'LIMIT :limit')
+                query.bindValue(':before', anchor[2])
+            query.bindValue(':tied', anchor[2])
+            query.bindValue(':id', anchor[0])
+            query.bindValue(':limit', limit)
+        query.setForwardOnly(True)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2)))
+        query.finish()
+
+        if row_ids is not None:
+            # restore filter order, deleted rows become blank
+            found = dict((row[0], row) for row in rows)
+            rows = [found.get(row_id, (row_id, '', 0)) for row_id in row_ids]
+        elif newer:
+            rows.reverse()
+
+        return rows
+
+    def _row(self, row):
+        """Get row from window, sliding the window over it if needed.
+
+        :param row: Model row.
+        :type row: int
+
+        :return: (id, title_short, created_at) or None if out of range.
+        :rtype: tuple or None
+        """
+        offset = row - self._start
+        if 0 <= offset < len(self._window):
+            return self._window[offset]
+
+        size = self.page_size * self.max_pages
+        end = self._start + len(self._window)
+
+        if self._window and end <= row < end + self.page_size:
+            self._window.extend(self._read_rows(end, self.page_size,
+                                                self._window[-1]))
+            drop = max(len(self._window) - size, 0)
+            del self._window[:drop]
+            self._start += drop
+        elif self._window and self._start - self.page_size <= row < \
+                self._start:
+            first = max(self._start - self.page_size, 0)
+            rows = self._read_rows(first, self._start - first,
+                                   self._window[0], newer=True)
+            self._window[:0] = rows
+            del self._window[size:]
+            self._start -= len(rows)
+        else:
+            self._start = row - row % self.page_size
+            self._window = self._read_rows(self._start, self.page_size)
+
+        offset = row - self._start
+        if 0 <= offset < len(self._window):
+            return self._window[offset]
+        return None
+
+    def row_id(self, row):
+        """Get row id of a model row.
+
+        :param row: Model row.
+        :type row: int
+
+        :return: Row id or None if out of range.
+        :rtype: int or None
+        """
+        if self._row_ids is not None:
+            if 0 <= row < len(self._row_ids):
+                return self._row_ids[row]
+            return None
+
+        cached = self._row(row)
+        return cached[0] if cached else None
+
+    def find_row(self, row_id):
+        """Find model row of row_id without reading rows.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :return: Model row or None if it is not in the window or filter.
+        :rtype: int or None
+        """
+        if self._row_ids is not None:
+            try:
+                return self._row_ids.index(row_id)
+            except ValueError:
+                return None
+
+        for offset, cached in enumerate(self._window):
+            if cached[0] == row_id:
+                return self._start + offset
+        return None
+
+    def _take_row(self, row):
+        """Remove a row from window and filter.
+
+        :param row: Model row.
+        :type row: int
+
+        :return: (id, title_short, created_at) or None if not in window.
+        :rtype: tuple or None
+        """
+        self._count -= 1
+        self._changed = True
+        if self._row_ids is not None:
+            del self._row_ids[row]
+
+        offset = row - self._start
+        if offset < 0:
+            self._start -= 1
+        elif offset < len(self._window):
+            return self._window.pop(offset)
+        return None
+
+    def insert_row(self, row_id, title_short, created_at):
+        """Show a new row at the top.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param title_short: Shorten title.
+        :type title_short: str
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: None
+        :rtype: None
+        """
+        self.beginInsertRows(QModelIndex(), 0, 0)
+
+        self._count += 1
+        self._changed = True
+        if self._row_ids is not None:
+            self._row_ids.insert(0, row_id)
+
+        if self._start == 0:
+            self._window.insert(0, (row_id, title_short, created_at))
+            del self._window[self.page_size * self.max_pages:]
+        else:
+            self._start += 1
+
+        self.endInsertRows()
+
+    def move_to_top(self, row_id, created_at, row=None):
+        """Show a row with an updated timestamp at the top.
+
+        Filtered rows keep their position. Rows outside the window have an
+        unknown position, the model is reset instead.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :param row: Model row if known.
+        :type row: int
+
+        :return: None
+        :rtype: None
+        """
+        if row is None:
+            row = self.find_row(row_id)
+            if row is None:
+                self.select()
+                return
+
+        cached = self._row(row)
+        title_short = cached[1] if cached else self.value(row_id,
+                                                          self.TITLE_SHORT)
+
+        if row == 0 or self._row_ids is not None:
+            offset = row - self._start
+            if 0 <= offset < len(self._window):
+                self._window[offset] = (row_id, title_short, created_at)
+            self.dataChanged.emit(self.index(row, 0),
+                                  self.index(row, self.columnCount() - 1))
+            return
+
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+
+        self._take_row(row)
+        self._count += 1
+        if self._start == 0:
+            self._window.insert(0, (row_id, title_short, created_at))
+            del self._window[self.page_size * self.max_pages:]
+        else:
+            self._start += 1
+
+        self.endMoveRows()
+
+    def remove_ids(self, row_ids):
+        """Remove deleted rows from the view.
+
+        Rows outside the window have an unknown position, the model is reset
+        instead.
+
+        :param row_ids: Deleted row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        rows = [self.find_row(row_id) for row_id in row_ids]
+        if None in rows:
+            self.select()
+            return
+
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self._take_row(row)
+            self.endRemoveRows()
+
+    def remove_purged(self, row_ids):
+        """Remove purged rows from the view.
+
+        Purges remove the least recently used rows, which are at the bottom
+        of the unfiltered history.
+
+        :param row_ids: Purged row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
         """
-        while self.canFetchMore():
-            self.fetchMore()
+        if not row_ids:
+            return
+
+        if self._row_ids is not None:
+            purged = set(row_ids)
+            rows = [row for row, row_id in enumerate(self._row_ids)
+                    if row_id in purged]
+            for row in reversed(rows):
+                self.beginRemoveRows(QModelIndex(), row, row)
+                self._take_row(row)
+                self.endRemoveRows()
+            return
+
+        if self._counting:
+            # bottom of the first page is not the bottom of the history
+            self._changed = True
+            self.remove_ids([row_id for row_id in row_ids
+                             if self.find_row(row_id) is not None])
+            return
+
+        first = max(self._count - len(row_ids), 0)
+        if first == self._count:
+            return
+
+        self.beginRemoveRows(QModelIndex(), first, self._count - 1)
+
+        self._count = first
+        self._changed = True
+        del self._window[max(first - self._start, 0):]
+
+        self.endRemoveRows()
 
-        return super(MainSqlTableModel, self).select()
+    @classmethod
+    def value(cls, row_id, column):
+        """Read a single column of a row.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param column: Column constant, e.g. MainSqlTableModel.TITLE.
+        :type column: int
+
+        :return: Column value or None.
+        :rtype: str, int, or None
+        """
+        query = new_query()
+        query.prepare('SELECT {} FROM main WHERE id=:id'.format(
+            cls.COLUMNS[column]))
+        query.bindValue(':id', row_id)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        value = query.value(0) if query.next() else None
+        query.finish()
+
+        return value
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
 
     def data(self, index, role=Qt.DisplayRole):
-        """Override QSqlTableModel.data()
+        """Get data of cached row or read it from main table.
 
         :param index: Row and column of data entry.
         :type index: QModelIndex
@@ -65,23 +552,32 @@ class MainSqlTableModel(QSqlTableModel):
         :return: Row column data from table.
         :rtype: str, int, or None
         """
-        if not index.isValid():
+        if not index.isValid() or index.row() >= self._count:
+            return None
+
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+
+        cached = self._row(index.row())
+        if cached is None:
             return None
 
-        row = index.row()
+        row_id, title_short, created_at = cached
+        column = index.column()
 
-        if role == Qt.DisplayRole:
-            return QSqlTableModel.data(self, index)
-        elif role == Qt.ToolTipRole:
-            date_index = self.index(row, self.CREATED_AT)
+        if role == Qt.ToolTipRole:
             time_stamp = QDateTime()
-            time_stamp.setMSecsSinceEpoch(QSqlTableModel.data(self, date_index))
+            time_stamp.setMSecsSinceEpoch(created_at)
             date_string = time_stamp.toString(Qt.SystemLocaleShortDate)
             return 'Last used: {!s}'.format(date_string)
-        elif role == Qt.DecorationRole:  # future image icon
-            return None
+        elif column == self.ID:
+            return row_id
+        elif column == self.TITLE_SHORT:
+            return title_short
+        elif column == self.CREATED_AT:
+            return created_at
 
-        return None
+        return self.value(row_id, column)
 
     def flags(self, index):
         """Return item's Qt.ItemFlags in history list view.
@@ -107,8 +603,8 @@ class MainSqlTableModel(QSqlTableModel):
         :param title_short: Shorten title for truncating.
         :type title_short: str
 
-        :param checksum: CRC32 checksum of entity.
-        :type checksum: int
+        :param checksum: Digest of all formats, see capture.checksum().
+        :type checksum: QByteArray
 
         :param created_at: UTC in milliseconds.
         :type created_at: int
@@ -116,7 +612,7 @@ class MainSqlTableModel(QSqlTableModel):
         :return: Row id from SQL INSERT.
         :rtype: int
         """
-        insert_query = QSqlQuery()
+        insert_query = new_query()
         insert_query.prepare('INSERT OR FAIL INTO main (title, title_short, '
                              'checksum, created_at) VALUES (:title, '
                              ':title_short, :checksum, :created_at)')
@@ -134,9 +630,505 @@ class MainSqlTableModel(QSqlTableModel):
 
         return row_id
 
+    @staticmethod
+    def touch(checksum, created_at):
+        """Update timestamp of the row matching checksum.
+
+        :param checksum: Digest of all formats, see capture.checksum().
+        :type checksum: QByteArray
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: Row id of the duplicate or None if checksum is new.
+        :rtype: int or None
+        """
+        select_query = new_query()
+        select_query.prepare('SELECT id FROM main WHERE checksum=:checksum')
+        select_query.bindValue(':checksum', checksum)
+        select_query.exec_()
+
+        if select_query.lastError().isValid():
+            logger.error(select_query.lastError().text())
+
+        row_id = select_query.value(0) if select_query.next() else None
+        select_query.finish()
+
+        if row_id is None:
+            return None
+
+        MainSqlTableModel.touch_id(row_id, created_at)
+
+        return row_id
+
+    @staticmethod
+    def touch_id(row_id, created_at):
+        """Update timestamp of a row.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: True if the row was updated.
+        :rtype: bool
+        """
+        update_query = new_query()
+        update_query.prepare('UPDATE main SET created_at=:created_at '
+                             'WHERE id=:id')
+        update_query.bindValue(':created_at', created_at)
+        update_query.bindValue(':id', row_id)
+        update_query.exec_()
+
+        if update_query.lastError().isValid():
+            logger.error(update_query.lastError().text())
+            return False
+
+        updated = update_query.numRowsAffected() > 0
+        update_query.finish()
+
+        return updated
+
+    @classmethod
+    def touch_or_insert(cls, title, title_short, checksum, created_at):
+        """Insert new row or update timestamp of its duplicate.
+
+        Duplicates are resolved through the unique checksum index so the cost
+        does not depend on the number of rows in the main table.
+
+        :param title: Full title of clipboard contents.
+        :type title: str
+
+        :param title_short: Shorten title for truncating.
+        :type title_short: str
+
+        :param checksum: Digest of all formats, see capture.checksum().
+        :type checksum: QByteArray
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: Row id and True if a new row was inserted.
+        :rtype: tuple[int, bool]
+        """
+        if checksum is not None:
+            row_id = cls.touch(checksum, created_at)
+            if row_id is not None:
+                return row_id, False
+
+        row_id = cls.create(title=title,
+                            title_short=title_short,
+                            checksum=checksum,
+                            created_at=created_at)
+        return row_id, True
+
+    @staticmethod
+    def search(text, now=None):
+        """Search titles through the full text index.
+
+        Every word is matched as a prefix. Results are ranked by bm25 decayed
+        by the number of days since the entry was last used.
+
+        :param text: Search box text.
+        :type text: str
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: Matching row ids, best match first.
+        :rtype: list[int]
+        """
+        words = [word for word in re.split(r'\s+', text) if word]
+        if not words:
+            return []
+
+        match = ' '.join('"{}"*'.format(word.replace('"', '""'))
+                         for word in words)
+        return MainSqlTableModel._ranked_search('main_fts', match, now)
+
+    @staticmethod
+    def titles():
+        """Read the title of every entry for the fuzzy index.
+
+        :return: [(row_id, title, created_at)]
+        :rtype: list[tuple[int, str, int]]
+        """
+        query = new_query()
+        query.setForwardOnly(True)
+        query.exec_('SELECT id, title, created_at FROM main')
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+            return []
+
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2)))
+        query.finish()
+
+        return rows
+
+    @staticmethod
+    def search_fixed(text):
+        """Search titles containing text without an index.
+
+        :param text: Search box text.
+        :type text: str
+
+        :return: Matching row ids, most recently used first.
+        :rtype: list[int]
+        """
+        pattern = re.sub(r'([\\%_])', r'\\\1', text)
+
+        query = new_query()
+        query.setForwardOnly(True)
+        query.prepare('SELECT id FROM main WHERE title LIKE :pattern '
+                      "ESCAPE '\\' ORDER BY created_at DESC, id DESC")
+        query.bindValue(':pattern', '%{}%'.format(pattern))
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+            return []
+
+        row_ids = []
+        while query.next():
+            row_ids.append(query.value(0))
+        query.finish()
+
+        return row_ids
+
+    @staticmethod
+    def search_substring(text, now=None):
+        """Search titles containing text through the trigram index.
+
+        :param text: Search box text, at least three characters.
+        :type text: str
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: Matching row ids, best match first.
+        :rtype: list[int]
+        """
+        if len(text) < 3:
+            raise ValueError('Trigram search requires three characters.')
+
+        match = '"{}"'.format(text.replace('"', '""'))
+        return MainSqlTableModel._ranked_search('main_trigram', match, now)
+
+    @staticmethod
+    def _ranked_search(table, match, now=None):
+        """Query FTS5 table and rank by bm25 and recency.
+
+        :param table: FTS5 table name.
+        :type table: str
+
+        :param match: FTS5 query.
+        :type match: str
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: Matching row ids, best match first.
+        :rtype: list[int]
+        """
+        if now is None:
+            now = QDateTime.currentMSecsSinceEpoch()
+
+        query = new_query()
+        query.prepare('SELECT main.id FROM {0} '
+                      'JOIN main ON main.id = {0}.rowid '
+                      'WHERE {0} MATCH :match '
+                      'ORDER BY bm25({0}) / '
+                      '(1.0 + (:now - main.created_at) / 86400000.0)'
+                      .format(table))
+        query.bindValue(':match', match)
+        query.bindValue(':now', now)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        row_ids = []
+        while query.next():
+            row_ids.append(query.value(0))
+        query.finish()
+
+        return row_ids
+
+    @staticmethod
+    def _purge(where, bindings):
+        """Delete main rows matching where and return their ids.
+
+        :param where: SQL condition on main.
+        :type where: str
+
+        :param bindings: {placeholder: value} used in where.
+        :type bindings: dict
+
+        :return: Deleted row ids.
+        :rtype: list[int]
+        """
+        select_query = new_query()
+        select_query.prepare('SELECT id FROM main WHERE ' + where)
+        for placeholder, value in bindings.items():
+            select_query.bindValue(placeholder, value)
+        select_query.exec_()
+
+        if select_query.lastError().isValid():
+            logger.error(select_query.lastError().text())
+            return []
+
+        row_ids = []
+        while select_query.next():
+            row_ids.append(select_query.value(0))
+        select_query.finish()
+
+        if not row_ids:
+            return []
+
+        delete_query = new_query()
+        delete_query.prepare('DELETE FROM main WHERE ' + where)
+        for placeholder, value in bindings.items():
+            delete_query.bindValue(placeholder, value)
+        delete_query.exec_()
+
+        if delete_query.lastError().isValid():
+            logger.error(delete_query.lastError().text())
+            return []
+
+        delete_query.finish()
+
+        return row_ids
+
+    @staticmethod
+    def delete(row_ids, collect=True):
+        """Delete rows, their data rows are removed by ON DELETE CASCADE.
+
+        :param row_ids: Row ids.
+        :type row_ids: list[int]
+
+        :param collect: Delete unreferenced spilled files, False within a
+            transaction that may still be rolled back.
+        :type collect: bool
+
+        :return: None
+        :rtype: None
+        """
+        row_ids = [int(row_id) for row_id in row_ids]
+        if not row_ids:
+            return
+
+        # ids are integers, a literal list avoids the bound variable limit
+        query = new_query()
+        query.exec_('DELETE FROM main WHERE id IN ({})'.format(
+            ','.join(str(row_id) for row_id in row_ids)))
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        query.finish()
+
+        if collect:
+            DataSqlTableModel.collect_files()
+
+    @classmethod
+    def purge_expired_entries(cls, expire_at, now=None):
+        """Remove entries that have not been used for expire_at days.
+
+        Data rows are removed by ON DELETE CASCADE.
+
+        :param expire_at: Days to keep entries, 0 keeps them forever.
+        :type expire_at: int
+
+        :param now: UTC in milliseconds, defaults to current time.
+        :type now: int
+
+        :return: Deleted row ids.
+        :rtype: list[int]
+        """
+        if not expire_at:
+            return []
+
+        if now is None:
+            now = QDateTime.currentMSecsSinceEpoch()
+
+        return cls._purge('created_at <= :cutoff',
+                          {':cutoff': now - (expire_at + 1) * 86400000})
+
+    @classmethod
+    def purge_max_entries(cls, max_entries):
+        """Remove all but the max_entries most recently used entries.
+
+        The cutoff is the created_at and id of the max_entries-th newest row
+        in history order, read from the created_at index, so the cost does
+        not depend on the size of the history. Rows sharing the cutoff
+        timestamp are cut by id. Data rows are removed by ON DELETE CASCADE.
+
+        :param max_entries: Entries to keep, 0 keeps all of them.
+        :type max_entries: int
+
+        :return: Deleted row ids.
+        :rtype: list[int]
+        """
+        if not max_entries:
+            return []
+
+        query = new_query()
+        query.prepare('SELECT created_at, id FROM main '
+                      'ORDER BY created_at DESC, id DESC LIMIT 1 '
+                      'OFFSET :offset')
+        query.bindValue(':offset', max_entries - 1)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        cutoff = (query.value(0), query.value(1)) if query.next() else None
+        query.finish()
+
+        if cutoff is None:
+            return []
+
+        return cls._purge('created_at < :before OR '
+                          '(created_at = :tied AND id < :id)',
+                          {':before': cutoff[0], ':tied': cutoff[0],
+                           ':id': cutoff[1]})
+
+    @classmethod
+    def capture(cls, title, title_short, checksum, created_at, formats,
+                max_entries=0, expire_at=0, level=compression.DEFAULT_LEVEL,
+                spill_threshold=SPILL_THRESHOLD):
+        """Store clipboard contents in a single savepoint.
+
+        Inserts the main row and its formats, or moves the duplicate to the
+        top, and applies retention. Nothing is stored if any step fails. The
+        savepoint is a transaction of its own unless the caller already
+        started one.
+
+        Spilled files of purged rows and of a rolled back capture are kept,
+        call DataSqlTableModel.collect_files() once the changes are
+        committed or rolled back.
+
+        :param title: Full title of clipboard contents.
+        :type title: str
+
+        :param title_short: Shorten title for truncating.
+        :type title_short: str
+
+        :param checksum: Digest of all formats, see capture.checksum().
+        :type checksum: QByteArray
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :param formats: [[mime_format, byte_data]]
+        :type formats: list[list[str,QByteArray]]
+
+        :param max_entries: Entries to keep, 0 keeps all of them.
+        :type max_entries: int
+
+        :param expire_at: Days to keep entries, 0 keeps them forever.
+        :type expire_at: int
+
+        :param level: zlib compression level, 0 disables compression.
+        :type level: int
+
+        :param spill_threshold: Size in bytes to store payload in a file.
+        :type spill_threshold: int
+
+        :return: Row id or None on failure, True if a new row was inserted
+            and the ids of purged rows.
+        :rtype: tuple[int, bool, list[int]]
+        """
+        if not execute('SAVEPOINT capture'):
+            return None, False, []
+
+        try:
+            row_id, created = cls.touch_or_insert(title, title_short,
+                                                  checksum, created_at)
+            success = row_id is not None
+            purged = []
+
+            if success and created:
+                success = all(
+                    DataSqlTableModel.create(row_id, mime_format, byte_data,
+                                             level, spill_threshold)
+                    is not None for mime_format, byte_data in formats
+                )
+
+            if success:
+                purged = cls.purge_max_entries(max_entries)
+                purged += cls.purge_expired_entries(expire_at, now=created_at)
+        except Exception:
+            logger.exception('Failed to store clipboard contents.')
+            success = False
+
+        if success and execute('RELEASE capture'):
+            return row_id, created, purged
+
+        logger.error('Rolling back clipboard capture.')
+        execute('ROLLBACK TO capture')
+        execute('RELEASE capture')
+        return None, False, []
+
+
+def _blob_dir():
+    """Directory for spilled payloads next to the database file.
+
+    :return: Path to blobs directory.
+    :rtype: str
+    """
+    db_path = database().databaseName()
+    return os.path.join(os.path.dirname(db_path), 'blobs')
+
+
+def _map_file(path):
+    """Map spilled payload read-only into memory.
+
+    :param path: Payload file.
+    :type path: str
+
+    :return: Memory map of the file.
+    :rtype: mmap.mmap
+    """
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _read_file(path):
+    """Read spilled payload, Qt reads the file straight into the QByteArray.
+
+    :param path: Payload file.
+    :type path: str
+
+    :return: Payload.
+    :rtype: QByteArray
+    """
+    payload = QFile(path)
+    if not payload.open(QIODevice.ReadOnly):
+        raise IOError(payload.errorString())
+    byte_data = payload.readAll()
+    payload.close()
+    return byte_data
+
 
 class DataSqlTableModel(QSqlTableModel):
-    ID, PARENT_ID, MIME_FORMAT, BYTE_DATA = range(4)
+    """Mime formats of a main table row.
+
+    Payloads are stored once in the blobs table keyed by their SHA-256
+    digest. Triggers on the data table maintain the blob's reference count
+    and delete it when the last data row referencing it is removed. Large
+    payloads of formats in MIME_COMPRESS are stored compressed.
+
+    Payloads above a spill threshold are written to a file named after their
+    digest in the blobs directory next to the database and are only
+    referenced by blobs.path. Those blobs are kept at refcount 0 until
+    collect_files() removes the file.
+    """
+    ID, PARENT_ID, MIME_FORMAT, BLOB_ID = range(4)
 
     def __init__(self, parent=None):
         super(DataSqlTableModel, self).__init__(parent)
@@ -149,10 +1141,117 @@ class DataSqlTableModel(QSqlTableModel):
         self.setHeaderData(self.ID, Qt.Horizontal, 'id')
         self.setHeaderData(self.PARENT_ID, Qt.Horizontal, 'parent_id')
         self.setHeaderData(self.MIME_FORMAT, Qt.Horizontal, 'mime_format')
-        self.setHeaderData(self.BYTE_DATA, Qt.Horizontal, 'byte_data')
+        self.setHeaderData(self.BLOB_ID, Qt.Horizontal, 'blob_id')
+
+    @staticmethod
+    def digest(byte_data):
+        """Content digest used as the blobs table key.
+
+        :param byte_data: Mime data.
+        :type byte_data: QByteArray or str
+
+        :return: SHA-256 digest.
+        :rtype: QByteArray
+        """
+        sha256 = hashlib.sha256()
+        for chunk in chunks(byte_data):
+            sha256.update(chunk)
+        return QByteArray(sha256.digest())
 
     @staticmethod
-    def create(parent_id, mime_format, byte_data):
+    def spill(digest, byte_data):
+        """Write payload in chunks to a file named after its digest.
+
+        :param digest: Content digest.
+        :type digest: QByteArray
+
+        :param byte_data: Payload.
+        :type byte_data: QByteArray or str
+
+        :return: File name relative to the blobs directory.
+        :rtype: str
+        """
+        blob_dir = _blob_dir()
+        if not os.path.isdir(blob_dir):
+            os.makedirs(blob_dir)
+
+        file_name = digest.toHex().data()
+        path = os.path.join(blob_dir, file_name)
+
+        if not os.path.exists(path):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks(byte_data):
+                    f.write(chunk)
+            os.rename(tmp_path, path)
+
+        return file_name
+
+    @classmethod
+    def create_blob(cls, byte_data, mime_format,
+                    level=compression.DEFAULT_LEVEL,
+                    spill_threshold=SPILL_THRESHOLD):
+        """Insert blob unless a blob with the same content exists.
+
+        :param byte_data: Mime data.
+        :type byte_data: QByteArray or str
+
+        :param mime_format: Mime data format, used to pick compression.
+        :type mime_format: str
+
+        :param level: zlib compression level, 0 disables compression.
+        :type level: int
+
+        :param spill_threshold: Size in bytes to store payload in a file.
+        :type spill_threshold: int
+
+        :return: Row ID of the blob.
+        :rtype: int
+        """
+        digest = cls.digest(byte_data)
+
+        path = None
+        if spill_threshold and len(byte_data) >= spill_threshold:
+            # written from the captured buffer, never copied as a whole
+            path = cls.spill(digest, byte_data)
+            codec, payload = compression.CODEC_NONE, None
+        else:
+            codec, payload = compression.encode(
+                mime_format, to_bytes(byte_data), level)
+
+        insert_query = new_query()
+        insert_query.prepare('INSERT OR IGNORE INTO blobs (digest, codec, '
+                             'byte_data, path) VALUES (:digest, :codec, '
+                             ':byte_data, :path)')
+        insert_query.bindValue(':digest', digest)
+        insert_query.bindValue(':codec', codec)
+        insert_query.bindValue(':byte_data',
+                               QByteArray(payload) if path is None else None)
+        insert_query.bindValue(':path', path)
+        insert_query.exec_()
+
+        if insert_query.lastError().isValid():
+            logger.error(insert_query.lastError().text())
+
+        insert_query.finish()
+
+        select_query = new_query()
+        select_query.prepare('SELECT id FROM blobs WHERE digest=:digest')
+        select_query.bindValue(':digest', digest)
+        select_query.exec_()
+
+        if select_query.lastError().isValid():
+            logger.error(select_query.lastError().text())
+
+        blob_id = select_query.value(0) if select_query.next() else None
+        select_query.finish()
+
+        return blob_id
+
+    @classmethod
+    def create(cls, parent_id, mime_format, byte_data,
+               level=compression.DEFAULT_LEVEL,
+               spill_threshold=SPILL_THRESHOLD):
         """Insert blob into the data table.
 
         :param parent_id: Row ID from main table.
@@ -164,15 +1263,26 @@ class DataSqlTableModel(QSqlTableModel):
         :param byte_data: Mime data based on format converted to QByteArray.
         :type byte_data: QByteArray
 
+        :param level: zlib compression level, 0 disables compression.
+        :type level: int
+
+        :param spill_threshold: Size in bytes to store payload in a file.
+        :type spill_threshold: int
+
         :return: Row ID from SQL INSERT.
         :rtype: int
         """
-        insert_query = QSqlQuery()
+        blob_id = cls.create_blob(byte_data, mime_format, level,
+                                  spill_threshold)
+        if blob_id is None:
+            return None
+
+        insert_query = new_query()
         insert_query.prepare('INSERT OR FAIL INTO data VALUES (NULL, '
-                             ':parent_id, :mime_format, :byte_data)')
+                             ':parent_id, :mime_format, :blob_id)')
         insert_query.bindValue(':parent_id', parent_id)
         insert_query.bindValue(':mime_format', mime_format)
-        insert_query.bindValue(':byte_data', byte_data)
+        insert_query.bindValue(':blob_id', blob_id)
         insert_query.exec_()
 
         if insert_query.lastError().isValid():
@@ -184,25 +1294,125 @@ class DataSqlTableModel(QSqlTableModel):
         return row_id
 
     @staticmethod
-    def read(parent_id):
+    def read_formats(parent_id):
+        """Get stored mime formats of a main table row without payloads.
+
+        :param parent_id: Main table row ID.
+        :type parent_id: int
+
+        :return: ['text/html', 'text/plain']
+        :rtype: list[str]
+        """
+        query = new_query()
+        query.prepare('SELECT mime_format FROM data '
+                      'WHERE parent_id=:parent_id ORDER BY id')
+        query.bindValue(':parent_id', parent_id)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        mime_formats = []
+        while query.next():
+            mime_formats.append(query.value(0))
+
+        query.finish()
+        return mime_formats
+
+    @staticmethod
+    def stored_size(parent_id):
+        """Get size of the payloads of a main table row without reading them.
+
+        Compressed payloads count with their compressed size.
+
+        :param parent_id: Main table row ID.
+        :type parent_id: int
+
+        :return: Size in bytes or None if a payload is spilled to a file.
+        :rtype: int or None
+        """
+        query = new_query()
+        query.prepare('SELECT SUM(LENGTH(blobs.byte_data)), '
+                      'COUNT(blobs.path) FROM data '
+                      'JOIN blobs ON blobs.id = data.blob_id '
+                      'WHERE data.parent_id=:parent_id')
+        query.bindValue(':parent_id', parent_id)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        size = None
+        if query.next() and not query.value(1):
+            size = query.value(0) or 0
+
+        query.finish()
+        return size
+
+    @staticmethod
+    def read(parent_id, formats=None, mapped=True):
         """Get blob from data table.
 
+        Spilled payloads are returned as a read-only memory map of their file
+        instead of being loaded into memory, unless mapped is False.
+
         :param parent_id: Main table row ID.
         :type parent_id: int
 
+        :param formats: Only read these mime formats, defaults to all.
+        :type formats: list[str]
+
+        :param mapped: Map spilled payloads, False reads them into a
+            QByteArray for callers that need one anyway, e.g. QMimeData.
+        :type mapped: bool
+
         :return: [['text/html','blob'],['text/plain','bytes']]
-        :rtype: list[list[str,str]]
+        :rtype: list[list[str,QByteArray or mmap.mmap]]
         """
-        query = QSqlQuery()
-        query.prepare('SELECT * FROM Data WHERE parent_id=:parent_id')
+        if formats is not None and not formats:
+            return []
+
+        statement = ('SELECT data.mime_format, blobs.codec, '
+                     'blobs.byte_data, blobs.path FROM data '
+                     'JOIN blobs ON blobs.id = data.blob_id '
+                     'WHERE data.parent_id=:parent_id')
+        if formats is not None:
+            statement += ' AND data.mime_format IN ({})'.format(
+                ', '.join(':format{:d}'.format(i)
+                          for i in range(len(formats))))
+
+        query = new_query()
+        query.prepare(statement)
         query.bindValue(':parent_id', parent_id)
+        for i, mime_format in enumerate(formats or []):
+            query.bindValue(':format{:d}'.format(i), mime_format)
         query.exec_()
 
         mime_list = []  # [[mime_format, byte_data]]
 
         while query.next():
-            mime_format = query.value(2)
-            byte_data = query.value(3)
+            mime_format = query.value(0)
+            codec = query.value(1)
+            byte_data = query.value(2)
+            path = query.value(3)
+            if path:
+                file_path = os.path.join(_blob_dir(), path)
+                try:
+                    if mapped:
+                        byte_data = _map_file(file_path)
+                    else:
+                        byte_data = _read_file(file_path)
+                except (IOError, OSError, ValueError) as e:
+                    logger.error('Failed to read %s: %s', path, e)
+                    continue
+            elif codec != compression.CODEC_NONE:
+                try:
+                    byte_data = QByteArray(
+                        compression.decode(codec, to_bytes(byte_data)))
+                except (ValueError, zlib.error) as e:
+                    logger.error('Failed to decode %s of row %s: %s',
+                                 mime_format, parent_id, e)
+                    continue
             mime_list.append([mime_format, byte_data])
 
             if query.lastError().isValid():
@@ -212,25 +1422,200 @@ class DataSqlTableModel(QSqlTableModel):
         query.finish()
         return mime_list
 
+    @classmethod
+    def read_mime_data(cls, parent_id):
+        """Rebuild clipboard contents of a main table row.
+
+        :param parent_id: Main table row ID.
+        :type parent_id: int
+
+        :return: Stored mime formats.
+        :rtype: QMimeData
+        """
+        return cls.to_mime_data(cls.read(parent_id, mapped=False))
+
+    @staticmethod
+    def to_mime_data(formats):
+        """Build clipboard contents from read() formats.
+
+        :param formats: [[mime_format, byte_data]]
+        :type formats: list[list[str,QByteArray]]
+
+        :return: Stored mime formats.
+        :rtype: QMimeData
+        """
+        mime_data = QMimeData()
+        for mime_format, byte_data in formats:
+            mime_data.setData(mime_format, byte_data)
+        return mime_data
+
     @staticmethod
-    def delete(parent_ids):
-        """Delete blob from data table.
+    def collect_files():
+        """Delete unreferenced spilled payloads and their blobs.
+
+        Files no blob references at all, written by a capture that was
+        rolled back, are deleted too. Files of uncommitted changes of other
+        connections look the same, so only call this where there are none,
+        the writer thread does between its transactions.
+
+        :return: Number of deleted files.
+        :rtype: int
+        """
+        query = new_query()
+        query.exec_('SELECT id, path FROM blobs '
+                    'WHERE refcount <= 0 AND path IS NOT NULL')
+
+        blob_ids = []
+        while query.next():
+            blob_id, path = query.value(0), query.value(1)
+            try:
+                os.remove(os.path.join(_blob_dir(), path))
+            except OSError as e:
+                if os.path.exists(os.path.join(_blob_dir(), path)):
+                    logger.warning('Failed to delete %s: %s', path, e)
+                    continue  # still mapped, retry on next collection
+            blob_ids.append(blob_id)
+        query.finish()
+
+        for blob_id in blob_ids:
+            delete_query = new_query()
+            delete_query.prepare('DELETE FROM blobs WHERE id=:id '
+                                 'AND refcount <= 0')
+            delete_query.bindValue(':id', blob_id)
+            delete_query.exec_()
+
+            if delete_query.lastError().isValid():
+                logger.error(delete_query.lastError().text())
+
+            delete_query.finish()
+
+        blob_dir = _blob_dir()
+        if not os.path.isdir(blob_dir):
+            return len(blob_ids)
+
+        query = new_query()
+        query.exec_('SELECT path FROM blobs WHERE path IS NOT NULL')
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+            return len(blob_ids)
+
+        referenced = set()
+        while query.next():
+            referenced.add(query.value(0))
+        query.finish()
+
+        orphaned = 0
+        for file_name in os.listdir(blob_dir):
+            if file_name in referenced:
+                continue
+            try:
+                os.remove(os.path.join(blob_dir, file_name))
+                orphaned += 1
+            except OSError as e:
+                logger.warning('Failed to delete %s: %s', file_name, e)
+
+        return len(blob_ids) + orphaned
+
+    @classmethod
+    def delete(cls, parent_ids, collect=True):
+        """Delete rows from data table, unreferenced blobs are removed.
 
         :param parent_ids: Row id of main table.
         :type parent_ids: list[int]
 
+        :param collect: Delete unreferenced spilled files, False within a
+            transaction that may still be rolled back.
+        :type collect: bool
+
         :return: None
         :rtype: None
         """
-        query = QSqlQuery()
-
-        for parent_id in parent_ids:
-            query.prepare('DELETE FROM data WHERE parent_id=:parent_id')
-            query.bindValue(':parent_id', parent_id)
+        parent_ids = [int(parent_id) for parent_id in parent_ids]
+        if not parent_ids:
+            return
 
-        query.exec_()
+        # ids are integers, a literal list avoids the bound variable limit
+        query = new_query()
+        query.exec_('DELETE FROM data WHERE parent_id IN ({})'.format(
+            ','.join(str(parent_id) for parent_id in parent_ids)))
 
         if query.lastError().isValid():
             logger.error(query.lastError().text())
 
         query.finish()
+
+        if collect:
+            cls.collect_files()
+
+
+class LazyMimeData(QMimeData):
+    """Clipboard contents of a main table row read on demand.
+
+    Only the list of formats is read up front. The payload of a format is
+    read from the data table when an application asks for it and kept for
+    later requests, payloads the size of spilled ones are read every time.
+    Call materialize() before the row is deleted to keep the contents on the
+    clipboard.
+
+    :param parent_id: Main table row ID.
+    :type parent_id: int
+    """
+
+    def __init__(self, parent_id):
+        super(LazyMimeData, self).__init__()
+
+        self.parent_id = parent_id
+
+        self._formats = DataSqlTableModel.read_formats(parent_id)
+        self._retrieved = {}  # mime_format: QByteArray
+
+    def formats(self):
+        return list(self._formats)
+
+    def hasFormat(self, mime_format):
+        return mime_format in self._formats
+
+    def retrieveData(self, mime_format, preferred_type):
+        """Read payload of a format when it is requested.
+
+        :param mime_format: Requested mime format.
+        :type mime_format: str
+
+        :param preferred_type: Type the caller would like to get.
+        :type preferred_type: QVariant.Type
+
+        :return: Payload or None if the format is not stored.
+        :rtype: QByteArray or None
+        """
+        if mime_format not in self._formats:
+            return None
+
+        if mime_format in self._retrieved:
+            return self._retrieved[mime_format]
+
+        formats = DataSqlTableModel.read(self.parent_id, [mime_format],
+                                         mapped=False)
+        if not formats:
+            logger.warning('Row %s no longer has %s.', self.parent_id,
+                           mime_format)
+            return None
+
+        byte_data = formats[0][1]
+        if len(byte_data) < SPILL_THRESHOLD:
+            self._retrieved[mime_format] = byte_data
+        return byte_data
+
+    def materialize(self):
+        """Read every format that was not requested yet.
+
+        :return: None
+        :rtype: None
+        """
+        missing = [mime_format for mime_format in self._formats
+                   if mime_format not in self._retrieved]
+        if not missing:
+            return
+
+        for mime_format, byte_data in DataSqlTableModel.read(
+                self.parent_id, missing, mapped=False):
+            self._retrieved[mime_format] = byte_data
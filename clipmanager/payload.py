@@ -0,0 +1,52 @@
+from PySide.QtCore import QByteArray
+
+# Large payloads are hashed and written in chunks of this size in bytes.
+CHUNK_SIZE = 1048576
+
+
+def to_bytes(byte_data):
+    """Return raw bytes of a QByteArray or string.
+
+    :param byte_data: Mime data.
+    :type byte_data: QByteArray or str
+
+    :return: Raw bytes.
+    :rtype: str
+    """
+    if isinstance(byte_data, QByteArray):
+        return byte_data.data()
+    return str(byte_data)
+
+
+def view(byte_data):
+    """Expose payload bytes without copying them.
+
+    :param byte_data: Payload.
+    :type byte_data: QByteArray or mmap.mmap or str
+
+    :return: Buffer over the payload.
+    :rtype: memoryview or buffer or str
+    """
+    for buffer_type in (memoryview, buffer):
+        try:
+            return buffer_type(byte_data)
+        except TypeError:
+            pass
+    return to_bytes(byte_data)
+
+
+def chunks(byte_data, size=CHUNK_SIZE):
+    """Iterate over payload in chunks without copying it as a whole.
+
+    :param byte_data: Payload.
+    :type byte_data: QByteArray or mmap.mmap or str
+
+    :param size: Chunk size in bytes.
+    :type size: int
+
+    :return: Chunks of the payload.
+    :rtype: iterator
+    """
+    payload_view = view(byte_data)
+    for offset in xrange(0, len(payload_view), size):
+        yield payload_view[offset:offset + size]
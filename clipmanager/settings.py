@@ -98,6 +98,18 @@ class Settings(QObject):
     def set_send_paste(self, value):
         self.q_settings.setValue('send_paste', int(value))
 
+    def get_fuzzy_search(self):
+        return int(self.q_settings.value('fuzzy_search', 0))
+
+    def set_fuzzy_search(self, value):
+        self.q_settings.setValue('fuzzy_search', int(value))
+
+    def get_uniform_items(self):
+        return int(self.q_settings.value('uniform_items', 0))
+
+    def set_uniform_items(self, value):
+        self.q_settings.setValue('uniform_items', int(value))
+
     def set_window_pos(self, value):
         self.q_settings.setValue('window_position', value)
 
@@ -116,6 +128,72 @@ class Settings(QObject):
     def set_max_entries_value(self, value):
         self.q_settings.setValue('max_entries', int(value))
 
+    def get_compress_level(self):
+        """Get zlib level used for storing large payloads.
+
+        :return: 0 (disabled) to 9.
+        :rtype: int
+        """
+        return int(self.q_settings.value('compress_level', 6))
+
+    def set_compress_level(self, value):
+        self.q_settings.setValue('compress_level', int(value))
+
+    def get_spill_threshold(self):
+        """Get size at which payloads are stored outside of the database.
+
+        :return: Size in bytes.
+        :rtype: int
+        """
+        return int(self.q_settings.value('spill_threshold', 1048576))
+
+    def set_spill_threshold(self, value):
+        self.q_settings.setValue('spill_threshold', int(value))
+
+    def get_max_entry_size(self):
+        """Get size of the largest clipboard contents that are saved.
+
+        :return: Size in bytes, 0 saves contents of any size.
+        :rtype: int
+        """
+        return int(self.q_settings.value('max_entry_size', 268435456))
+
+    def set_max_entry_size(self, value):
+        self.q_settings.setValue('max_entry_size', int(value))
+
+    def get_capture_window(self):
+        """Get time for a burst of clipboard changes to settle.
+
+        :return: Milliseconds, 0 captures every change.
+        :rtype: int
+        """
+        return int(self.q_settings.value('capture_window', 150))
+
+    def set_capture_window(self, value):
+        self.q_settings.setValue('capture_window', int(value))
+
+    def get_capture_rate(self):
+        """Get maximum rate of clipboard captures.
+
+        :return: Captures per second, 0 disables the limit.
+        :rtype: float
+        """
+        return float(self.q_settings.value('capture_rate', 5))
+
+    def set_capture_rate(self, value):
+        self.q_settings.setValue('capture_rate', float(value))
+
+    def get_recompressed(self):
+        """Get zlib level existing history was compressed with.
+
+        :return: 0 if it was not compressed yet.
+        :rtype: int
+        """
+        return int(self.q_settings.value('recompressed', 0))
+
+    def set_recompressed(self, value):
+        self.q_settings.setValue('recompressed', int(value))
+
     def get_expire_value(self):
         return int(self.q_settings.value('expire_at', 14))
 
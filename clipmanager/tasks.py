@@ -0,0 +1,264 @@
+import logging
+import mmap
+
+from PySide.QtCore import QByteArray, QObject, Signal
+
+from clipmanager import compression
+from clipmanager.capture import checksum
+from clipmanager.connection import new_query
+from clipmanager.models import DataSqlTableModel, MainSqlTableModel
+from clipmanager.payload import to_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class RecompressTask(QObject):
+    """Compress blobs that were stored before compression was added.
+
+    Blobs are processed in small batches by DatabaseWriter.run_task() so
+    captures are not held up while the task runs.
+
+    :param level: zlib compression level.
+    :type level: int
+    """
+    finished = Signal(int, int)  # blobs compressed, bytes saved
+
+    batch_size = 50
+
+    def __init__(self, level=compression.DEFAULT_LEVEL, parent=None):
+        super(RecompressTask, self).__init__(parent)
+
+        self.level = level
+        self.last_id = 0
+        self.compressed = 0
+        self.saved = 0
+
+    def _next_batch(self):
+        """Read next batch of uncompressed blobs.
+
+        :return: [[blob_id, mime_format, raw_bytes]]
+        :rtype: list[list[int,str,str]]
+        """
+        query = new_query()
+        query.prepare('SELECT blobs.id, data.mime_format, blobs.byte_data '
+                      'FROM blobs JOIN data ON data.blob_id = blobs.id '
+                      'WHERE blobs.codec=:codec AND blobs.path IS NULL '
+                      'AND blobs.id > :last_id '
+                      'GROUP BY blobs.id ORDER BY blobs.id LIMIT :limit')
+        query.bindValue(':codec', compression.CODEC_NONE)
+        query.bindValue(':last_id', self.last_id)
+        query.bindValue(':limit', self.batch_size)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        rows = []
+        while query.next():
+            rows.append([query.value(0), query.value(1),
+                         to_bytes(query.value(2))])
+        query.finish()
+
+        return rows
+
+    def state(self):
+        """Progress to restore if a batch is rolled back.
+
+        :return: Last blob id and counters.
+        :rtype: tuple
+        """
+        return self.last_id, self.compressed, self.saved
+
+    def restore(self, state):
+        self.last_id, self.compressed, self.saved = state
+
+    def finish(self):
+        """Report totals, called once the last batch is committed.
+
+        :return: None
+        :rtype: None
+        """
+        logger.info('Recompressed %d blobs, saved %d bytes.',
+                    self.compressed, self.saved)
+        self.finished.emit(self.compressed, self.saved)
+
+    def run_batch(self):
+        """Compress one batch, called within a transaction of the writer.
+
+        :return: True if there may be more blobs to compress and the deleted
+            row ids, always none.
+        :rtype: tuple[bool, list[int]]
+        """
+        rows = self._next_batch()
+        if not rows:
+            return False, []
+
+        for blob_id, mime_format, raw in rows:
+            self.last_id = blob_id
+
+            codec, payload = compression.encode(mime_format, raw, self.level)
+            if codec == compression.CODEC_NONE:
+                continue
+
+            query = new_query()
+            query.prepare('UPDATE blobs SET codec=:codec, '
+                          'byte_data=:byte_data WHERE id=:id')
+            query.bindValue(':codec', codec)
+            query.bindValue(':byte_data', QByteArray(payload))
+            query.bindValue(':id', blob_id)
+            query.exec_()
+
+            if query.lastError().isValid():
+                logger.error(query.lastError().text())
+                continue
+
+            query.finish()
+
+            self.compressed += 1
+            self.saved += len(raw) - len(payload)
+
+        return True, []
+
+
+class RehashTask(QObject):
+    """Compute checksums of entries stored before formats were hashed.
+
+    An entry whose checksum is already used by another entry is a
+    duplicate, the one used least recently is deleted. Deleted row ids are
+    returned to the writer, which emits them once they are committed.
+    """
+    finished = Signal(int, int)  # entries hashed, duplicates deleted
+
+    batch_size = 50
+
+    def __init__(self, parent=None):
+        super(RehashTask, self).__init__(parent)
+
+        self.last_id = 0
+        self.hashed = 0
+        self.duplicates = 0
+
+    def _next_batch(self):
+        """Read next batch of entries without checksum.
+
+        :return: [[row_id, created_at]]
+        :rtype: list[list[int,int]]
+        """
+        query = new_query()
+        query.prepare('SELECT id, created_at FROM main '
+                      'WHERE checksum IS NULL AND id > :last_id '
+                      'ORDER BY id LIMIT :limit')
+        query.bindValue(':last_id', self.last_id)
+        query.bindValue(':limit', self.batch_size)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        rows = []
+        while query.next():
+            rows.append([query.value(0), query.value(1)])
+        query.finish()
+
+        return rows
+
+    @staticmethod
+    def _find(item_checksum):
+        """Find entry that already has a checksum.
+
+        :param item_checksum: Digest of all formats.
+        :type item_checksum: QByteArray
+
+        :return: Row id and created_at or None.
+        :rtype: tuple[int,int] or None
+        """
+        query = new_query()
+        query.prepare('SELECT id, created_at FROM main '
+                      'WHERE checksum=:checksum')
+        query.bindValue(':checksum', item_checksum)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        row = (query.value(0), query.value(1)) if query.next() else None
+        query.finish()
+
+        return row
+
+    @staticmethod
+    def _update(row_id, item_checksum):
+        query = new_query()
+        query.prepare('UPDATE main SET checksum=:checksum WHERE id=:id')
+        query.bindValue(':checksum', item_checksum)
+        query.bindValue(':id', row_id)
+        query.exec_()
+
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+
+        query.finish()
+
+    def state(self):
+        """Progress to restore if a batch is rolled back.
+
+        :return: Last row id and counters.
+        :rtype: tuple
+        """
+        return self.last_id, self.hashed, self.duplicates
+
+    def restore(self, state):
+        self.last_id, self.hashed, self.duplicates = state
+
+    def finish(self):
+        """Report totals, called once the last batch is committed.
+
+        :return: None
+        :rtype: None
+        """
+        logger.info('Rehashed %d entries, deleted %d duplicates.',
+                    self.hashed, self.duplicates)
+        self.finished.emit(self.hashed, self.duplicates)
+
+    def run_batch(self):
+        """Hash one batch, called within a transaction of the writer.
+
+        :return: True if there may be more entries to hash and the row ids
+            of deleted duplicates.
+        :rtype: tuple[bool, list[int]]
+        """
+        rows = self._next_batch()
+        if not rows:
+            return False, []
+
+        duplicates = []
+        for row_id, created_at in rows:
+            self.last_id = row_id
+
+            formats = DataSqlTableModel.read(row_id)
+            item_checksum = checksum(formats)
+            for __, byte_data in formats:
+                if isinstance(byte_data, mmap.mmap):
+                    byte_data.close()
+
+            if item_checksum is None:
+                continue
+
+            existing = self._find(item_checksum)
+            if existing is not None:
+                existing_id, existing_created_at = existing
+                if existing_created_at >= created_at:
+                    duplicates.append(row_id)
+                    continue
+
+                duplicates.append(existing_id)
+                self._update(existing_id, None)
+
+            self._update(row_id, item_checksum)
+            self.hashed += 1
+
+        if duplicates:
+            MainSqlTableModel.delete(duplicates, collect=False)
+            self.duplicates += len(duplicates)
+
+        return True, duplicates
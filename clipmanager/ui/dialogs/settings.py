@@ -64,6 +64,18 @@ class SettingsDialog(QDialog):
             _qcheckbox_state(self.settings.get_send_paste())
         )
 
+        self.fuzzy_check = QCheckBox('Fuzzy search, e.g. "cpmg" finds '
+                                     '"clipmanager"')
+        self.fuzzy_check.setCheckState(
+            _qcheckbox_state(self.settings.get_fuzzy_search())
+        )
+
+        self.uniform_check = QCheckBox('Same height for all entries, faster '
+                                       'with large histories')
+        self.uniform_check.setCheckState(
+            _qcheckbox_state(self.settings.get_uniform_items())
+        )
+
         self.entries_edit = QLineEdit(self)
         self.entries_edit.setText(str(self.settings.get_max_entries_value()))
         self.entries_edit.setToolTip('Ignored if set to 0 days.')
@@ -99,6 +111,8 @@ class SettingsDialog(QDialog):
         main_layout = QVBoxLayout(self)
         main_layout.addLayout(global_form)
         main_layout.addWidget(self.paste_check)
+        main_layout.addWidget(self.fuzzy_check)
+        main_layout.addWidget(self.uniform_check)
         main_layout.addWidget(manage_box)
         main_layout.addWidget(ignore_box)
         main_layout.addWidget(self.button_box)
@@ -120,6 +134,8 @@ class SettingsDialog(QDialog):
         self.settings.set_global_hot_key(self.key_combo_edit.text())
         self.settings.set_lines_to_display(self.line_count_spin.value())
         self.settings.set_send_paste(self.paste_check.isChecked())
+        self.settings.set_fuzzy_search(self.fuzzy_check.isChecked())
+        self.settings.set_uniform_items(self.uniform_check.isChecked())
         self.settings.set_exclude(self.exclude_edit.text())
         self.settings.set_max_entries_value(self.entries_edit.text())
         self.settings.set_expire_value(self.expire_edit.value())
@@ -1,10 +1,11 @@
 import logging
-from itertools import groupby
-from operator import itemgetter
+from collections import OrderedDict
 
 from PySide.QtCore import (
     QCoreApplication,
+    QEvent,
     QModelIndex,
+    QPoint,
     QSize,
     Qt,
     Signal,
@@ -17,10 +18,11 @@ from PySide.QtGui import (
     QListView,
     QMenu,
     QPen,
+    QStaticText,
     QStyle,
     QStyledItemDelegate,
-    QTextDocument,
     QTextOption,
+    QTransform,
 )
 
 from clipmanager.ui.icons import get_icon
@@ -33,12 +35,17 @@ class HistoryListView(QListView):
     set_clipboard = Signal(QModelIndex)
     open_preview = Signal(QModelIndex)
 
+    batch_size = 200  # items laid out per event loop pass
+
     def __init__(self, parent=None):
         super(HistoryListView, self).__init__(parent)
 
         self.parent = parent
 
-        self.setLayoutMode(QListView.SinglePass)
+        # measuring every row at once blocks the event loop on large
+        # histories, the first batch is shown while the rest is laid out
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(self.batch_size)
         self.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.setDragEnabled(False)
@@ -84,6 +91,74 @@ class HistoryListView(QListView):
         self.addAction(self.preview_action)
         self.addAction(self.delete_action)
 
+    def set_uniform_items(self, enabled, lines):
+        """Give all items the height of lines.
+
+        Items are not measured one by one, inserting a row does not lay out
+        the whole list again. Padding is left to the delegate instead of the
+        item style sheet.
+
+        :param enabled: Uniform mode, otherwise every item is measured.
+        :type enabled: bool
+
+        :param lines: Lines to display.
+        :type lines: int
+
+        :return: None
+        :rtype: None
+        """
+        delegate = self.itemDelegate()
+        delegate.uniform_lines = lines if enabled else None
+        delegate.clear_cache()
+
+        self.setUniformItemSizes(enabled)
+        if enabled:
+            self.setStyleSheet('')
+        else:
+            self.setStyleSheet('QListView::item {padding:10px;}')
+
+    def setModel(self, model):
+        """Set model and forget cached items when it is reset.
+
+        Cached items are keyed by row id, moved rows keep them, e.g. the
+        layoutChanged a proxy emits when a row moves to the top.
+
+        :param model: Model.
+        :type model: QAbstractItemModel
+
+        :return: None
+        :rtype: None
+        """
+        QListView.setModel(self, model)
+
+        model.modelReset.connect(self.clear_cache)
+
+    @Slot()
+    def clear_cache(self):
+        """Forget cached item sizes and text, i.e. after lines to display
+        changed.
+
+        :return: None
+        :rtype: None
+        """
+        delegate = self.itemDelegate()
+        if isinstance(delegate, HistoryListItemDelegate):
+            delegate.clear_cache()
+
+    def changeEvent(self, event):
+        """Forget cached item sizes when font or style change.
+
+        :param event: Event.
+        :type event: QEvent
+
+        :return: None
+        :rtype: None
+        """
+        if event.type() in (QEvent.FontChange, QEvent.StyleChange):
+            self.clear_cache()
+
+        return QListView.changeEvent(self, event)
+
     def contextMenuEvent(self, event):
         """Open context menu.
 
@@ -177,27 +252,36 @@ class HistoryListView(QListView):
         selection_rows = set(idx.row() for idx in
                              selection_model.selectedIndexes())
 
-        # delete from data table
+        # delete from main table, data rows are removed by cascade
         parent_indexes = [self.model().index(row, 0) for row in selection_rows]
         parent_ids = filter(lambda p: p is not None,
                             [self.model().data(idx) for idx in parent_indexes])
-        self.parent.data_model.delete(parent_ids)
-
-        # delete from main table and view
-        for k, g in groupby(enumerate(selection_rows), lambda (i, x): i - x):
-            rows = map(itemgetter(1), g)
-            self.model().removeRows(min(rows), len(rows))
+        self.parent.keep_pasted(parent_ids)
+        self.parent.writer.delete(parent_ids)
 
-        self.model().sourceModel().submitAll()
         self.unsetCursor()
 
 
 class HistoryListItemDelegate(QStyledItemDelegate):
     """Subclass painting and style of QListView items."""
+    cache_size = 8192  # item sizes
+    text_cache_size = 512  # laid out titles
+    margin = 4  # around text, same as the QTextDocument default
+    padding = 5  # below text
 
     def __init__(self, parent=None):
         super(HistoryListItemDelegate, self).__init__(parent)
 
+        self._size_hints = OrderedDict()  # (row id, title hash, width): size
+        self._static_texts = OrderedDict()  # (row id, title hash): text
+        self._font_key = None
+
+        self.uniform_lines = None  # height of every item in lines
+
+        self.text_option = QTextOption()
+        self.text_option.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        self.text_option.setWrapMode(QTextOption.NoWrap)
+
     def paint(self, painter, option, index):
         """Subclass of paint function.
 
@@ -219,38 +303,80 @@ class HistoryListItemDelegate(QStyledItemDelegate):
         if not index.isValid():
             return QStyledItemDelegate.paint(self, painter, option, index)
 
+        self._check_font(option.font)
+
         painter.save()
+        painter.setFont(option.font)
 
         # draw selection highlight
         if option.state & QStyle.State_Selected:
             painter.setPen(QPen(option.palette.highlightedText(), 0))
             painter.fillRect(option.rect, option.palette.highlight())
 
-        # Set alignment and enable word wrap if applicable
-        text_option = QTextOption()
-        text_option.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        text_option.setWrapMode(QTextOption.NoWrap)
-
         # add left and right padding to text
         text_rect = option.rect
         text_rect.setLeft(text_rect.left() + 5)
         text_rect.setRight(text_rect.right() - 5)
 
-        painter.drawText(text_rect, index.data(), o=text_option)
+        static_text = self.static_text(index, option.font)
+        top = text_rect.top() + \
+            (text_rect.height() - static_text.size().height()) / 2
+
+        painter.setClipRect(text_rect, Qt.IntersectClip)
+        painter.drawStaticText(QPoint(text_rect.left(), int(top)),
+                               static_text)
         painter.restore()
 
-    def sizeHint(self, option, index):
-        """Calculate option size.
+    def static_text(self, index, font):
+        """Get title of an item laid out for painting.
 
-        Calculated by creating a QTextDocument with modified text and
-        determining the dimensions.
+        :param index: Item index.
+        :type index: QModelIndex
 
-        Todo:
-        * Look into using font metrics bounding rect.
-        * Handle lines to display in relation to word wrap.
+        :param font: Item font.
+        :type font: QFont
 
-        References:
-        http://qt-project.org/forums/viewthread/12186
+        :return: Laid out title.
+        :rtype: QStaticText
+        """
+        text = index.data() or ''
+        key = (index.sibling(index.row(), 0).data(), hash(text))
+
+        static_text = self._static_texts.pop(key, None)
+        if static_text is None:
+            static_text = QStaticText(text)
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.setTextOption(self.text_option)
+            static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+            static_text.prepare(QTransform(), font)
+
+            if len(self._static_texts) >= self.text_cache_size:
+                self._static_texts.popitem(last=False)
+
+        self._static_texts[key] = static_text
+        return static_text
+
+    def _check_font(self, font):
+        """Clear caches if the item font changed.
+
+        :param font: Item font.
+        :type font: QFont
+
+        :return: None
+        :rtype: None
+        """
+        font_key = font.key()
+        if font_key != self._font_key:
+            self.clear_cache()
+            self._font_key = font_key
+
+    def sizeHint(self, option, index):
+        """Calculate option size from font metrics.
+
+        Titles are already truncated to the lines to display, so the height
+        is the line spacing times the number of lines, or uniform_lines if
+        set. Sizes are cached per row id, title and width, the cache is
+        cleared when the font changes.
 
         :param option:
         :type option: QStyleOptionViewItem
@@ -264,37 +390,49 @@ class HistoryListItemDelegate(QStyledItemDelegate):
         if not index.isValid():
             return QStyledItemDelegate.sizeHint(self, option, index)
 
-        # WARNING: Inserting self creates a memory leak!
-        doc = QTextDocument()
+        self._check_font(option.font)
 
-        text_option = QTextOption()
-        text_option.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        text_option.setWrapMode(QTextOption.NoWrap)
+        text = index.data() or ''
+        key = (index.sibling(index.row(), 0).data(), hash(text),
+               option.rect.width())
 
-        doc.setDefaultTextOption(text_option)
-        doc.setPlainText(index.data())
+        size = self._size_hints.pop(key, None)
+        if size is None:
+            size = self.text_size(option.fontMetrics, text)
+            if len(self._size_hints) >= self.cache_size:
+                self._size_hints.popitem(last=False)
 
-        # add padding to each item
-        return QSize(doc.size().width(), doc.size().height() + 5)
+        self._size_hints[key] = size
+        return size
 
-    # def sizeHint(self, option, index):
-    #     if not index.isValid():
-    #         return QStyledItemDelegate.sizeHint(self, option, index)
+    def text_size(self, font_metrics, text):
+        """Size of unwrapped text including margins and padding.
+
+        :param font_metrics: Metrics of the item font.
+        :type font_metrics: QFontMetrics
 
-    #     fake_text = 'Line1\nLine2\nLine3\n'
-    #     fake_fm = option.fontMetrics
-    #     fake_font_rect = fake_fm.boundingRect(option.rect, Qt.AlignLeft|Qt.AlignTop|Qt.TextWordWrap, fake_text)
+        :param text: Item text.
+        :type text: str
+
+        :return: Size of the item.
+        :rtype: QSize
+        """
+        lines = text.split('\n')
+        width = max(font_metrics.width(line) for line in lines)
+        height = font_metrics.lineSpacing() * (self.uniform_lines or
+                                               len(lines))
 
-    #     real_text = index.data()
-    #     real_fm = option.fontMetrics
-    #     real_font_rect = real_fm.boundingRect(option.rect, Qt.AlignLeft|Qt.AlignTop|Qt.TextWordWrap, real_text)
+        return QSize(width + 2 * self.margin,
+                     height + 2 * self.margin + self.padding)
 
-    #     if real_font_rect.height() < fake_font_rect.height():
-    #         height = real_font_rect.height()
-    #     else:
-    #         height = fake_font_rect.height()
+    def clear_cache(self):
+        """Forget cached sizes and laid out titles.
 
-    #     return QSize(real_font_rect.width(), height+10)
+        :return: None
+        :rtype: None
+        """
+        self._size_hints.clear()
+        self._static_texts.clear()
 
     # def flags(self, index):
     #     """Sublass of flags method.
@@ -1,20 +1,19 @@
-import datetime
 import logging
-import zlib
+import time
 
 from PySide.QtCore import (
     QDateTime,
+    QEvent,
     QMimeData,
     QModelIndex,
-    QTextCodec,
-    QTextEncoder,
+    QTimer,
     Qt,
     Signal,
     Slot,
 )
 from PySide.QtGui import (
+    QApplication,
     QCursor,
-    QDesktopWidget,
     QGridLayout,
     QItemSelectionModel,
     QMainWindow,
@@ -25,18 +24,26 @@ from PySide.QtGui import (
 )
 
 from clipmanager import __title__, hotkey, owner, paste
+from clipmanager.cache import PayloadCache
+from clipmanager.capture import CapturePipeline
 from clipmanager.clipboard import ClipboardManager
 from clipmanager.database import Database
-from clipmanager.defs import MIME_SUPPORTED
-from clipmanager.models import DataSqlTableModel, MainSqlTableModel
+from clipmanager.fuzzy import FuzzyIndex
+from clipmanager.loader import HistoryLoader
+from clipmanager.models import (
+    DataSqlTableModel,
+    LazyMimeData,
+    MainSqlTableModel,
+)
 from clipmanager.settings import Settings
+from clipmanager.tasks import RecompressTask, RehashTask
 from clipmanager.ui.dialogs.preview import PreviewDialog
 from clipmanager.ui.dialogs.settings import SettingsDialog
 from clipmanager.ui.historylist import HistoryListView
 from clipmanager.ui.icons import get_icon
 from clipmanager.ui.searchedit import SearchEdit, SearchFilterProxyModel
 from clipmanager.ui.systemtray import SystemTrayIcon
-from clipmanager.utils import format_title, truncate_lines
+from clipmanager.writer import DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
@@ -74,12 +81,29 @@ class MainWindow(QMainWindow):
         self.main_widget = MainWidget(self)
         self.setCentralWidget(self.main_widget)
 
+        self.open_window_at = self.settings.get_open_window_at()
+
+        # available screen area, refreshed when screens change
+        self.screen_bounds = None
+        self.desktop = QApplication.desktop()
+        self.desktop.resized.connect(self.update_screen_bounds)
+        self.desktop.workAreaResized.connect(self.update_screen_bounds)
+        self.desktop.screenCountChanged.connect(self.update_screen_bounds)
+        self.update_screen_bounds()
+
+        # toggle_window() to first paint of the history list
+        self._opened_at = None
+        self.open_latency = [0, 0.0, 0.0]  # count, total and max seconds
+        self.main_widget.history_view.viewport().installEventFilter(self)
+
         # Return OS specific global hot key binder and set it
         self.hotkey = hotkey.initialize()
         self.paste = paste.initialize()
 
         if not minimize:
             self.toggle_window()
+        else:
+            QTimer.singleShot(0, self.prewarm)
 
         self.register_hot_key()
 
@@ -128,12 +152,81 @@ class MainWindow(QMainWindow):
             )
             return False
 
+    def eventFilter(self, watched, event):
+        """Measure time from toggle_window() to first paint of the list.
+
+        :param watched: History list viewport.
+        :type watched: QWidget
+
+        :param event: Event.
+        :type event: QEvent
+
+        :return: False, events are not filtered out.
+        :rtype: bool
+        """
+        if event.type() == QEvent.Paint and self._opened_at is not None:
+            latency = time.time() - self._opened_at
+            self._opened_at = None
+
+            self.open_latency[0] += 1
+            self.open_latency[1] += latency
+            self.open_latency[2] = max(self.open_latency[2], latency)
+            logger.debug('Window painted after %.1f ms.', latency * 1000)
+
+        return QMainWindow.eventFilter(self, watched, event)
+
+    @Slot(int)
+    def update_screen_bounds(self, screen=None):
+        """Cache area available on all screens for positioning the window.
+
+        :param screen: Changed screen, all screens are read again.
+        :type screen: int
+
+        :return: None
+        :rtype: None
+        """
+        # Determine global coordinates by summing screen(s) coordinates
+        x_max = 0
+        y_max = 999999
+        for number in range(0, self.desktop.screenCount()):
+            geometry = self.desktop.availableGeometry(number)
+            x_max += geometry.width()
+            y_max = min(y_max, geometry.height())
+
+        # Minimum x and y screen coordinates
+        x_min, y_min, __, __ = self.desktop.availableGeometry().getCoords()
+
+        self.screen_bounds = (x_min, y_min, x_max, y_max)
+
+    @Slot()
+    def prewarm(self):
+        """Polish hidden window and lay out its first rows.
+
+        :return: None
+        :rtype: None
+        """
+        if self.isVisible():
+            return
+
+        self.resize(self.settings.get_window_size())
+        self.ensurePolished()
+        self.layout().activate()
+
+        self.main_widget.history_view.doItemsLayout()
+        self.main_widget.check_selection()
+
     def destroy(self):
         """Perform cleanup before exiting the application.
 
         :return: None
         :rtype: None
         """
+        count, total, maximum = self.open_latency
+        if count:
+            logger.info('Window opened %d times, mean %.1f ms, max %.1f ms '
+                        'to first paint.', count, total * 1000 / count,
+                        maximum * 1000)
+
         self.main_widget.destroy()
 
         if self.hotkey:
@@ -180,7 +273,17 @@ class MainWindow(QMainWindow):
         # Attempt to set new hot key
         self.register_hot_key()
 
+        # Apply new retention settings
+        self.main_widget.keep_pasted()
+        self.main_widget.writer.purge(self.settings.get_max_entries_value(),
+                                      self.settings.get_expire_value())
+
+        self.main_widget.history_view.set_uniform_items(
+            self.settings.get_uniform_items(),
+            self.settings.get_lines_to_display())
         self.main_widget.main_model.select()
+        self.main_widget.load_fuzzy_index()
+        self.open_window_at = self.settings.get_open_window_at()
         self.unsetCursor()
 
     @Slot()
@@ -202,24 +305,15 @@ class MainWindow(QMainWindow):
             self.settings.set_window_pos(self.pos())
             self.settings.set_window_size(self.size())
             self.hide()
-        else:
-            # Desktop number based on cursor
-            desktop = QDesktopWidget()
-
-            # Determine global coordinates by summing screen(s) coordinates
-            x_max = 0
-            y_max = 999999
-            for screen in range(0, desktop.screenCount()):
-                x_max += desktop.availableGeometry(screen).width()
 
-                y_screen = desktop.availableGeometry(screen).height()
-                if y_screen < y_max:
-                    y_max = y_screen
+            # lay out rows captured while hidden before the next open
+            QTimer.singleShot(0, self.prewarm)
+        else:
+            self._opened_at = time.time()
 
-            # Minimum x and y screen coordinates
-            x_min, y_min, __, __ = desktop.availableGeometry().getCoords()
+            x_min, y_min, x_max, y_max = self.screen_bounds
 
-            open_window_at = self.settings.get_open_window_at()
+            open_window_at = self.open_window_at
             if open_window_at == 2:  # 2: System tray
                 x = self.system_tray.geometry().x()
                 y = self.system_tray.geometry().y()
@@ -249,9 +343,14 @@ class MainWindow(QMainWindow):
             self.move(x, y)
             self.resize(window_size.width(), window_size.height())
 
+            # select before showing so the first paint is the final one
+            self.main_widget.check_selection()
+
             self.show()
             self.activateWindow()
-            self.main_widget.check_selection()
+
+            # read likely pastes once the window is painted
+            QTimer.singleShot(0, self.main_widget.prefetch_top)
 
     @Slot()
     def paste_clipboard(self):
@@ -263,6 +362,8 @@ class MainWidget(QWidget):
     open_settings = Signal()
     paste_clipboard = Signal()
 
+    prefetch_rows = 5  # top rows read ahead when the window opens
+
     def __init__(self, parent=None):
         super(MainWidget, self).__init__(parent)
 
@@ -273,19 +374,74 @@ class MainWidget(QWidget):
         self.database = Database(self)
         self.database.create_tables()
 
+        # writes go through the writer thread, reads through this connection
+        self.writer = DatabaseWriter(self.database.connection.databaseName(),
+                                     self.database.pragmas, self)
+        self.writer.start()
+        self.database.set_query_only(True)
+
+        self.capture_pipeline = CapturePipeline(
+            self.writer,
+            max_size=self.settings.get_max_entry_size(),
+            parent=self
+        )
+        self.payload_cache = PayloadCache()
+
         self.ignore_created = False
+        self.pasted_mime_data = None  # LazyMimeData set by set_clipboard()
 
-        self.clipboard_manager = ClipboardManager(self)
+        self.clipboard_manager = ClipboardManager(
+            self,
+            capture_window=self.settings.get_capture_window(),
+            capture_rate=self.settings.get_capture_rate()
+        )
         self.window_owner = owner.initialize()
 
         self.history_view = HistoryListView(self)
+        self.history_view.set_uniform_items(
+            self.settings.get_uniform_items(),
+            self.settings.get_lines_to_display())
 
-        self.main_model = MainSqlTableModel(self)
+        # first page now, the rest is counted by the loader thread
+        self.main_model = MainSqlTableModel(self, select=False)
+        self.main_model.select_first()
         self.data_model = DataSqlTableModel(self)
 
-        self.search_proxy = SearchFilterProxyModel(self)
+        self.history_loader = HistoryLoader(
+            self.database.connection.databaseName(),
+            self.database.pragmas,
+            self
+        )
+        self._loading_removed = None  # row ids removed while loading
+
+        # compress history again once the level changes, 0 has nothing to do
+        compress_level = self.settings.get_compress_level()
+        if compress_level and \
+                self.settings.get_recompressed() != compress_level:
+            self.recompress_task = RecompressTask(compress_level, self)
+            self.recompress_task.finished.connect(self.recompress_finished)
+            self.writer.run_task(self.recompress_task)
+
+        # entries without checksum were stored before formats were hashed,
+        # duplicates it deletes are announced by writer.deleted
+        self.rehash_task = RehashTask(self)
+        self.writer.run_task(self.rehash_task)
+
+        self.search_proxy = SearchFilterProxyModel(
+            self,
+            full_text=self.database.fts5,
+            substring=self.database.trigram
+        )
         self.search_proxy.setSourceModel(self.main_model)
 
+        self.fuzzy_index = FuzzyIndex()
+
+        self.history_loader.counted.connect(self.main_model.set_count)
+        self.history_loader.loaded.connect(self.titles_loaded)
+        self.history_loader.finished.connect(self.history_loaded)
+        self.load_fuzzy_index()
+        self.load_history()
+
         self.history_view.setModel(self.search_proxy)
         self.history_view.setModelColumn(self.main_model.TITLE_SHORT)
 
@@ -305,163 +461,151 @@ class MainWidget(QWidget):
         self.setLayout(layout)
 
         self.clipboard_manager.new_item.connect(self.new_item)
+        self.capture_pipeline.failed.connect(self.capture_failed)
+
+        self.writer.captured.connect(self.item_captured)
+        self.writer.touched.connect(self.item_touched)
+        self.writer.deleted.connect(self.items_deleted)
+        self.writer.purged.connect(self.items_deleted)
 
         self.search_box.returnPressed.connect(self.set_clipboard)
-        self.search_box.textChanged.connect(
-            self.search_proxy.setFilterFixedString)
-        self.search_box.textChanged.connect(self.check_selection)
+        self.search_box.textChanged.connect(self.search_proxy.search)
+        self.search_proxy.searched.connect(self.check_selection)
 
         self.history_view.set_clipboard.connect(self.set_clipboard)
         self.history_view.open_preview.connect(self.open_preview)
+        self.history_view.selectionModel().currentChanged.connect(
+            self.prefetch_current)
 
-    def create_item_title(self, mime_data):
-        """Create full title from clipboard mime data.
-
-        Extract a title from QMimeData using urls, html, or text.
+    def load_fuzzy_index(self):
+        """Fill fuzzy index with titles if fuzzy search is enabled.
 
-        :param mime_data:
-        :type mime_data: QMimeData
-
-        :return: Full title or None if it did not have any text/html/url.
-        :rtype: str or None
+        :return: None
+        :rtype: None
         """
-        if mime_data.hasUrls():
-            urls = [url.toString() for url in mime_data.urls()]
-            return 'Copied File(s):\n' + '\n'.join(urls)
-        elif mime_data.hasText():
-            return mime_data.text()
-        elif mime_data.hasHtml():  # last resort
-            return mime_data.html()
+        if self.settings.get_fuzzy_search():
+            self.search_proxy.fuzzy_index = self.fuzzy_index
+            if not len(self.fuzzy_index):
+                self.load_history()
         else:
-            self.parent.system_tray.showMessage(
-                'Clipboard',
-                'Failed to get clipboard mime data formats.',
-                icon=QSystemTrayIcon.Warning,
-                msecs=5000
-            )
-            return None
-
-    def get_item_checksum(self, mime_data):
-        """Calculate CRC checksum based on urls, html, or text.
+            self.fuzzy_index.clear()
+            self.search_proxy.fuzzy_index = None
 
-        :param mime_data: Data from clipboard.
-        :type mime_data: QMimeData
+    def load_history(self):
+        """Count rows and read fuzzy index titles in the loader thread.
 
-        :return: CRC32 checksum.
-        :rtype: int
+        :return: None
+        :rtype: None
         """
-        if mime_data.hasUrls():
-            checksum_str = str(mime_data.urls())
-        elif mime_data.hasHtml():
-            checksum_str = mime_data.html()
-        elif mime_data.hasText():
-            checksum_str = mime_data.text()
-        else:
-            self.parent.system_tray.showMessage(
-                'Clipboard',
-                'Failed to get clipboard text/html/urls.',
-                icon=QSystemTrayIcon.Warning,
-                msecs=5000
-            )
-            return None
+        count = self.main_model.is_counting()
+        titles = self.search_proxy.fuzzy_index is not None and \
+            not len(self.fuzzy_index)
 
-        # encode unicode characters for crc library
-        codec = QTextCodec.codecForName('UTF-8')
-        encoder = QTextEncoder(codec)
-        byte_array = encoder.fromUnicode(checksum_str)  # QByteArray
+        if (count or titles) and self.history_loader.load(count, titles):
+            self._loading_removed = set()
 
-        checksum = zlib.crc32(byte_array)
-        return checksum
+    @Slot(object)
+    def titles_loaded(self, rows):
+        """Add a chunk of titles read by the loader to the fuzzy index.
 
-    def destroy(self):
-        self.main_model.submitAll()
-        self.database.close()
+        :param rows: [(row_id, title, created_at)]
+        :type rows: list[tuple[int, str, int]]
 
-    def find_duplicate(self, checksum):
-        """Checks for a duplicate row in Main table.
+        :return: None
+        :rtype: None
+        """
+        if self.search_proxy.fuzzy_index is not None:
+            self.fuzzy_index.extend(rows, self._loading_removed or ())
 
-        :param checksum: CRC32 string to search for.
-        :type checksum: int
+    @Slot()
+    def history_loaded(self):
+        """Search again with all titles and load what was requested since.
 
-        :return: True if duplicate found and False if not found.
-        :rtype: bool
+        :return: None
+        :rtype: None
         """
-        for row in range(self.main_model.rowCount()):
-            source_index = self.main_model.index(row, self.main_model.CHECKSUM)
-            checksum_source = self.main_model.data(source_index)
+        titles = self.history_loader.titles
+        self._loading_removed = None
+        logger.debug('History loaded, %d rows, %d titles.',
+                     self.main_model.rowCount(), len(self.fuzzy_index))
 
-            # update row created_at timestamp
-            if str(checksum) == str(checksum_source):
-                self.main_model.setData(
-                    self.main_model.index(row, self.main_model.CREATED_AT),
-                    QDateTime.currentMSecsSinceEpoch()
-                )
-                self.main_model.submitAll()
-                return True
+        if titles and self.search_box.text():
+            self.search_proxy.search(self.search_box.text())
+        elif not titles:
+            self.load_history()
 
-        return False
+    def row_id(self, proxy_index):
+        """Get main table row id of a history view index.
 
-    def purge_expired_entries(self):
-        """Remove entries that have expired.
+        :param proxy_index: Index of the search proxy.
+        :type proxy_index: QModelIndex
 
-        Starting at the bottom of the list, compare each item's date to user
-        set expire in X days. If item is older than setting, remove it from
-        database.
+        :return: Row id or None if index is not valid.
+        :rtype: int or None
+        """
+        source_index = self.search_proxy.mapToSource(proxy_index)
+        if not source_index.isValid():
+            return None
+        return self.main_model.row_id(source_index.row())
+
+    @Slot()
+    def prefetch_top(self):
+        """Read payloads of the most recent rows into the cache.
 
         :return: None
         :rtype: None
         """
-        expire_at = self.settings.get_expire_value()
-        if int(expire_at) == 0:
-            return
-
-        entries = range(0, self.main_model.rowCount())
-        entries.reverse()  # sort by oldest
-
-        for row in entries:
-            index = self.main_model.index(row, self.main_model.CREATED_AT)
-            created_at = self.main_model.data(index)
-
-            # Convert from ms to s
-            time = datetime.datetime.fromtimestamp(created_at / 1000)
-            today = datetime.datetime.today()
-            delta = today - time
-
-            if delta.days > expire_at:
-                index = self.main_model.index(row, self.main_model.ID)
-                parent_id = self.main_model.data(index)
+        rows = min(self.prefetch_rows, self.search_proxy.rowCount())
+        self.payload_cache.prefetch(
+            [self.row_id(self.search_proxy.index(row, 0))
+             for row in range(rows)])
 
-                self.data_model.delete([parent_id])
-                self.main_model.removeRow(row)
-            else:
-                break
+    @Slot(QModelIndex, QModelIndex)
+    def prefetch_current(self, current, previous):
+        """Read small payloads of the selected row and its neighbours.
 
-        self.main_model.submitAll()
+        Runs on the GUI thread, PayloadCache.prefetch() skips rows stored
+        larger than max_prefetch_bytes and spilled rows.
 
-    def purge_max_entries(self):
-        """Remove extra entries.
+        :param current: Selected index.
+        :type current: QModelIndex
 
-        Count total number of items in history, and if greater than user
-        setting for maximum entries, delete_item them.
+        :param previous: Previously selected index.
+        :type previous: QModelIndex
 
         :return: None
         :rtype: None
         """
-        max_entries = self.settings.get_max_entries_value()
-        if max_entries == 0:
+        if not current.isValid() or not self.isVisible():
             return
 
-        row_count = self.main_model.rowCount() + 1
-
-        if row_count > max_entries:
-            for row in range(max_entries - 1, row_count):
-                index_id = self.main_model.index(row, self.main_model.ID)
-                parent_id = self.main_model.data(index_id)
-
-                self.data_model.delete(parent_id)
-                self.main_model.removeRow(row)
+        row = current.row()
+        rows = range(max(row - 1, 0),
+                     min(row + 2, self.search_proxy.rowCount()))
+        self.payload_cache.prefetch(
+            [self.row_id(self.search_proxy.index(neighbour, 0))
+             for neighbour in rows])
 
-        self.main_model.submitAll()
+    def destroy(self):
+        logger.info('Payload cache: %d hits, %d misses, %d prefetched.',
+                    self.payload_cache.hits, self.payload_cache.misses,
+                    self.payload_cache.prefetched)
+
+        scheduler = self.clipboard_manager.scheduler
+        if scheduler is not None:
+            logger.info('Clipboard changes: %s.', ', '.join(
+                '{} {:d}'.format(name, count)
+                for name, count in scheduler.stats().items()))
+
+        self.capture_pipeline.flush()
+        for stage, (count, mean, maximum) in \
+                self.capture_pipeline.stats().items():
+            logger.info('Capture stage %s: %d runs, mean %.1f ms, '
+                        'max %.1f ms.', stage, count, mean, maximum)
+
+        self.history_loader.stop()
+        self.writer.stop()
+        self.database.close()
 
     @Slot(str)
     def check_selection(self):
@@ -486,7 +630,7 @@ class MainWidget(QWidget):
         :param mime_data: Clipboard contents mime data
         :type mime_data: QMimeData
 
-        :return: True, if successfully added.
+        :return: True, if queued for adding.
         :rtype: bool
         """
         if self.settings.get_disconnect():
@@ -494,6 +638,8 @@ class MainWidget(QWidget):
         elif self.ignore_created:
             self.ignore_created = False
             return False
+        elif self.clipboard_manager.owns_clipboard():
+            return False  # our own paste, touched by set_clipboard
 
         # Check if process that set clipboard is on exclude list
         window_names = self.window_owner()
@@ -504,46 +650,141 @@ class MainWidget(QWidget):
             logger.info('Ignoring copy from application.')
             return False
 
-        title = self.create_item_title(mime_data)
-        if not title:
-            self.parent.system_tray.showMessage(
-                'Clipboard',
-                'Failed to get clipboard contents.',
-                icon=QSystemTrayIcon.Warning,
-                msecs=5000
-            )
-            return None
+        self.capture_pipeline.submit(
+            mime_data,
+            QDateTime.currentMSecsSinceEpoch(),
+            {
+                'lines': self.settings.get_lines_to_display(),
+                'max_entries': self.settings.get_max_entries_value(),
+                'expire_at': self.settings.get_expire_value(),
+                'level': self.settings.get_compress_level(),
+                'spill_threshold': self.settings.get_spill_threshold(),
+            }
+        )
 
-        title_short = format_title(title)
-        title_short = truncate_lines(title_short,
-                                     self.settings.get_lines_to_display())
-        created_at = QDateTime.currentMSecsSinceEpoch()
+        return True
 
-        checksum = self.get_item_checksum(mime_data)
-        if checksum and self.find_duplicate(checksum):
-            return None
+    @Slot(str)
+    def capture_failed(self, message):
+        """Notify that clipboard contents could not be captured.
+
+        :param message: Reason.
+        :type message: str
 
-        parent_id = self.main_model.create(title=title,
-                                           title_short=title_short,
-                                           checksum=checksum,
-                                           created_at=created_at)
+        :return: None
+        :rtype: None
+        """
+        self.parent.system_tray.showMessage(
+            'Clipboard',
+            message,
+            icon=QSystemTrayIcon.Warning,
+            msecs=5000
+        )
 
-        for mime_format in MIME_SUPPORTED:
-            if mime_data.hasFormat(mime_format):
-                byte_data = mime_data.data(mime_format)
-                self.data_model.create(parent_id, mime_format, byte_data)
+    @Slot(object)
+    def item_captured(self, result):
+        """Show stored clipboard contents.
 
-        self.purge_max_entries()
-        self.purge_expired_entries()
+        :param result: Arguments and result of MainSqlTableModel.capture().
+        :type result: dict
 
-        # Highlight top item and then insert mime data
-        self.main_model.select()  # Update view
+        :return: None
+        :rtype: None
+        """
+        parent_id = result['row_id']
+        created = result['created']
+        created_at = result['created_at']
+        purged = result['purged']
+
+        if parent_id is None:
+            return
+
+        if self._loading_removed is not None:
+            self._loading_removed.update(purged)
+
+        if self.search_proxy.fuzzy_index is not None:
+            self.fuzzy_index.remove(purged)
+            if created:
+                self.fuzzy_index.add(parent_id, result['title'], created_at)
+            else:
+                self.fuzzy_index.touch(parent_id, created_at)
+
+        # update view without reloading rows, search again to match new row
+        if self.main_model.is_filtered():
+            self.search_proxy.search(self.search_box.text())
+        else:
+            self.main_model.remove_purged(purged)
+            if created:
+                self.main_model.insert_row(parent_id, result['title_short'],
+                                           created_at)
+            else:
+                self.main_model.move_to_top(parent_id, created_at)
+
+        if not created:
+            return  # duplicate moved to top
+
+        # Highlight top item
         index = QModelIndex(
             self.history_view.model().index(0, self.main_model.TITLE_SHORT)
         )
         self.history_view.setCurrentIndex(index)
 
-        return True
+    @Slot(object, object)
+    def item_touched(self, row_id, created_at):
+        """Move used item to the top.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: None
+        :rtype: None
+        """
+        self.fuzzy_index.touch(row_id, created_at)
+        self.main_model.move_to_top(row_id, created_at)
+
+    @Slot(object)
+    def items_deleted(self, row_ids):
+        """Remove deleted or purged items.
+
+        :param row_ids: Row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        if self._loading_removed is not None:
+            self._loading_removed.update(row_ids)
+
+        self.payload_cache.discard(row_ids)
+        self.fuzzy_index.remove(row_ids)
+        self.main_model.remove_ids(row_ids)
+
+    @Slot(int, int)
+    def recompress_finished(self, compressed, saved):
+        """Report space saved by compressing existing history.
+
+        :param compressed: Number of compressed blobs.
+        :type compressed: int
+
+        :param saved: Bytes saved.
+        :type saved: int
+
+        :return: None
+        :rtype: None
+        """
+        self.settings.set_recompressed(self.recompress_task.level)
+
+        if compressed:
+            self.parent.system_tray.showMessage(
+                'History',
+                'Compressed {:d} entries and saved {:.1f} MB.'.format(
+                    compressed, saved / 1048576.0),
+                icon=QSystemTrayIcon.Information,
+                msecs=5000
+            )
 
     @Slot(QModelIndex)
     def open_preview(self, selection_index):
@@ -555,14 +796,8 @@ class MainWidget(QWidget):
         :return: None
         :rtype: None
         """
-        source_index = self.search_proxy.mapToSource(selection_index)
-        source_row = source_index.row()
-        model_index = self.main_model.index(source_row, self.main_model.ID)
-        parent_id = self.main_model.data(model_index)
-
-        mime_data = QMimeData()
-        for mime_format, byte_data in self.data_model.read(parent_id):
-            mime_data.setData(mime_format, byte_data)
+        parent_id = self.row_id(selection_index)
+        mime_data = self.payload_cache.mime_data(parent_id)
 
         preview_dialog = PreviewDialog(mime_data, parent=self)
         preview_dialog.exec_()
@@ -581,25 +816,38 @@ class MainWidget(QWidget):
         self.window().hide()
         self.ignore_created = True
 
-        source_index = self.search_proxy.mapToSource(selection_index)
-        source_row = source_index.row()
-        model_index = self.main_model.index(source_row, self.main_model.ID)
-        parent_id = self.main_model.data(model_index)
-
-        mime_data = QMimeData()
-        for mime_type, byte_data in self.data_model.read(parent_id):
-            mime_data.setData(mime_type, byte_data)
+        parent_id = self.row_id(selection_index)
+        mime_data = self.payload_cache.mime_data(parent_id)
 
+        self.pasted_mime_data = mime_data \
+            if isinstance(mime_data, LazyMimeData) else None
         self.clipboard_manager.set_text(mime_data)
 
         if self.settings.get_send_paste():
             self.paste_clipboard.emit()
 
-        self.main_model.setData(
-            self.main_model.index(model_index.row(),
-                                  self.main_model.CREATED_AT),
-            QDateTime.currentMSecsSinceEpoch())
-        self.main_model.submitAll()
+        self.writer.touch(parent_id, QDateTime.currentMSecsSinceEpoch())
+
+    def keep_pasted(self, row_ids=None):
+        """Read pasted contents that are still on the clipboard into memory.
+
+        Lazy contents are read from their row, call this before the row is
+        deleted.
+
+        :param row_ids: Row ids about to be deleted, None if unknown.
+        :type row_ids: list[int] or None
+
+        :return: None
+        :rtype: None
+        """
+        mime_data = self.pasted_mime_data
+        if mime_data is None:
+            return
+        elif not self.clipboard_manager.owns_clipboard():
+            self.pasted_mime_data = None
+        elif row_ids is None or mime_data.parent_id in row_ids:
+            mime_data.materialize()
+            self.pasted_mime_data = None
 
     @Slot()
     def emit_open_settings(self):
@@ -1,6 +1,7 @@
 import logging
+import time
 
-from PySide.QtCore import Qt, Slot
+from PySide.QtCore import QTimer, Qt, Signal, Slot
 from PySide.QtGui import QLineEdit, QSortFilterProxyModel
 
 from clipmanager.models import MainSqlTableModel
@@ -9,28 +10,95 @@ logger = logging.getLogger(__name__)
 
 
 class SearchFilterProxyModel(QSortFilterProxyModel):
-    """Search database using fixed string."""
+    """Search database using an index or fixed string.
 
-    def __init__(self, parent=None):
+    Searches of at least three characters match any substring through the
+    trigram index if available, shorter ones scan titles with a fixed
+    string. Without the trigram index every query matches each of its words
+    as a prefix through the full text index if available.
+    Setting fuzzy_index replaces all of them with fuzzy subsequence
+    matching of the best fuzzy_limit titles. A fuzzy search runs at most
+    fuzzy_budget milliseconds per event loop iteration, so typing is not
+    blocked while a long query is matched against every title.
+
+    Results are applied as a filter of MainSqlTableModel so rows are never
+    loaded just to be matched, the proxy itself passes rows through.
+
+    :param full_text: Search through MainSqlTableModel.search() instead of
+        matching titles with a fixed string.
+    :type full_text: bool
+
+    :param substring: Search through MainSqlTableModel.search_substring().
+    :type substring: bool
+    """
+
+    searched = Signal()  # rows filtered
+
+    def __init__(self, parent=None, full_text=False, substring=False):
         super(SearchFilterProxyModel, self).__init__(parent)
 
-        self.setFilterKeyColumn(MainSqlTableModel.TITLE)
-        self.setDynamicSortFilter(True)
-        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.full_text = full_text
+        self.substring = substring
+        self.fuzzy_index = None  # FuzzyIndex
+        self.fuzzy_limit = 50
+        self.fuzzy_budget = 20
+        self._fuzzy_search = None  # generator of FuzzyIndex.iter_search()
+
+        self.setDynamicSortFilter(False)
 
     @Slot(str)
-    def setFilterFixedString(self, *args):
-        """Fetch rows from source model before filtering.
+    def search(self, text):
+        """Filter and rank rows matching search text.
+
+        :param text: Search box text.
+        :type text: str
 
-        :param args: Filter string.
-        :type args: tuple[str]
+        :return: None
+        :rtype: None
+        """
+        self._fuzzy_search = None
+
+        if not text.strip():
+            row_ids = None
+        elif self.fuzzy_index is not None:
+            self._fuzzy_search = self.fuzzy_index.iter_search(
+                text, limit=self.fuzzy_limit)
+            self.continue_search()
+            return
+        elif self.substring and len(text) >= 3:
+            row_ids = MainSqlTableModel.search_substring(text)
+        elif self.full_text and not self.substring:
+            row_ids = MainSqlTableModel.search(text)
+        else:
+            row_ids = MainSqlTableModel.search_fixed(text)
+
+        self.sourceModel().set_filter(row_ids)
+        self.searched.emit()
+
+    @Slot()
+    def continue_search(self):
+        """Run fuzzy search until done or out of budget.
+
+        Filters rows once the search is done, otherwise continues on the
+        next event loop iteration. A search replaced by a newer one stops.
 
         :return: None
         :rtype: None
         """
-        while self.sourceModel().canFetchMore():
-            self.sourceModel().fetchMore()
-        QSortFilterProxyModel.setFilterFixedString(self, *args)
+        search = self._fuzzy_search
+        if search is None:
+            return
+
+        deadline = time.time() + self.fuzzy_budget / 1000.0
+        for row_ids in search:
+            if row_ids is not None:
+                self._fuzzy_search = None
+                self.sourceModel().set_filter(row_ids)
+                self.searched.emit()
+                return
+            if time.time() > deadline:
+                QTimer.singleShot(0, self.continue_search)
+                return
 
 
 class SearchEdit(QLineEdit):
@@ -1,8 +1,15 @@
 import logging
+import re
 import textwrap
 
 logger = logging.getLogger(__name__)
 
+# Line boundaries of unicode.splitlines()
+_LINE_BREAK = re.compile(u'\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+# Characters of a short title at most
+MAX_TITLE_CHARS = 2048
+
 
 def format_title(title):
     """Format clipboard text for display in history view list.
@@ -17,6 +24,32 @@ def format_title(title):
     return modified.replace('\t', '    ')
 
 
+def iter_lines(text, max_chars=None):
+    """Iterate over lines of text without splitting all of it.
+
+    :param text: Single or multi-line string.
+    :type text: str
+
+    :param max_chars: Characters of a line to scan at most, a longer line is
+        cut and ends the iteration.
+    :type max_chars: int
+
+    :return: Lines without line breaks.
+    :rtype: iterator
+    """
+    start = 0
+    size = len(text)
+    while start < size:
+        end = size if max_chars is None else min(size, start + max_chars)
+        match = _LINE_BREAK.search(text, start, end)
+        if match is None:
+            yield text[start:end]
+            return
+
+        yield text[start:match.start()]
+        start = match.end()
+
+
 def truncate_lines(text, count):
     """Truncate string based on line count.
 
@@ -33,8 +66,58 @@ def truncate_lines(text, count):
     :return: Truncated text string.
     :rtype: str
     """
-    lines = [line for line in text.splitlines() if line.strip()]
-    text = '\n'.join(lines[:count])
-    if len(lines) > count:
+    lines = []
+    truncated = False
+    for line in iter_lines(text):
+        if line.strip():
+            if len(lines) == count:
+                truncated = True
+                break
+            lines.append(line)
+
+    text = '\n'.join(lines)
+    if truncated:
+        text += '...'
+    return text
+
+
+def build_title_short(title, count, max_chars=MAX_TITLE_CHARS):
+    """Create display title from the first non-blank lines of a title.
+
+    Same result as truncate_lines(format_title(title), count) except that
+    the indentation is only removed based on the displayed lines and the
+    result is cut at max_chars. Only the beginning of title is scanned.
+
+    :param title: Full title.
+    :type title: str
+
+    :param count: Number of lines to return.
+    :type count: int
+
+    :param max_chars: Characters to return at most, excluding '...'.
+    :type max_chars: int
+
+    :return: Truncated text string.
+    :rtype: str
+    """
+    lines = []
+    chars = 0
+    truncated = False
+    for line in iter_lines(title, max_chars + 1):
+        if not line.strip():
+            continue
+        elif len(lines) == count or chars > max_chars:
+            truncated = True
+            break
+
+        lines.append(line)
+        chars += len(line) + 1
+
+    text = textwrap.dedent('\n'.join(lines)).replace('\t', '    ')
+    if len(text) > max_chars:
+        text = text[:max_chars]
+        truncated = True
+
+    if truncated:
         text += '...'
     return text
@@ -0,0 +1,322 @@
+import logging
+import Queue
+
+from PySide.QtCore import QThread, Signal
+from PySide.QtSql import QSqlDatabase
+
+from clipmanager.connection import set_connection
+from clipmanager.database import Database
+from clipmanager.models import DataSqlTableModel, MainSqlTableModel
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter(QThread):
+    """Apply all writes to the database from a dedicated thread.
+
+    Commands are queued by the GUI thread and applied in batches, each batch
+    in a single transaction. Completion signals are emitted after the batch
+    is committed so views reading through another connection see the
+    changes. Spilled files of deleted rows are removed after the commit as
+    well, a rolled back batch still references them. So are files written
+    by rolled back captures, which nothing references.
+
+    Each command runs in a savepoint, a command that raises is rolled back
+    without affecting the rest of the batch. If the batch cannot be
+    committed its commands are applied again one per transaction, captures
+    that still fail are reported with a row id of None. Tasks are restored
+    to their progress before a rolled back batch.
+
+    :param db_path: Database file.
+    :type db_path: str
+
+    :param pragmas: Overrides for Database.PRAGMAS.
+    :type pragmas: dict
+    """
+    captured = Signal(object)  # dict of capture arguments and result
+    touched = Signal(object, object)  # row id, created_at
+    deleted = Signal(object)  # row ids
+    purged = Signal(object)  # row ids
+
+    connection_name = 'writer'
+    batch_size = 64
+
+    def __init__(self, db_path, pragmas=None, parent=None):
+        super(DatabaseWriter, self).__init__(parent)
+
+        self.db_path = db_path
+        self.pragmas = pragmas
+
+        self.queue = Queue.Queue()
+
+        self._collect = False  # batch left files that may be unreferenced
+
+    def capture(self, context=None, **kwargs):
+        """Queue MainSqlTableModel.capture().
+
+        :param context: Passed back in the captured result.
+        :type context: object
+
+        :param kwargs: Arguments of MainSqlTableModel.capture().
+        :type kwargs: dict
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(('capture', (kwargs, context)))
+
+    def touch(self, row_id, created_at):
+        """Queue timestamp update of a row.
+
+        :param row_id: Row id.
+        :type row_id: int
+
+        :param created_at: UTC in milliseconds.
+        :type created_at: int
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(('touch', (row_id, created_at)))
+
+    def delete(self, row_ids):
+        """Queue deletion of rows.
+
+        :param row_ids: Row ids.
+        :type row_ids: list[int]
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(('delete', list(row_ids)))
+
+    def purge(self, max_entries, expire_at):
+        """Queue retention of history.
+
+        :param max_entries: Entries to keep, 0 keeps all of them.
+        :type max_entries: int
+
+        :param expire_at: Days to keep entries, 0 keeps them forever.
+        :type expire_at: int
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(('purge', (max_entries, expire_at)))
+
+    def run_task(self, task):
+        """Queue a task that runs in batches between other commands.
+
+        Row ids a batch deleted are emitted with deleted once the batch is
+        committed, finish() is called once the last batch is committed.
+
+        :param task: Object with run_batch() returning whether there is more
+            to do and the row ids it deleted, state() and restore() to undo
+            progress of a rolled back batch and finish().
+        :type task: RecompressTask
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(('task', task))
+
+    def stop(self):
+        """Apply queued commands, close connection and wait for the thread.
+
+        :return: None
+        :rtype: None
+        """
+        self.queue.put(None)
+        self.wait()
+
+    def _next_batch(self):
+        """Wait for a command and take queued ones up to batch_size.
+
+        :return: Commands, None marks the end.
+        :rtype: list
+        """
+        commands = [self.queue.get()]
+        while len(commands) < self.batch_size and commands[-1] is not None:
+            try:
+                commands.append(self.queue.get_nowait())
+            except Queue.Empty:
+                break
+        return commands
+
+    def _apply(self, command, argument):
+        """Apply a single command.
+
+        :param command: Command name.
+        :type command: str
+
+        :param argument: Command argument.
+        :type argument: object
+
+        :return: Callbacks to run after commit and their arguments.
+        :rtype: list[tuple]
+        """
+        if command == 'capture':
+            kwargs, context = argument
+            row_id, created, purged = MainSqlTableModel.capture(**kwargs)
+            result = dict(kwargs, row_id=row_id, created=created,
+                          purged=purged, context=context)
+            result.pop('formats', None)
+            self._collect = self._collect or bool(purged) or row_id is None
+            return [(self.captured.emit, (result,))]
+        elif command == 'touch':
+            if MainSqlTableModel.touch_id(*argument):
+                return [(self.touched.emit, argument)]
+        elif command == 'delete':
+            MainSqlTableModel.delete(argument, collect=False)
+            self._collect = True
+            return [(self.deleted.emit, (argument,))]
+        elif command == 'purge':
+            max_entries, expire_at = argument
+            purged = MainSqlTableModel.purge_max_entries(max_entries)
+            purged += MainSqlTableModel.purge_expired_entries(expire_at)
+            if purged:
+                self._collect = True
+                return [(self.purged.emit, (purged,))]
+        elif command == 'task':
+            more, deleted = argument.run_batch()
+            results = []
+            if deleted:
+                self._collect = True
+                results.append((self.deleted.emit, (deleted,)))
+            if more:
+                results.append((self.queue.put, ((command, argument),)))
+            else:
+                results.append((argument.finish, ()))
+            return results
+        return []
+
+    def _failed(self, command, argument):
+        """Report a command that was not applied.
+
+        :param command: Command name.
+        :type command: str
+
+        :param argument: Command argument.
+        :type argument: object
+
+        :return: Callback to run and its arguments or None.
+        :rtype: tuple or None
+        """
+        logger.error('Dropped %s command.', command)
+
+        if command == 'capture':
+            kwargs, context = argument
+            result = dict(kwargs, row_id=None, created=False, purged=[],
+                          context=context)
+            result.pop('formats', None)
+            return self.captured.emit, (result,)
+        return None
+
+    @staticmethod
+    def _exec(database, sql):
+        """Execute a statement on the writer connection and log any error.
+
+        :param database: Connection of the writer thread.
+        :type database: Database
+
+        :param sql: SQL statement.
+        :type sql: str
+
+        :return: True if statement succeeded.
+        :rtype: bool
+        """
+        query = database.connection.exec_(sql)
+        if query.lastError().isValid():
+            logger.error(query.lastError().text())
+            return False
+        return True
+
+    def _apply_batch(self, database, commands):
+        """Apply commands in a single transaction.
+
+        :param database: Connection of the writer thread.
+        :type database: Database
+
+        :param commands: [(command, argument)]
+        :type commands: list[tuple]
+
+        :return: Callbacks to run and their arguments, None if the
+            transaction was rolled back.
+        :rtype: list[tuple] or None
+        """
+        database.connection.transaction()
+
+        results = []
+        states = []  # [(task, state)] before the batch
+        for command, argument in commands:
+            state = None
+            if command == 'task':
+                state = argument.state()
+                states.append((argument, state))
+
+            self._exec(database, 'SAVEPOINT command')
+            try:
+                results.extend(self._apply(command, argument))
+            except Exception:
+                logger.exception('Failed to apply %s.', command)
+                self._exec(database, 'ROLLBACK TO command')
+                if state is not None:
+                    argument.restore(state)
+                self._collect = True
+                result = self._failed(command, argument)
+                if result is not None:
+                    results.append(result)
+            self._exec(database, 'RELEASE command')
+
+        if not database.connection.commit():
+            logger.error(database.connection.lastError().text())
+            database.connection.rollback()
+            for task, state in states:
+                task.restore(state)
+            self._collect = True
+            return None
+
+        return results
+
+    def run(self):
+        """Apply commands until stop() is called.
+
+        :return: None
+        :rtype: None
+        """
+        database = Database(db_path=self.db_path, pragmas=self.pragmas,
+                            connection_name=self.connection_name)
+        set_connection(self.connection_name)
+
+        running = True
+        while running:
+            commands = self._next_batch()
+            if commands[-1] is None:
+                running = False
+                commands.pop()
+
+            if not commands:
+                continue
+
+            results = self._apply_batch(database, commands)
+            if results is None:
+                # find the failing command instead of dropping the batch
+                results = []
+                for command in commands:
+                    batch = self._apply_batch(database, [command])
+                    if batch is None:
+                        batch = [self._failed(*command)]
+                    results.extend(result for result in batch
+                                   if result is not None)
+
+            for callback, args in results:
+                callback(*args)
+
+            if self._collect:
+                self._collect = False
+                DataSqlTableModel.collect_files()
+
+        database.close()
+        del database
+        QSqlDatabase.removeDatabase(self.connection_name)
+        set_connection(None)
@@ -26,7 +26,7 @@ class PyTest(TestCommand):
         sys.exit(errno)
 
 
-install_requires = ['pyside']
+install_requires = ['pyside', 'pyblake2']
 data_files = []
 
 if os.name == 'nt':
@@ -0,0 +1,112 @@
+import os
+import zlib
+
+import pytest
+from PySide.QtCore import QDateTime
+
+from clipmanager.cache import PayloadCache
+from clipmanager.database import Database
+from clipmanager.models import (
+    DataSqlTableModel,
+    LazyMimeData,
+    MainSqlTableModel,
+)
+
+
+@pytest.fixture()
+def cache():
+    db = Database()
+    db.create_tables()
+
+    created_at = QDateTime.currentMSecsSinceEpoch()
+    for title in ['A', 'B', 'C']:
+        row_id = MainSqlTableModel.create(title, title, zlib.crc32(title),
+                                          created_at)
+        DataSqlTableModel.create(row_id, 'text/plain', title * 64)
+
+    yield PayloadCache(max_bytes=160, max_entry_bytes=128,
+                       max_prefetch_bytes=96)
+
+    db.close()
+    os.unlink(db.connection.databaseName())
+
+
+class TestPayloadCache:
+    def test_load(self, cache):
+        assert cache.load(1)[0][1].data() == 'A' * 64
+        assert cache.load(1)[0][1].data() == 'A' * 64
+
+        assert cache.misses == 1
+        assert cache.hits == 1
+        assert cache.size == 64
+
+    def test_mime_data(self, cache):
+        mime_data = cache.mime_data(2)
+        assert mime_data.data('text/plain').data() == 'B' * 64
+        assert 2 in cache
+
+        mime_data = cache.mime_data(2)
+        assert mime_data.data('text/plain').data() == 'B' * 64
+        assert cache.misses == 1
+        assert cache.hits == 1
+
+    def test_mime_data_spilled(self, cache):
+        row_id = MainSqlTableModel.create('D', 'D', zlib.crc32('D'),
+                                          QDateTime.currentMSecsSinceEpoch())
+        DataSqlTableModel.create(row_id, 'text/plain', 'D' * 64,
+                                 spill_threshold=32)
+
+        mime_data = cache.mime_data(row_id)
+        assert isinstance(mime_data, LazyMimeData)
+        assert mime_data.data('text/plain').data() == 'D' * 64
+        assert row_id not in cache
+
+    def test_evict_least_recently_used(self, cache):
+        cache.load(1)
+        cache.load(2)
+        cache.load(1)
+        cache.load(3)
+
+        assert 1 in cache
+        assert 2 not in cache
+        assert cache.size == 128
+
+    def test_entry_too_large(self, cache):
+        DataSqlTableModel.create(2, 'text/html', 'b' * 128)
+
+        cache.load(2)
+        assert 2 not in cache
+        assert cache.size == 0
+
+    def test_spilled_not_cached(self, cache):
+        row_id = MainSqlTableModel.create('D', 'D', zlib.crc32('D'),
+                                          QDateTime.currentMSecsSinceEpoch())
+        DataSqlTableModel.create(row_id, 'text/plain', 'D' * 64,
+                                 spill_threshold=32)
+
+        cache.prefetch([row_id])
+        assert row_id not in cache
+        assert cache.prefetched == 0
+
+    def test_prefetch(self, cache):
+        cache.prefetch([1, 2, None])
+        cache.load(2)
+
+        assert cache.prefetched == 2
+        assert cache.hits == 1
+        assert cache.misses == 0
+
+    def test_prefetch_limit(self, cache):
+        DataSqlTableModel.create(2, 'text/html', 'b' * 64)
+
+        cache.prefetch([2])
+        assert 2 not in cache
+        assert cache.prefetched == 0
+
+    def test_discard(self, cache):
+        cache.prefetch([1, 2])
+        cache.discard([1])
+
+        assert 1 not in cache
+        assert len(cache) == 1
+        assert cache.size == 64
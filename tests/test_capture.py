@@ -0,0 +1,144 @@
+import os
+
+import pytest
+from PySide.QtCore import QByteArray, QMimeData, QUrl
+
+from clipmanager.capture import (
+    CapturePipeline,
+    STAGES,
+    checksum,
+    create_title,
+    decode,
+    snapshot,
+)
+from clipmanager.database import Database
+from clipmanager.writer import DatabaseWriter
+
+
+@pytest.fixture()
+def pipeline():
+    db = Database()
+    db.create_tables()
+
+    writer = DatabaseWriter(db.connection.databaseName(), db.pragmas)
+    writer.start()
+    db.set_query_only(True)
+
+    yield CapturePipeline(writer)
+
+    writer.stop()
+    db.close()
+    os.unlink(db.connection.databaseName())
+
+
+def mime_data(**formats):
+    data = QMimeData()
+    if 'text' in formats:
+        data.setText(formats['text'])
+    if 'html' in formats:
+        data.setHtml(formats['html'])
+    if 'urls' in formats:
+        data.setUrls([QUrl(url) for url in formats['urls']])
+    return data
+
+
+def test_title_from_text():
+    decoded = decode(snapshot(mime_data(text=u'caf\xe9', html='<b>b</b>')))
+
+    assert create_title(decoded) == u'caf\xe9'
+
+
+def test_title_from_urls():
+    decoded = decode(snapshot(mime_data(urls=['file:///tmp/a'])))
+
+    assert create_title(decoded) == 'Copied File(s):\nfile:///tmp/a'
+
+
+def test_no_title():
+    decoded = decode(snapshot(QMimeData()))
+
+    assert create_title(decoded) is None
+
+
+def test_decode_prefix():
+    text = u'ab\xe9'.encode('utf-8')
+    decoded = decode([['text/plain', text], ['text/html', '<b>b</b>']],
+                     max_size=3)
+
+    assert decoded['text'] == u'ab'  # split character is dropped
+    assert decoded['html'] == u'<b>'
+
+
+def test_checksum():
+    formats = snapshot(mime_data(text='a', html='<b>a</b>'))
+
+    assert len(checksum(formats)) == 16
+    assert checksum(formats) == checksum(list(reversed(formats)))
+    assert checksum(formats) != checksum(formats[:1])
+    assert checksum(snapshot(QMimeData())) is None
+
+
+def test_checksum_format_boundaries():
+    assert checksum([['text/html', 'x']]) != checksum([['text/htmlx', '']])
+
+
+def test_pipeline_order(qtbot, pipeline):
+    results = []
+    pipeline.writer.captured.connect(results.append)
+
+    options = {'lines': 1, 'max_entries': 0, 'expire_at': 0}
+    for i in range(5):
+        pipeline.submit(mime_data(text='text-%d\nline' % i), i, options)
+
+    qtbot.waitUntil(lambda: len(results) == 5)
+
+    assert [result['title_short'] for result in results] == \
+        ['text-%d...' % i for i in range(5)]
+    assert results == sorted(results, key=lambda result: result['row_id'])
+    assert pipeline.stats()['store'][0] == 5
+    assert list(pipeline.stats()) == list(STAGES)
+
+
+def test_pipeline_failed(qtbot, pipeline):
+    with qtbot.waitSignal(pipeline.failed):
+        pipeline.submit(QMimeData(), 0, {'lines': 1})
+
+
+def test_snapshot_max_size():
+    assert snapshot(mime_data(text='a', html='<b>a</b>'), max_size=4) is None
+    assert len(snapshot(mime_data(text='a', html='<b>a</b>'),
+                        max_size=9)) == 2
+
+
+class CountingMimeData(QMimeData):
+    def __init__(self, formats):
+        super(CountingMimeData, self).__init__()
+        self._formats = formats
+        self.requested = []
+
+    def formats(self):
+        return list(self._formats)
+
+    def hasFormat(self, mime_format):
+        return mime_format in self._formats
+
+    def retrieveData(self, mime_format, preferred_type):
+        self.requested.append(mime_format)
+        return QByteArray(self._formats[mime_format])
+
+
+def test_snapshot_stops_reading():
+    data = CountingMimeData({'text/html': '<b>too-large</b>',
+                             'text/plain': 'too-large'})
+
+    assert snapshot(data, max_size=4) is None
+    assert data.requested == ['text/html']
+
+
+def test_pipeline_max_size(qtbot, pipeline):
+    pipeline.max_size = 4
+
+    with qtbot.waitSignal(pipeline.failed):
+        sequence = pipeline.submit(mime_data(text='too-large'), 0,
+                                   {'lines': 1})
+    assert sequence is None
@@ -1,7 +1,7 @@
 import pytest
 from PySide.QtCore import QMimeData
 
-from clipmanager.clipboard import ClipboardManager
+from clipmanager.clipboard import CaptureScheduler, ClipboardManager
 
 
 @pytest.fixture(scope='function')
@@ -41,6 +41,48 @@ class TestClipboardManager:
         contents = clipboard_manager.get_primary_clipboard_text()
         assert not contents.text()
 
+    def test_owns_clipboard(self, clipboard_manager, text_data):
+        clipboard_manager.set_text(text_data)
+        assert clipboard_manager.owns_clipboard()
+
     def test_new_item_signal(self, qtbot, clipboard_manager):
         with qtbot.waitSignal(clipboard_manager.new_item, 1000, True):
             clipboard_manager.set_text(QMimeData())
+
+
+class TestCaptureScheduler:
+    def test_coalesce_burst(self, qtbot):
+        scheduler = CaptureScheduler(window=50, rate=0)
+
+        with qtbot.waitSignal(scheduler.ready, 1000, True):
+            for __ in range(5):
+                scheduler.schedule()
+
+        assert not scheduler.pending()
+        assert scheduler.stats() == {'changes': 5, 'captured': 1,
+                                     'coalesced': 4, 'dropped': 0}
+
+    def test_max_delay(self, qtbot):
+        scheduler = CaptureScheduler(window=50, rate=0, max_delay=100)
+        scheduler.schedule()
+
+        with qtbot.waitSignal(scheduler.ready, 1000, True):
+            while scheduler.pending():
+                scheduler.schedule()
+                qtbot.wait(10)
+
+    def test_rate_limit(self, qtbot):
+        scheduler = CaptureScheduler(window=0, rate=10, burst=1)
+
+        with qtbot.waitSignal(scheduler.ready, 1000, True):
+            scheduler.schedule()
+
+        scheduler.schedule()
+        qtbot.wait(10)
+        assert scheduler.pending()
+
+        with qtbot.waitSignal(scheduler.ready, 1000, True):
+            scheduler.schedule()
+
+        assert scheduler.stats() == {'changes': 3, 'captured': 2,
+                                     'coalesced': 0, 'dropped': 1}
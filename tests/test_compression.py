@@ -0,0 +1,32 @@
+import pytest
+
+from clipmanager import compression
+
+
+def test_encode_small_payload():
+    codec, payload = compression.encode('text/html', '<b>a</b>')
+    assert codec == compression.CODEC_NONE
+    assert payload == '<b>a</b>'
+
+
+def test_encode_unlisted_format():
+    codec, __ = compression.encode('text/uri-list', 'a' * 65536)
+    assert codec == compression.CODEC_NONE
+
+
+def test_encode_disabled():
+    codec, __ = compression.encode('text/html', 'a' * 65536, level=0)
+    assert codec == compression.CODEC_NONE
+
+
+def test_round_trip():
+    html = '<p>paragraph</p>' * 1024
+    codec, payload = compression.encode('text/html', html)
+    assert codec == compression.CODEC_ZLIB
+    assert len(payload) < len(html)
+    assert compression.decode(codec, payload) == html
+
+
+def test_decode_unknown_codec():
+    with pytest.raises(ValueError):
+        compression.decode(255, 'payload')
@@ -1,3 +1,5 @@
+import zlib
+
 import pytest
 
 from clipmanager.database import Database
@@ -25,3 +27,57 @@ class TestDatabase:
     def test_create_tables(self, database):
         assert database.create_tables()
         assert database.connection.isValid()
+
+    def test_pragmas(self, database):
+        assert database._scalar('PRAGMA journal_mode') == 'wal'
+        assert database._scalar('PRAGMA synchronous') == 1  # NORMAL
+
+    def test_reclaim(self, database):
+        database.create_tables()
+        assert database.reclaim() == 0
+
+    def test_user_version(self, database):
+        database.create_tables()
+        assert database.user_version() == len(database._migrations)
+
+    @pytest.mark.parametrize('name', [
+        'main_checksum_idx',
+        'main_created_at_idx',
+    ])
+    def test_indexes(self, database, name):
+        database.create_tables()
+        count = database._scalar("SELECT COUNT(*) FROM sqlite_master "
+                                 "WHERE type='index' AND name='%s'" % name)
+        assert count == 1
+
+    def test_query_only(self, database):
+        database.create_tables()
+        assert database.set_query_only(True)
+        assert not database._exec('DELETE FROM main')
+
+    def test_migrate_checksum_collision(self, tmpdir):
+        database = Database(db_path=str(tmpdir.join('contents.db')))
+        statements = [
+            """CREATE TABLE main (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT, title_short TEXT, checksum TEXT,
+                keep INTEGER DEFAULT 0, created_at TIMESTAMP);""",
+            """CREATE TABLE data (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                parent_id INTEGER, mime_format TEXT, byte_data BLOB,
+                FOREIGN KEY(parent_id) REFERENCES main(id));""",
+        ]
+        # distinct texts with the same CRC32 checksum
+        for row_id, text in enumerate(['plumless', 'buckeroo'], start=1):
+            statements += [
+                "INSERT INTO main VALUES ({0:d}, '{1}', '{1}', '{2:d}', 0, "
+                "{0:d});".format(row_id, text, zlib.crc32(text)),
+                "INSERT INTO data VALUES ({0:d}, {0:d}, 'text/plain', "
+                "'{1}');".format(row_id, text),
+            ]
+        assert all(database._exec(sql) for sql in statements)
+
+        assert database.create_tables()
+        assert database._scalar('SELECT COUNT(*) FROM main') == 2
+        assert database._scalar('SELECT COUNT(*) FROM data') == 2
+        assert database._scalar('SELECT COUNT(*) FROM main '
+                                'WHERE checksum IS NULL') == 2
+        database.close()
@@ -0,0 +1,102 @@
+import pytest
+
+from clipmanager.fuzzy import FuzzyIndex
+
+NOW = 1500000000000
+DAY = 86400000
+
+
+@pytest.fixture()
+def index():
+    fuzzy_index = FuzzyIndex()
+    fuzzy_index.load([
+        (1, 'ClipManager settings dialog', NOW - DAY),
+        (2, 'copy manager\nsecond line', NOW),
+        (3, 'unrelated', NOW),
+    ])
+    return fuzzy_index
+
+
+def test_subsequence(index):
+    assert set(index.search('cpmgr', now=NOW)) == {1, 2}
+    assert index.search('xyz', now=NOW) == []
+
+
+def test_word_boundary_ranked_first(index):
+    assert index.search('clipm', now=NOW)[0] == 1
+
+
+def test_does_not_match_across_titles(index):
+    assert index.search('dialogcopy', now=NOW) == []
+
+
+def test_limit(index):
+    assert len(index.search('e', limit=2, now=NOW)) == 2
+
+
+def test_add_remove_touch(index):
+    index.add(4, 'clipboard', NOW)
+    assert 4 in index.search('clip', now=NOW)
+
+    index.remove([4, 1])
+    assert index.search('clip', now=NOW) == []
+    assert len(index) == 2
+
+    index.touch(2, NOW + DAY)
+    assert index.search('copy', now=NOW + DAY) == [2]
+
+
+def test_compact(index):
+    index.remove([1, 2])
+    assert len(index) == 1
+    assert index.search('unrelated', now=NOW) == [3]
+
+
+def test_extend_keeps_newer_changes(index):
+    index.touch(3, NOW + DAY)
+    index.extend([(3, 'unrelated', NOW), (4, 'clipboard', NOW),
+                  (5, 'clip art', NOW)], skip={5})
+
+    assert len(index) == 4
+    assert set(index.search('clip', now=NOW)) == {1, 4}
+    assert index._created_at[index._slots[3]] == NOW + DAY
+
+
+def test_non_ascii_query(index):
+    index.add(4, u'Caf\xe9 cr\xe8me', NOW)
+
+    assert index.search(u'f\xe9cr', now=NOW) == [4]
+    assert index.search(u'\xe8', now=NOW) == [4]
+
+
+def test_limit_keeps_best_matches():
+    fuzzy_index = FuzzyIndex()
+    fuzzy_index.block_size = 4
+    fuzzy_index.load(
+        (row_id, ''.join('abc -'[(row_id * prime) % 5]
+                         for prime in (3, 7, 11, 13, 17, 19)),
+         NOW - row_id * DAY / 10)
+        for row_id in range(100))
+
+    for text in ('a', 'ab', 'a-c', 'cab'):
+        full = fuzzy_index.search(text, now=NOW)
+        assert fuzzy_index.search(text, limit=5, now=NOW) == full[:5]
+
+
+def test_typed_query_narrows_previous(index):
+    expected = index.search('cpmgr', now=NOW)[:1]
+    for end in range(1, 6):
+        typed = index.search('cpmgr'[:end], limit=1, now=NOW)
+    assert typed == expected
+
+    index.add(4, 'cpmgr', NOW)
+    assert index.search('cpmgr', limit=1, now=NOW) == [4]
+
+
+def test_iter_search_restarts_after_change(index):
+    index.block_size = 1
+    steps = index.iter_search('clip', now=NOW)
+    assert next(steps) is None
+
+    index.add(4, 'clipboard', NOW)
+    assert [row_ids for row_ids in steps if row_ids is not None] == [[4, 1]]
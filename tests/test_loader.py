@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from clipmanager.database import Database
+from clipmanager.loader import HistoryLoader
+from clipmanager.models import MainSqlTableModel
+
+
+@pytest.fixture()
+def loader():
+    db = Database()
+    db.create_tables()
+
+    for created_at in range(5):
+        MainSqlTableModel.create(str(created_at), str(created_at),
+                                 created_at, created_at)
+    db.set_query_only(True)
+
+    history_loader = HistoryLoader(db.connection.databaseName(), db.pragmas)
+    history_loader.chunk_size = 2
+
+    yield history_loader
+
+    history_loader.stop()
+    db.close()
+    os.unlink(db.connection.databaseName())
+
+
+class TestHistoryLoader:
+    def test_count(self, qtbot, loader):
+        with qtbot.waitSignal(loader.counted) as blocker:
+            assert loader.load(count=True, titles=False)
+        assert blocker.args == [5]
+
+    def test_titles(self, qtbot, loader):
+        chunks = []
+        loader.loaded.connect(chunks.append)
+
+        with qtbot.waitSignal(loader.finished):
+            loader.load(count=False, titles=True)
+        qtbot.waitUntil(lambda: sum(len(chunk) for chunk in chunks) == 5)
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert sorted(row[1] for chunk in chunks for row in chunk) == \
+            ['0', '1', '2', '3', '4']
+
+    def test_first_page_then_count(self, qtbot, loader):
+        main = MainSqlTableModel(page_size=2, max_pages=2, select=False)
+        assert main.rowCount() == 0
+
+        main.select_first()
+        assert main.rowCount() == 2
+
+        loader.counted.connect(main.set_count)
+        with qtbot.waitSignal(loader.finished):
+            loader.load()
+        qtbot.waitUntil(lambda: main.rowCount() == 5)
+
+        assert main.row_id(4) == 1
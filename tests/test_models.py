@@ -1,11 +1,18 @@
+import hashlib
 import os
 import zlib
 
 import pytest
-from PySide.QtCore import QDateTime, QMimeData, Qt
+from PySide.QtCore import QByteArray, QDateTime, QMimeData, Qt
+from PySide.QtSql import QSqlDatabase, QSqlQuery
 
 from clipmanager.database import Database
-from clipmanager.models import DataSqlTableModel, MainSqlTableModel
+from clipmanager.models import (
+    DataSqlTableModel,
+    LazyMimeData,
+    MainSqlTableModel,
+)
+from clipmanager.payload import chunks
 
 
 @pytest.fixture()
@@ -13,16 +20,11 @@ def main_table():
     db = Database()
     db.create_tables()
 
-    main = MainSqlTableModel()
-    r = main.record()
-    r.setValue('title', 'A')
-    r.setValue('short_title', 'a')
-    r.setValue('checksum', zlib.crc32('A'))
-    r.setValue('created_at', QDateTime.currentMSecsSinceEpoch())
-    if not main.insertRecord(-1, r):
+    if not MainSqlTableModel.create('A', 'a', zlib.crc32('A'),
+                                    QDateTime.currentMSecsSinceEpoch()):
         assert False
 
-    main.submitAll()
+    main = MainSqlTableModel(page_size=2, max_pages=2)
 
     yield main
 
@@ -37,18 +39,16 @@ def data_table():
 
     data = DataSqlTableModel()
 
+    created_at = QDateTime.currentMSecsSinceEpoch()
+    for title in ['A', 'B']:
+        MainSqlTableModel.create(title, title, zlib.crc32(title), created_at)
+
     mime_data = QMimeData()
     mime_data.setData('text/plain', 'plain-text')
 
-    r = data.record()
-    r.setValue('parent_id', 1)
-    r.setValue('mime_format', 'text/plain')
-    r.setValue('byte_data', mime_data.data('text/plain'))
-    if not data.insertRecord(-1, r):
+    if not data.create(1, 'text/plain', mime_data.data('text/plain')):
         assert False
 
-    data.submitAll()
-
     yield data
 
     db.close()
@@ -59,10 +59,152 @@ class TestMainSqlTableModel:
     def test_create(self, main_table):
         row_id = main_table.create('title', 'short-title', 724990059,
                                    QDateTime.currentMSecsSinceEpoch())
-        main_table.submitAll()
 
         assert row_id
 
+    def test_touch_or_insert(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_id, created = main_table.touch_or_insert('B', 'b', 1234,
+                                                     created_at)
+        assert created
+
+        duplicate_id, created = main_table.touch_or_insert('B', 'b', 1234,
+                                                           created_at + 1)
+        assert not created
+        assert duplicate_id == row_id
+
+    def test_capture(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_id, created, __ = main_table.capture('C', 'c', 5678, created_at,
+                                                 [['text/plain', 'C']])
+        assert created
+        assert DataSqlTableModel.read(row_id)[0][0] == 'text/plain'
+
+        duplicate_id, created, __ = main_table.capture('C', 'c', 5678,
+                                                       created_at + 1,
+                                                       [['text/plain', 'C']])
+        assert not created
+        assert duplicate_id == row_id
+        assert len(DataSqlTableModel.read(row_id)) == 1
+
+    def test_capture_rolls_back(self, main_table, monkeypatch):
+        def fail(cls, *args, **kwargs):
+            raise zlib.error('Error -2 while compressing data')
+
+        monkeypatch.setattr(DataSqlTableModel, 'create', classmethod(fail))
+
+        row_id, created, purged = main_table.capture(
+            'E', 'e', 1213, QDateTime.currentMSecsSinceEpoch(),
+            [['text/plain', 'E']], max_entries=1)
+        assert (row_id, created, purged) == (None, False, [])
+        assert main_table.count() == 1
+
+    def test_capture_keeps_purged_files(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        main_table.capture('F', 'f', 1415, created_at,
+                           [['text/plain', 'F' * 64]], spill_threshold=32)
+
+        query = QSqlQuery('SELECT path FROM blobs WHERE path IS NOT NULL')
+        query.next()
+        path = os.path.join(os.path.dirname(
+            QSqlDatabase.database().databaseName()), 'blobs', query.value(0))
+        query.finish()
+
+        __, __, purged = main_table.capture('G', 'g', 1617, created_at + 1,
+                                            [['text/plain', 'G']],
+                                            max_entries=1)
+        assert len(purged) == 2
+        assert os.path.exists(path)
+
+        assert DataSqlTableModel.collect_files() == 1
+        assert not os.path.exists(path)
+
+    def test_rolled_back_spill_collected(self, main_table, monkeypatch):
+        def fail(cls, *args, **kwargs):
+            raise zlib.error('Error -2 while compressing data')
+
+        monkeypatch.setattr(MainSqlTableModel, 'purge_max_entries',
+                            classmethod(fail))
+
+        row_id, __, __ = main_table.capture(
+            'H', 'h', 1819, QDateTime.currentMSecsSinceEpoch(),
+            [['text/plain', 'H' * 64]], spill_threshold=32)
+        assert row_id is None
+
+        path = os.path.join(os.path.dirname(
+            QSqlDatabase.database().databaseName()), 'blobs',
+            hashlib.sha256('H' * 64).hexdigest())
+        assert os.path.exists(path)
+
+        DataSqlTableModel.collect_files()
+        assert not os.path.exists(path)
+
+    def test_purge_max_entries(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.capture(str(i), str(i), i, created_at + i,
+                                      [['text/plain', str(i)]])[0]
+                   for i in range(3)]
+
+        assert set(main_table.purge_max_entries(2)) == {1, row_ids[0]}
+        main_table.select()
+
+        assert main_table.rowCount() == 2
+
+    def test_purge_max_entries_tied(self, main_table):
+        row_ids = [main_table.create(str(i), str(i), i, 1)
+                   for i in range(4)]
+
+        assert set(main_table.purge_max_entries(3)) == set(row_ids[:2])
+        assert main_table.count() == 3
+
+    def test_purge_cascade(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_id, __, __ = main_table.capture('D', 'd', 91011, created_at,
+                                            [['text/plain', 'D']])
+
+        main_table.purge_max_entries(1)  # row_id is newest
+        assert len(DataSqlTableModel.read(row_id)) == 1
+
+        main_table.purge_expired_entries(1, now=created_at + 3 * 86400000)
+        assert len(DataSqlTableModel.read(row_id)) == 0
+
+    def test_purge_expired_entries(self, main_table):
+        main_table.purge_expired_entries(
+            1, now=QDateTime.currentMSecsSinceEpoch() + 3 * 86400000)
+        main_table.select()
+
+        assert main_table.rowCount() == 0
+
+    def test_titles(self, main_table):
+        row_id = main_table.create('Title', 't', 1, 1500000000000)
+        assert (row_id, 'Title', 1500000000000) in main_table.titles()
+
+    def test_search(self, main_table):
+        if 'main_fts' not in QSqlDatabase.database().tables():
+            pytest.skip('SQLite without FTS5')
+
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        old_id = main_table.create('clipboard manager', 'c', 1, created_at)
+        new_id = main_table.create('clipboard', 'c', 2, created_at + 1)
+        main_table.create('other', 'o', 3, created_at + 2)
+
+        assert main_table.search('clip') == [new_id, old_id]
+        assert main_table.search('clip man') == [old_id]
+        assert main_table.search('"') == []
+
+    def test_search_substring(self, main_table):
+        if 'main_trigram' not in QSqlDatabase.database().tables():
+            pytest.skip('SQLite without FTS5 trigram tokenizer')
+
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_id = main_table.create('/usr/share/ClipManager', 's', 1,
+                                   created_at)
+
+        assert main_table.search_substring('pmana') == [row_id]
+        assert main_table.search_substring('are/clip') == [row_id]
+        with pytest.raises(ValueError):
+            main_table.search_substring('ab')
+
     def test_data_display_role(self, main_table):
         index = main_table.index(0, main_table.TITLE)
         title = main_table.data(index.sibling(index.row(), main_table.TITLE),
@@ -80,6 +222,147 @@ class TestMainSqlTableModel:
         assert isinstance(tooltip, str)
         assert 'last used' in tooltip.lower()
 
+    def test_paging(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(6)]
+        main_table.select()
+
+        assert main_table.rowCount() == 7
+        assert [main_table.row_id(row) for row in range(7)] == \
+            row_ids[::-1] + [1]
+        assert len(main_table._window) <= \
+            main_table.page_size * main_table.max_pages
+
+        index = main_table.index(0, main_table.TITLE_SHORT)
+        assert main_table.data(index) == '5'
+
+    def test_paging_tied_timestamps(self, main_table):
+        row_ids = [main_table.create(str(i), str(i), i, 1)
+                   for i in range(6)]
+        main_table.select()
+
+        assert [main_table.row_id(row) for row in range(7)] == \
+            [1] + row_ids[::-1]
+        assert [main_table.row_id(row) for row in reversed(range(7))] == \
+            row_ids + [1]
+
+    def test_paging_keyset(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(6)]
+        main_table.select()
+        assert main_table.row_id(1) == row_ids[4]
+
+        # pages continue after the window, a row the model does not know
+        # yet does not shift them
+        main_table.create('6', '6', 6, created_at + 6)
+        assert [main_table.row_id(row) for row in range(2, 7)] == \
+            row_ids[3::-1] + [1]
+
+    def test_filter(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(3)]
+
+        main_table.set_filter([row_ids[0], row_ids[2]])
+        assert main_table.rowCount() == 2
+        assert main_table.data(main_table.index(1, main_table.TITLE)) == '2'
+
+        main_table.set_filter(None)
+        assert main_table.rowCount() == 4
+
+    def test_select_first(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(4)]
+
+        main_table.select_first()
+        assert main_table.rowCount() == 2
+        assert main_table.is_counting()
+
+        main_table.set_count(main_table.count())
+        assert main_table.rowCount() == 5
+        assert not main_table.is_counting()
+        assert main_table.row_id(4) == 1
+
+        main_table.select_first()
+        main_table.insert_row(row_ids[0], '0', created_at)
+        main_table.set_count(5)
+        assert main_table.rowCount() == 5
+
+    def test_remove_purged_counting(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(3)]
+        main_table.select_first()
+
+        main_table.remove_purged(main_table.purge_max_entries(2))
+        assert main_table.rowCount() == 2
+        assert [main_table.row_id(row) for row in range(2)] == \
+            row_ids[:0:-1]
+
+        main_table.set_count(2)
+        assert main_table.rowCount() == 2
+
+    def test_search_fixed(self, main_table):
+        row_id = main_table.create('100% done', 'd', 1,
+                                   QDateTime.currentMSecsSinceEpoch())
+
+        assert main_table.search_fixed('0% D') == [row_id]
+        assert main_table.search_fixed('0_') == []
+
+    def test_insert_row(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_id = main_table.create('B', 'b', 2, created_at + 1)
+        main_table.insert_row(row_id, 'b', created_at + 1)
+
+        assert main_table.rowCount() == 2
+        assert main_table.row_id(0) == row_id
+
+    def test_move_to_top(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(3)]
+        main_table.select()
+
+        main_table.touch_id(row_ids[0], created_at + 10)
+        main_table.move_to_top(row_ids[0], created_at + 10)
+        assert [main_table.row_id(row) for row in range(4)] == \
+            [row_ids[0], row_ids[2], row_ids[1], 1]
+
+        main_table.select()
+        assert main_table.row_id(0) == row_ids[0]
+
+    def test_remove_ids(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(3)]
+        main_table.select()
+        [main_table.row_id(row) for row in range(4)]  # fill window
+
+        main_table.delete([row_ids[0], row_ids[2]])
+        main_table.remove_ids([row_ids[0], row_ids[2]])
+        assert main_table.rowCount() == 2
+        assert main_table.row_id(1) == 1
+        assert main_table.count() == 2
+
+    def test_remove_purged(self, main_table):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        row_ids = [main_table.create(str(i), str(i), i, created_at + i)
+                   for i in range(3)]
+        main_table.select()
+
+        main_table.remove_purged(main_table.purge_max_entries(2))
+        assert [main_table.row_id(row) for row in
+                range(main_table.rowCount())] == row_ids[:0:-1]
+
+    def test_delete(self, main_table):
+        main_table.delete([1])
+        main_table.select()
+
+        assert main_table.rowCount() == 0
+
 
 class TestDataSqlTableModel:
     def test_create(self, data_table):
@@ -110,3 +393,116 @@ class TestDataSqlTableModel:
         mime_data = data_table.read(1)
 
         assert len(mime_data) == 0
+
+    def test_read_compressed(self, data_table):
+        html = '<p>paragraph</p>' * 1024
+        data_table.create(2, 'text/html', html)
+
+        mime_format, byte_data = data_table.read(2)[0]
+        assert mime_format == 'text/html'
+        assert byte_data.data() == html
+
+    def test_read_unknown_codec(self, data_table):
+        html = '<p>paragraph</p>' * 1024
+        data_table.create(1, 'text/html', html)
+
+        query = QSqlQuery()
+        assert query.exec_('UPDATE blobs SET codec=99 WHERE codec != 0')
+
+        formats = data_table.read(1)
+        assert [mime_format for mime_format, __ in formats] == ['text/plain']
+
+    def test_read_spilled(self, data_table):
+        text = 'spilled-text' * 1024
+        data_table.create(2, 'text/plain', text, spill_threshold=1024)
+
+        mime_data = data_table.read_mime_data(2)
+        assert mime_data.data('text/plain').data() == text
+
+        mapped = data_table.read(2)[0][1]
+        assert mapped[:] == text
+        mapped.close()
+
+        byte_data = data_table.read(2, mapped=False)[0][1]
+        assert isinstance(byte_data, QByteArray)
+        assert byte_data.data() == text
+
+        data_table.delete([2])
+        query = QSqlQuery('SELECT COUNT(*) FROM blobs WHERE path IS NOT NULL')
+        query.next()
+        assert query.value(0) == 0
+
+    def test_lazy_mime_data_spilled(self, data_table):
+        text = 'spilled-text' * 1024
+        data_table.create(2, 'text/plain', text, spill_threshold=1024)
+
+        mime_data = LazyMimeData(2)
+        assert mime_data.data('text/plain').data() == text
+        assert 'text/plain' not in mime_data._retrieved
+
+    def test_read_formats(self, data_table):
+        data_table.create(1, 'text/html', '<p>html</p>')
+
+        assert data_table.read_formats(1) == ['text/plain', 'text/html']
+        assert data_table.read_formats(2) == []
+
+    def test_read_projection(self, data_table):
+        data_table.create(1, 'text/html', '<p>html</p>')
+
+        formats = data_table.read(1, formats=['text/html'])
+        assert len(formats) == 1
+        assert formats[0][0] == 'text/html'
+        assert formats[0][1].data() == '<p>html</p>'
+
+        assert data_table.read(1, formats=[]) == []
+
+    def test_lazy_mime_data(self, data_table):
+        data_table.create(1, 'text/html', '<p>html</p>')
+
+        mime_data = LazyMimeData(1)
+        assert mime_data.formats() == ['text/plain', 'text/html']
+        assert mime_data.hasHtml()
+        assert not mime_data.hasUrls()
+        assert mime_data.data('text/plain').data() == 'plain-text'
+        assert mime_data.html() == '<p>html</p>'
+
+    def test_lazy_mime_data_materialize(self, data_table):
+        data_table.create(1, 'text/html', '<p>html</p>')
+
+        mime_data = LazyMimeData(1)
+        assert mime_data.data('text/plain').data() == 'plain-text'
+
+        mime_data.materialize()
+        MainSqlTableModel.delete([1])
+
+        assert mime_data.data('text/plain').data() == 'plain-text'
+        assert mime_data.html() == '<p>html</p>'
+
+    def test_digest_chunks(self, data_table):
+        assert ''.join(bytes(bytearray(chunk))
+                       for chunk in chunks('abcde', 2)) == 'abcde'
+        assert data_table.digest(QByteArray('abcde')).data() == \
+            hashlib.sha256('abcde').digest()
+
+    def test_delete_bulk(self, data_table):
+        data_table.create(2, 'text/plain', 'second')
+        data_table.delete([1, 2])
+
+        assert len(data_table.read(1)) == 0
+        assert len(data_table.read(2)) == 0
+
+    def test_shared_blob(self, data_table):
+        data_table.create(2, 'text/plain', 'plain-text')
+        data_table.create(2, 'text/plain;charset=utf-8', 'plain-text')
+
+        query = QSqlQuery('SELECT COUNT(*), SUM(refcount) FROM blobs')
+        query.next()
+        assert query.value(0) == 1
+        assert query.value(1) == 3
+
+        data_table.delete([1])
+        data_table.delete([2])
+
+        query = QSqlQuery('SELECT COUNT(*) FROM blobs')
+        query.next()
+        assert query.value(0) == 0
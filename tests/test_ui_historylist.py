@@ -8,3 +8,63 @@ def test_history_list(qtbot, model):
     qtbot.addWidget(history_view)
 
     assert history_view.model().rowCount() > 0
+
+
+def test_size_hint_cache(qtbot, model):
+    history_view = HistoryListView()
+    history_view.setModel(model)
+    qtbot.addWidget(history_view)
+
+    delegate = history_view.itemDelegate()
+    option = history_view.viewOptions()
+    index = model.index(0, 0)
+
+    size = delegate.sizeHint(option, index)
+    assert size.height() > option.fontMetrics.lineSpacing()
+    assert delegate.sizeHint(option, index) == size
+    assert len(delegate._size_hints) == 1
+
+    font = history_view.font()
+    font.setPointSize(font.pointSize() + 4)
+    history_view.setFont(font)
+    assert not delegate._size_hints
+
+
+def test_static_text_cache(qtbot, model):
+    history_view = HistoryListView()
+    history_view.setModel(model)
+    qtbot.addWidget(history_view)
+
+    delegate = history_view.itemDelegate()
+    index = model.index(0, 0)
+
+    static_text = delegate.static_text(index, history_view.font())
+    assert static_text.text() == index.data()
+    assert delegate.static_text(index, history_view.font()) is static_text
+
+    model.layoutAboutToBeChanged.emit()
+    model.layoutChanged.emit()
+    assert delegate.static_text(index, history_view.font()) is static_text
+
+    model.beginResetModel()
+    model.endResetModel()
+    assert not delegate._static_texts
+
+
+def test_uniform_items(qtbot, model):
+    history_view = HistoryListView()
+    history_view.setModel(model)
+    qtbot.addWidget(history_view)
+
+    history_view.set_uniform_items(True, 3)
+    assert history_view.uniformItemSizes()
+    assert history_view.layoutMode() == HistoryListView.Batched
+
+    delegate = history_view.itemDelegate()
+    option = history_view.viewOptions()
+    size = delegate.sizeHint(option, model.index(0, 0))
+    assert size.height() >= option.fontMetrics.lineSpacing() * 3
+
+    history_view.set_uniform_items(False, 3)
+    assert not history_view.uniformItemSizes()
+    assert history_view.layoutMode() == HistoryListView.Batched
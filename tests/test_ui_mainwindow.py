@@ -1,9 +1,38 @@
+import os
+import time
+import zlib
+
 import pytest
-from PySide.QtGui import QCloseEvent, QSystemTrayIcon
+from PySide.QtCore import QDateTime, QMimeData
+from PySide.QtGui import (
+    QApplication,
+    QCloseEvent,
+    QListView,
+    QMainWindow,
+    QSystemTrayIcon,
+)
 
+from clipmanager.models import LazyMimeData
 from clipmanager.ui.mainwindow import MainWidget, MainWindow
 
-pytestmark = pytest.mark.skip('MainWindow tests lock up.')
+
+class BareWindow(QMainWindow):
+    """Screen bounds and open latency of MainWindow without its widgets."""
+    update_screen_bounds = MainWindow.__dict__['update_screen_bounds']
+    eventFilter = MainWindow.__dict__['eventFilter']
+
+    def __init__(self):
+        super(BareWindow, self).__init__()
+
+        self.setCentralWidget(QListView(self))
+
+        self.screen_bounds = None
+        self.desktop = QApplication.desktop()
+        self.update_screen_bounds()
+
+        self._opened_at = None
+        self.open_latency = [0, 0.0, 0.0]
+        self.centralWidget().viewport().installEventFilter(self)
 
 
 @pytest.fixture()
@@ -14,15 +43,34 @@ def main_window(qtbot):
     return qtbot, mw
 
 
+@pytest.fixture()
+def bare_window(qtbot):
+    window = BareWindow()
+    qtbot.addWidget(window)
+    return window
+
+
 @pytest.fixture()
 def main_widget(qtbot):
     mw = MainWidget()
-    mw.show()
     qtbot.addWidget(mw)
 
-    return qtbot, mw
+    yield mw
+
+    mw.destroy()
+    os.unlink(mw.database.connection.databaseName())
 
 
+def capture(qtbot, widget, text):
+    with qtbot.waitSignal(widget.writer.captured) as blocker:
+        widget.writer.capture(title=text, title_short=text,
+                              checksum=zlib.crc32(text),
+                              created_at=QDateTime.currentMSecsSinceEpoch(),
+                              formats=[['text/plain', text]])
+    return blocker.args[0]['row_id']
+
+
+@pytest.mark.skip('MainWindow tests lock up.')
 class TestMainWindow:
     def test_close_event(self, main_window):
         qtbot, window = main_window
@@ -36,3 +84,70 @@ class TestMainWindow:
         window.hide()
         window.system_tray_activate(QSystemTrayIcon.Trigger)
         assert window.isVisible()
+
+
+class TestBareWindow:
+    def test_screen_bounds(self, bare_window):
+        x_min, y_min, x_max, y_max = bare_window.screen_bounds
+        assert x_max > x_min and y_max > y_min
+
+    def test_open_latency(self, qtbot, bare_window):
+        bare_window._opened_at = time.time()
+        bare_window.show()
+
+        qtbot.waitUntil(lambda: bare_window.open_latency[0] == 1)
+        assert bare_window._opened_at is None
+
+
+class TestMainWidget:
+    def test_item_captured(self, qtbot, main_widget):
+        row_id = capture(qtbot, main_widget, 'A')
+
+        assert main_widget.main_model.row_id(0) == row_id
+        assert main_widget.history_view.currentIndex().row() == 0
+
+    def test_items_deleted(self, qtbot, main_widget):
+        row_id = capture(qtbot, main_widget, 'A')
+        main_widget.payload_cache.prefetch([row_id])
+
+        with qtbot.waitSignal(main_widget.writer.deleted):
+            main_widget.writer.delete([row_id])
+
+        assert main_widget.main_model.rowCount() == 0
+        assert row_id not in main_widget.payload_cache
+
+    def test_new_item(self, main_widget, monkeypatch):
+        submitted = []
+        monkeypatch.setattr(main_widget.capture_pipeline, 'submit',
+                            lambda *args: submitted.append(args))
+        main_widget.window_owner = lambda: []
+
+        owns = [True]
+        monkeypatch.setattr(main_widget.clipboard_manager, 'owns_clipboard',
+                            lambda: owns[0])
+        assert not main_widget.new_item(QMimeData())  # own paste
+
+        owns[0] = False
+        assert main_widget.new_item(QMimeData())
+        assert len(submitted) == 1
+
+    @pytest.mark.parametrize('owns,deleted,kept,retrieved', [
+        (True, None, False, True),  # deleted rows unknown
+        (True, 0, False, True),  # pasted row deleted
+        (True, 1, True, False),  # other row deleted
+        (False, 0, False, False),  # clipboard changed since
+    ])
+    def test_keep_pasted(self, qtbot, main_widget, monkeypatch, owns,
+                         deleted, kept, retrieved):
+        row_id = capture(qtbot, main_widget, 'A')
+
+        mime_data = LazyMimeData(row_id)
+        main_widget.pasted_mime_data = mime_data
+        monkeypatch.setattr(main_widget.clipboard_manager, 'owns_clipboard',
+                            lambda: owns)
+
+        main_widget.keep_pasted(None if deleted is None
+                                else [row_id + deleted])
+
+        assert (main_widget.pasted_mime_data is mime_data) == kept
+        assert bool(mime_data._retrieved) == retrieved
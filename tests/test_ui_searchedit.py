@@ -0,0 +1,62 @@
+import pytest
+from PySide.QtGui import QStringListModel
+
+from clipmanager.models import MainSqlTableModel
+from clipmanager.ui.searchedit import SearchFilterProxyModel
+
+
+class FilterModel(QStringListModel):
+    def __init__(self, parent=None):
+        super(FilterModel, self).__init__(parent)
+        self.filters = []
+
+    def set_filter(self, row_ids):
+        self.filters.append(row_ids)
+
+
+@pytest.fixture()
+def searches(monkeypatch):
+    calls = []
+
+    def patch(name):
+        def search(text):
+            calls.append((name, text))
+            return [len(calls)]
+        monkeypatch.setattr(MainSqlTableModel, name, staticmethod(search))
+
+    for name in ('search', 'search_substring', 'search_fixed'):
+        patch(name)
+    return calls
+
+
+def make_proxy(full_text, substring):
+    proxy = SearchFilterProxyModel(full_text=full_text, substring=substring)
+    proxy.setSourceModel(FilterModel(proxy))
+    return proxy
+
+
+@pytest.mark.parametrize('text,expected', [
+    ('ello worl', 'search_substring'),
+    ('share/cl', 'search_substring'),
+    ('"a"-b', 'search_substring'),
+    ('ab', 'search_fixed'),
+    ('a b', 'search_substring'),
+])
+def test_substring_mode(searches, text, expected):
+    make_proxy(full_text=True, substring=True).search(text)
+    assert searches == [(expected, text)]
+
+
+@pytest.mark.parametrize('text', ['ello worl', 'ab', 'a-b'])
+def test_word_mode(searches, text):
+    make_proxy(full_text=True, substring=False).search(text)
+    assert searches == [('search', text)]
+
+
+def test_without_index(searches):
+    proxy = make_proxy(full_text=False, substring=False)
+    proxy.search('ello worl')
+    proxy.search('  ')
+
+    assert searches == [('search_fixed', 'ello worl')]
+    assert proxy.sourceModel().filters == [[1], None]
@@ -1,6 +1,11 @@
 import pytest
 
-from clipmanager.utils import format_title, truncate_lines
+from clipmanager.utils import (
+    build_title_short,
+    format_title,
+    iter_lines,
+    truncate_lines,
+)
 
 
 @pytest.mark.parametrize('title,expected', [
@@ -20,3 +25,33 @@ def test_format_title(title, expected):
 ])
 def test_truncate_lines(title, count, expected):
     assert truncate_lines(title, count) == expected
+
+
+@pytest.mark.parametrize('text', [
+    u'',
+    u'line-one',
+    u'line-one\n',
+    u'line-one\r\nline-two\rline-three\n\nline-four',
+    u'line-one\u2028line-two',
+])
+def test_iter_lines(text):
+    assert list(iter_lines(text)) == text.splitlines()
+
+
+def test_iter_lines_max_chars():
+    assert list(iter_lines(u'abcdef\ng', max_chars=3)) == [u'abc']
+
+
+@pytest.mark.parametrize('title,count,expected', [
+    ('line-one', 1, 'line-one'),
+    ('\tline-one\n\n\tline-two', 2, 'line-one\nline-two'),
+    ('  line-one\n    line-two\nline-three', 2, 'line-one\n  line-two...'),
+    ('\tline-one\n\tline-two', 1, 'line-one...'),
+])
+def test_build_title_short(title, count, expected):
+    assert build_title_short(title, count) == expected
+
+
+def test_build_title_short_max_chars():
+    assert build_title_short('a' * 10 + '\nb', 2, max_chars=4) == 'aaaa...'
+    assert build_title_short('aa\nbb\ncc', 3, max_chars=4) == 'aa\nb...'
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+from PySide.QtCore import QDateTime
+
+from clipmanager.connection import execute
+from clipmanager.database import Database
+from clipmanager.models import MainSqlTableModel
+from clipmanager.tasks import RehashTask
+from clipmanager.writer import DatabaseWriter
+
+
+@pytest.fixture()
+def writer():
+    db = Database()
+    db.create_tables()
+
+    database_writer = DatabaseWriter(db.connection.databaseName(),
+                                     db.pragmas)
+    database_writer.start()
+    db.set_query_only(True)
+
+    yield database_writer
+
+    database_writer.stop()
+    db.close()
+    os.unlink(db.connection.databaseName())
+
+
+class CommitFailingRehashTask(RehashTask):
+    """Break the commit of the first batch with a deferred foreign key."""
+
+    def __init__(self, parent=None):
+        super(CommitFailingRehashTask, self).__init__(parent)
+        self.fail = True
+
+    def run_batch(self):
+        if self.fail:
+            self.fail = False
+            execute('CREATE TABLE broken (parent_id INTEGER REFERENCES '
+                    'main(id) DEFERRABLE INITIALLY DEFERRED)')
+            execute('INSERT INTO broken VALUES (-1)')
+        return super(CommitFailingRehashTask, self).run_batch()
+
+
+class TestDatabaseWriter:
+    def test_capture(self, qtbot, writer):
+        created_at = QDateTime.currentMSecsSinceEpoch()
+        with qtbot.waitSignal(writer.captured) as blocker:
+            writer.capture(title='A', title_short='a', checksum=1,
+                           created_at=created_at,
+                           formats=[['text/plain', 'A']])
+
+        result = blocker.args[0]
+        assert result['created']
+        assert result['title_short'] == 'a'
+        assert 'formats' not in result
+
+        # committed before the signal, visible to the read connection
+        assert MainSqlTableModel.value(result['row_id'],
+                                       MainSqlTableModel.TITLE) == 'A'
+
+    def test_touch_and_delete(self, qtbot, writer):
+        with qtbot.waitSignal(writer.captured) as blocker:
+            writer.capture(title='B', title_short='b', checksum=2,
+                           created_at=1, formats=[['text/plain', 'B']])
+        row_id = blocker.args[0]['row_id']
+
+        with qtbot.waitSignal(writer.touched) as blocker:
+            writer.touch(row_id, 2)
+        assert blocker.args == [row_id, 2]
+
+        with qtbot.waitSignal(writer.deleted) as blocker:
+            writer.delete([row_id])
+        assert blocker.args == [[row_id]]
+        assert MainSqlTableModel.count() == 0
+
+    def test_failed_command_rolled_back(self, qtbot, writer, monkeypatch):
+        def broken(cls, **kwargs):
+            cls.create('X', 'x', 9, 1)
+            raise ValueError('broken')
+
+        monkeypatch.setattr(MainSqlTableModel, 'capture',
+                            classmethod(broken))
+
+        with qtbot.waitSignal(writer.captured) as blocker:
+            writer.capture(title='X', title_short='x', checksum=9,
+                           created_at=1, formats=[['text/plain', 'X']])
+        assert blocker.args[0]['row_id'] is None
+        assert MainSqlTableModel.count() == 0
+
+        with qtbot.waitSignal(writer.deleted):
+            writer.delete([1])
+
+    def test_purge(self, qtbot, writer):
+        for checksum in range(3):
+            writer.capture(title=str(checksum), title_short=str(checksum),
+                           checksum=checksum, created_at=checksum,
+                           formats=[['text/plain', str(checksum)]])
+
+        with qtbot.waitSignal(writer.purged) as blocker:
+            writer.purge(max_entries=1, expire_at=0)
+        assert len(blocker.args[0]) == 2
+
+    def test_rehash(self, qtbot, writer):
+        for created_at, text in enumerate(['A', 'A', 'B']):
+            writer.capture(title=text, title_short=text, checksum=None,
+                           created_at=created_at,
+                           formats=[['text/plain', text]])
+
+        deleted = []
+        writer.deleted.connect(deleted.append)
+
+        task = RehashTask()
+        with qtbot.waitSignal(task.finished):
+            writer.run_task(task)
+        qtbot.waitUntil(lambda: deleted == [[1]])
+
+        assert task.duplicates == 1
+        assert MainSqlTableModel.count() == 2
+        assert MainSqlTableModel.value(1, MainSqlTableModel.TITLE) is None
+
+    def test_task_commit_failed(self, qtbot, writer):
+        for created_at, text in enumerate(['A', 'A', 'B']):
+            writer.capture(title=text, title_short=text, checksum=None,
+                           created_at=created_at,
+                           formats=[['text/plain', text]])
+        qtbot.waitUntil(lambda: MainSqlTableModel.count() == 3)
+
+        finished = []
+        task = CommitFailingRehashTask()
+        task.finished.connect(lambda *args: finished.append(args))
+        with qtbot.waitSignal(task.finished):
+            writer.run_task(task)
+
+        assert finished == [(3, 1)]
+        assert MainSqlTableModel.count() == 2
+        for row_id in (2, 3):
+            assert MainSqlTableModel.value(
+                row_id, MainSqlTableModel.CHECKSUM) is not None